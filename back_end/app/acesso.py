@@ -0,0 +1,194 @@
+"""
+TwoBolsos Backend - Controle de Acesso às Carteiras
+===================================================
+
+Este módulo responde "qual o papel do usuário U na carteira W",
+usado por todos os routers para autorizar leitura e edição.
+
+Papéis:
+    - owner: Dono da carteira (Negocio.owner_id)
+    - admin / editor: Membros que podem editar
+    - viewer: Membros que só visualizam
+    - None: Sem acesso (ou carteira inexistente)
+
+Cache:
+    Os papéis ficam em memória por carteira ({user_id: papel}). Numa
+    falta, uma única consulta indexada (PK de negocio + PK de
+    negocioshare) traz o dono e o papel do usuário. Assim um request
+    de escrita custa no máximo uma consulta de permissão, e nenhuma
+    quando o papel já está em cache.
+
+Invalidação:
+    Qualquer NegocioShare criado, alterado ou removido (entrada por
+    convite, mudança de role, remoção de membro) e qualquer Negocio
+    removido descartam a carteira do cache quando a transação é
+    commitada. Um contador de geração impede que uma consulta que
+    começou antes do commit guarde o papel antigo depois dele.
+
+    Com vários workers, os outros processos são avisados pelo
+    backplane de tempo real (ver app/realtime/manager.py). Como esse
+    aviso pode se perder (worker reiniciando, falha na publicação),
+    cada carteira também expira do cache após ACCESS_CACHE_TTL
+    segundos: é o maior tempo que um membro removido ou rebaixado
+    mantém o papel antigo em outro worker.
+
+Uso nos routers:
+    >>> exigir_edicao(session, user.id, negocio_id)     # 403 se não puder
+    >>> role = exigir_leitura(session, user.id, negocio_id)
+
+Variáveis de ambiente:
+    - ACCESS_CACHE_SIZE: Carteiras mantidas em cache (default: 1024)
+    - ACCESS_CACHE_TTL: Segundos que os papéis de uma carteira valem (default: 30)
+
+Autor: K4nishi
+Versão: 3.0.0
+"""
+
+import os
+import threading
+from typing import Dict, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import and_, event
+from sqlmodel import Session, select
+
+from app.cache import LRUCache
+from app.models import Negocio, NegocioShare
+
+
+ACCESS_CACHE_SIZE = int(os.environ.get("ACCESS_CACHE_SIZE", "1024"))
+"""Número máximo de carteiras com papéis em cache."""
+
+ACCESS_CACHE_TTL = float(os.environ.get("ACCESS_CACHE_TTL", "30"))
+"""Validade (segundos) dos papéis em cache, mesmo sem invalidação."""
+
+PAPEIS_EDICAO = frozenset({"owner", "admin", "editor"})
+"""Papéis que podem criar e remover transações e despesas fixas."""
+
+_SEM_ACESSO = ""
+"""Marca, no cache, um usuário que não é membro da carteira."""
+
+acesso_cache = LRUCache(ACCESS_CACHE_SIZE, ttl=ACCESS_CACHE_TTL)
+"""Papéis por carteira: negocio_id -> {user_id: papel}."""
+
+_geracao = 0
+_geracao_lock = threading.Lock()
+
+
+# ============================================================
+# CONSULTA
+# ============================================================
+
+def papel(session: Session, user_id: int, negocio_id: int) -> Optional[str]:
+    """
+    Retorna o papel do usuário na carteira.
+
+    Args:
+        session: Sessão do banco de dados (usada só numa falta de cache)
+        user_id: ID do usuário
+        negocio_id: ID da carteira
+
+    Returns:
+        'owner', 'admin', 'editor', 'viewer' ou None (sem acesso)
+    """
+    papeis: Optional[Dict[int, str]] = acesso_cache.get(negocio_id)
+    if papeis is not None and user_id in papeis:
+        return papeis[user_id] or None
+
+    geracao = _geracao
+    linha = session.exec(
+        select(Negocio.owner_id, NegocioShare.role)
+        .outerjoin(
+            NegocioShare,
+            and_(NegocioShare.negocio_id == Negocio.id, NegocioShare.user_id == user_id)
+        )
+        .where(Negocio.id == negocio_id)
+    ).first()
+
+    if linha is None:
+        # Carteira inexistente: não guarda nada
+        return None
+
+    owner_id, role = linha
+    resultado = "owner" if owner_id == user_id else (role or _SEM_ACESSO)
+
+    with _geracao_lock:
+        if geracao == _geracao:
+            if papeis is None:
+                papeis = {}
+                acesso_cache.put(negocio_id, papeis)
+            papeis[user_id] = resultado
+
+    return resultado or None
+
+
+def pode_ler(session: Session, user_id: int, negocio_id: int) -> bool:
+    """Dono ou membro com qualquer papel."""
+    return papel(session, user_id, negocio_id) is not None
+
+
+def pode_editar(session: Session, user_id: int, negocio_id: int) -> bool:
+    """Dono ou membro admin/editor."""
+    return papel(session, user_id, negocio_id) in PAPEIS_EDICAO
+
+
+def exigir_leitura(session: Session, user_id: int, negocio_id: int, detalhe: str = "Sem permissão") -> str:
+    """
+    Retorna o papel do usuário ou lança 403 se ele não for membro.
+
+    Raises:
+        HTTPException 403: Se não tem acesso à carteira
+    """
+    role = papel(session, user_id, negocio_id)
+    if role is None:
+        raise HTTPException(403, detalhe)
+    return role
+
+
+def exigir_edicao(session: Session, user_id: int, negocio_id: int, detalhe: str = "Sem permissão") -> str:
+    """
+    Retorna o papel do usuário ou lança 403 se ele não puder editar.
+
+    Raises:
+        HTTPException 403: Se não é dono nem admin/editor
+    """
+    role = papel(session, user_id, negocio_id)
+    if role not in PAPEIS_EDICAO:
+        raise HTTPException(403, detalhe)
+    return role
+
+
+# ============================================================
+# INVALIDAÇÃO
+# ============================================================
+
+def invalidar_carteira(*negocio_ids: int) -> None:
+    """Descarta os papéis em cache das carteiras."""
+    global _geracao
+    with _geracao_lock:
+        _geracao += 1
+        for negocio_id in negocio_ids:
+            acesso_cache.discard(negocio_id)
+
+
+@event.listens_for(Session, "after_flush")
+def _anotar_carteiras_alteradas(session, flush_context) -> None:
+    """Guarda as carteiras cujos membros (ou a própria carteira) mudaram."""
+    ids = {obj.negocio_id for obj in (*session.new, *session.dirty, *session.deleted) if isinstance(obj, NegocioShare)}
+    ids.update(obj.id for obj in session.deleted if isinstance(obj, Negocio))
+    if ids:
+        session.info.setdefault("carteiras_alteradas", set()).update(ids)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidar_carteiras_alteradas(session) -> None:
+    """Invalida o cache só depois do commit, quando a mudança já é visível."""
+    ids = session.info.pop("carteiras_alteradas", None)
+    if ids:
+        invalidar_carteira(*ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_carteiras_alteradas(session) -> None:
+    """Alterações desfeitas não precisam invalidar nada."""
+    session.info.pop("carteiras_alteradas", None)
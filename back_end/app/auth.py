@@ -9,12 +9,21 @@ Funcionalidades:
     - Geração e validação de tokens JWT
     - Decorator para proteção de rotas
     - Extração de usuário atual do token
+    - Cache de tokens verificados e de usuários autenticados
 
 Segurança:
     - Tokens JWT com expiração de 7 dias
     - Senhas nunca são armazenadas em texto puro
     - Algoritmo HS256 para assinatura de tokens
 
+Cache de autenticação:
+    O token carrega o id do usuário (claim "uid"). Tokens já
+    verificados ficam em token_cache e os usuários em principal_cache
+    (ver app/cache.py), então a maioria dos requests autenticados não
+    verifica a assinatura de novo nem consulta o banco. Qualquer
+    alteração em um User commitada pelo ORM remove o usuário do cache.
+    Tokens antigos (só com "sub") continuam válidos.
+
 Uso:
     >>> from app.auth import get_current_user
     >>> @router.get("/protected")
@@ -25,6 +34,7 @@ Autor: K4nishi
 Versão: 3.0.0
 """
 
+import time
 from datetime import datetime, timedelta
 from typing import Optional
 
@@ -32,8 +42,10 @@ from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import event
 from sqlmodel import Session
 
+from app.cache import principal_cache, token_cache
 from app.database import get_session
 from app.models import User
 
@@ -131,14 +143,14 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     
     Args:
         data: Dicionário com os dados a incluir no token.
-              Geralmente {"sub": username}
+              Geralmente {"sub": username, "uid": user_id}
         expires_delta: Tempo opcional até expiração
         
     Returns:
         Token JWT codificado como string
         
     Exemplo:
-        >>> token = create_access_token({"sub": "joao123"})
+        >>> token = create_access_token({"sub": "joao123", "uid": 1})
         >>> len(token.split('.'))  # JWT tem 3 partes separadas por ponto
         3
     """
@@ -155,11 +167,87 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 
+# ============================================================
+# CACHE DE AUTENTICAÇÃO
+# ============================================================
+
+def _usuario_do_token(token: str, session: Session) -> Optional[User]:
+    """
+    Resolve o usuário de um token, usando os caches quando possível.
+
+    Fluxo:
+        1. token_cache: token já verificado -> user_id (sem decodificar)
+        2. Senão decodifica e valida o JWT; o user_id vem do claim
+           "uid" (ou, em tokens antigos, de uma busca pelo username)
+        3. principal_cache: user_id -> User (sem consultar o banco)
+        4. Senão busca por chave primária e guarda no cache
+
+    Returns:
+        User desanexado da sessão, ou None se o token for inválido
+    """
+    user_id = token_cache.get(token)
+    user = None
+
+    if user_id is None:
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        except JWTError:
+            return None
+
+        user_id = payload.get("uid")
+        if user_id is None:
+            username = payload.get("sub")
+            if username is None:
+                return None
+            user = session.query(User).filter(User.username == username).first()
+            if user is None:
+                return None
+            user_id = user.id
+
+        # A entrada nunca vale além da expiração do próprio token
+        restante = payload.get("exp", 0) - time.time()
+        token_cache.put(token, user_id, ttl=min(token_cache.ttl, restante))
+
+    if user is None:
+        user = principal_cache.get(user_id)
+        if user is not None:
+            return user
+        user = session.get(User, user_id)
+        if user is None:
+            return None
+
+    # Desanexa para que um commit da sessão do request não expire o objeto compartilhado
+    session.expunge(user)
+    principal_cache.put(user_id, user)
+    return user
+
+
+@event.listens_for(Session, "after_flush")
+def _anotar_usuarios_alterados(session, flush_context) -> None:
+    """Guarda os ids de usuários alterados/removidos neste flush."""
+    ids = {obj.id for obj in (*session.dirty, *session.deleted) if isinstance(obj, User)}
+    if ids:
+        session.info.setdefault("usuarios_alterados", set()).update(ids)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidar_usuarios_alterados(session) -> None:
+    """Remove do principal_cache os usuários alterados, após o commit."""
+    for user_id in session.info.pop("usuarios_alterados", ()):
+        principal_cache.discard(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_usuarios_alterados(session) -> None:
+    """Alterações desfeitas não precisam invalidar nada."""
+    session.info.pop("usuarios_alterados", None)
+
+
 # ============================================================
 # DEPENDÊNCIAS DE AUTENTICAÇÃO (para uso com Depends())
 # ============================================================
 
-async def get_current_user(
+def get_current_user(
     token: str = Depends(oauth2_scheme), 
     session: Session = Depends(get_session)
 ) -> User:
@@ -168,7 +256,12 @@ async def get_current_user(
     
     Esta função é usada como dependência em rotas protegidas.
     Ela extrai o token do header Authorization, valida o JWT,
-    e busca o usuário correspondente no banco de dados.
+    e busca o usuário correspondente (em cache ou no banco de dados).
+    
+    É síncrona de propósito: o FastAPI executa dependências `def`
+    no threadpool, então a consulta ao SQLite nunca bloqueia o event
+    loop (que atende os WebSockets e os demais requests). Não
+    transforme em `async def` sem trocar a consulta por uma assíncrona.
     
     Args:
         token: Token JWT extraído automaticamente pelo oauth2_scheme
@@ -191,19 +284,7 @@ async def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
     
-    try:
-        # Decodifica e valida o token JWT
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        
-        if username is None:
-            raise credentials_exception
-            
-    except JWTError:
-        raise credentials_exception
-    
-    # Busca o usuário no banco de dados
-    user = session.query(User).filter(User.username == username).first()
+    user = _usuario_do_token(token, session)
     
     if user is None:
         raise credentials_exception
@@ -233,13 +314,6 @@ def get_user_from_token(token: str, session: Session) -> Optional[User]:
         ...     print("Token inválido")
     """
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        
-        if username is None:
-            return None
-            
-        return session.query(User).filter(User.username == username).first()
-        
+        return _usuario_do_token(token, session)
     except Exception:
         return None
@@ -0,0 +1,233 @@
+"""
+TwoBolsos Backend - Cache em Memória
+====================================
+
+Este módulo fornece um cache LRU simples, limitado em número de
+entradas, usado para guardar respostas já calculadas, e um
+SingleFlight que junta cálculos idênticos feitos ao mesmo tempo.
+
+Invalidação:
+    O cache do dashboard não é invalidado explicitamente. As chaves
+    incluem a versão da carteira (Negocio.versao), que muda a cada
+    escrita; entradas de versões antigas deixam de ser pedidas e saem
+    naturalmente pelo LRU.
+
+    Os caches de autenticação têm validade (ttl) e são limpos por
+    app/auth.py quando o usuário muda.
+
+Single-flight:
+    Depois de um broadcast, todos os membros da carteira pedem o
+    mesmo dashboard no mesmo instante, antes de qualquer um deles ter
+    preenchido o cache. Com o SingleFlight só o primeiro request
+    calcula; os outros esperam e recebem o mesmo resultado.
+
+Instâncias:
+    - dashboard_cache: Payload do dashboard por (carteira, versão, dias)
+    - dashboard_flight: Cálculos de dashboard em andamento, mesma chave
+    - token_cache: Tokens JWT já verificados (token -> user_id)
+    - principal_cache: Usuários autenticados (user_id -> User)
+
+Variáveis de ambiente:
+    - DASHBOARD_CACHE_SIZE: Máximo de dashboards em memória (default: 256)
+    - AUTH_CACHE_SIZE: Máximo de tokens e de usuários em memória (default: 1024)
+    - AUTH_CACHE_TTL: Validade em segundos das entradas de autenticação (default: 300)
+
+Notas:
+    - O cache é por processo; com vários workers cada um tem o seu
+    - Thread-safe: as rotas síncronas rodam no threadpool do FastAPI
+
+Autor: K4nishi
+Versão: 3.0.0
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+# ============================================================
+# CACHE LRU
+# ============================================================
+
+class LRUCache:
+    """
+    Cache LRU com limite de entradas e contadores de uso.
+
+    Opcionalmente as entradas expiram após `ttl` segundos (o padrão
+    do cache ou um valor por entrada, passado no put).
+
+    Attributes:
+        max_entries: Número máximo de entradas
+        ttl: Validade padrão das entradas em segundos (None = sem validade)
+        hits: Leituras encontradas no cache
+        misses: Leituras que precisaram calcular o valor
+        evictions: Entradas removidas por falta de espaço
+
+    Exemplo:
+        >>> cache = LRUCache(2)
+        >>> cache.put(("a", 1), {"x": 1})
+        >>> cache.get(("a", 1))
+        {'x': 1}
+    """
+
+    def __init__(self, max_entries: int, ttl: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._dados: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, chave: Hashable) -> Optional[Any]:
+        """Retorna o valor (marcando como recente) ou None."""
+        with self._lock:
+            entrada = self._dados.get(chave)
+            if entrada is not None and entrada[0] is not None and entrada[0] <= time.monotonic():
+                del self._dados[chave]
+                entrada = None
+            if entrada is None:
+                self.misses += 1
+                return None
+            self._dados.move_to_end(chave)
+            self.hits += 1
+            return entrada[1]
+
+    def put(self, chave: Hashable, valor: Any, ttl: Optional[float] = None) -> None:
+        """Guarda o valor, removendo os menos usados se passar do limite."""
+        ttl = self.ttl if ttl is None else ttl
+        if self.max_entries <= 0 or (ttl is not None and ttl <= 0):
+            return
+        expira = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._dados[chave] = (expira, valor)
+            self._dados.move_to_end(chave)
+            while len(self._dados) > self.max_entries:
+                self._dados.popitem(last=False)
+                self.evictions += 1
+
+    def discard(self, chave: Hashable) -> None:
+        """Remove a entrada, se existir."""
+        with self._lock:
+            self._dados.pop(chave, None)
+
+    def clear(self) -> None:
+        """Remove todas as entradas (os contadores são mantidos)."""
+        with self._lock:
+            self._dados.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores para o endpoint /metrics."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._dados),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+# ============================================================
+# SINGLE-FLIGHT
+# ============================================================
+
+class _Chamada:
+    """Um cálculo em andamento e o resultado que os demais aguardam."""
+
+    def __init__(self):
+        self.pronto = threading.Event()
+        self.resultado: Any = None
+        self.erro: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Junta chamadas concorrentes com a mesma chave em um único cálculo.
+
+    A primeira chamada para uma chave executa a função; as que chegam
+    enquanto ela roda esperam e recebem o mesmo resultado (ou a mesma
+    exceção). Terminado o cálculo a chave é liberada, então chamadas
+    posteriores calculam de novo (o cache é quem guarda o resultado).
+
+    Attributes:
+        executions: Cálculos realmente executados
+        shared: Chamadas atendidas pelo cálculo de outra (cálculos poupados)
+
+    Exemplo:
+        >>> flight = SingleFlight()
+        >>> flight.do(("dashboard", 1), lambda: calcular(1))
+    """
+
+    def __init__(self):
+        self._chamadas: Dict[Hashable, _Chamada] = {}
+        self._lock = threading.Lock()
+        self.executions = 0
+        self.shared = 0
+
+    def do(self, chave: Hashable, funcao: Callable[[], Any]) -> Any:
+        """Executa funcao() ou aguarda a execução em andamento da mesma chave."""
+        with self._lock:
+            chamada = self._chamadas.get(chave)
+            lider = chamada is None
+            if lider:
+                chamada = self._chamadas[chave] = _Chamada()
+                self.executions += 1
+            else:
+                self.shared += 1
+
+        if not lider:
+            chamada.pronto.wait()
+            if chamada.erro is not None:
+                raise chamada.erro
+            return chamada.resultado
+
+        try:
+            chamada.resultado = funcao()
+            return chamada.resultado
+        except BaseException as e:
+            chamada.erro = e
+            raise
+        finally:
+            with self._lock:
+                del self._chamadas[chave]
+            chamada.pronto.set()
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores para o endpoint /metrics."""
+        with self._lock:
+            return {
+                "in_flight": len(self._chamadas),
+                "executions": self.executions,
+                "shared": self.shared,
+            }
+
+
+# ============================================================
+# INSTÂNCIAS
+# ============================================================
+
+DASHBOARD_CACHE_SIZE = int(os.environ.get("DASHBOARD_CACHE_SIZE", "256"))
+"""Máximo de payloads de dashboard mantidos em memória."""
+
+dashboard_cache = LRUCache(DASHBOARD_CACHE_SIZE)
+"""Payload do dashboard (sem o role do usuário) por (negocio_id, versao, dias)."""
+
+dashboard_flight = SingleFlight()
+"""Cálculos de dashboard em andamento, pela mesma chave do dashboard_cache."""
+
+AUTH_CACHE_SIZE = int(os.environ.get("AUTH_CACHE_SIZE", "1024"))
+"""Máximo de tokens verificados e de usuários mantidos em memória."""
+
+AUTH_CACHE_TTL = float(os.environ.get("AUTH_CACHE_TTL", "300"))
+"""Validade das entradas de autenticação, em segundos."""
+
+token_cache = LRUCache(AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL)
+"""user_id por token JWT com assinatura já verificada (nunca além do exp do token)."""
+
+principal_cache = LRUCache(AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL)
+"""User (desanexado da sessão) por user_id, limpo quando o usuário muda."""
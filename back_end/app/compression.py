@@ -0,0 +1,354 @@
+"""
+TwoBolsos Backend - Compressão de Respostas
+===========================================
+
+Este módulo comprime as respostas HTTP com gzip ou brotli,
+conforme o Accept-Encoding do cliente.
+
+Componentes:
+    - CompressionMiddleware: Comprime as respostas da API
+    - precomprimir_diretorio: Gera, uma única vez, as versões
+      comprimidas dos arquivos do frontend buildado
+    - PrecompressedStaticFiles / arquivo_estatico: Servem essas
+      versões sem comprimir nada por request
+
+Negociação:
+    O cliente informa o que aceita (ex: "gzip, deflate, br").
+    Entre os suportados, vence o de maior q; no empate, brotli.
+    Brotli só é usado se o pacote `brotli` estiver instalado.
+
+ETags:
+    Uma resposta comprimida é outra representação: a ETag forte
+    ganha o sufixo do encoding ('"x"' -> '"x-gzip"'), tanto na API
+    quanto nos arquivos estáticos (ver app/etag.py). Num 304 que passa
+    pelo middleware, a ETag volta na forma que o cliente enviou.
+
+Streaming:
+    Respostas em um único bloco (JSON comum) são comprimidas de uma
+    vez e ganham Content-Length. Respostas em streaming (exportação
+    do extrato) são comprimidas bloco a bloco, com flush a cada bloco,
+    então o cliente continua recebendo os dados conforme são gerados.
+
+Variáveis de ambiente:
+    - COMPRESSION_MIN_SIZE: Tamanho mínimo em bytes para comprimir (default: 1024)
+
+Autor: K4nishi
+Versão: 3.0.0
+"""
+
+import gzip
+import os
+import zlib
+from pathlib import Path
+from typing import Dict, Optional
+
+from fastapi import Request, Response
+from fastapi.responses import FileResponse
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.etag import etag_codificada, nao_modificado, tags_if_none_match
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - depende do ambiente
+    brotli = None
+
+
+COMPRESSION_MIN_SIZE = int(os.environ.get("COMPRESSION_MIN_SIZE", "1024"))
+"""Respostas menores que isso não compensam o custo da compressão."""
+
+TIPOS_COMPRIMIVEIS = (
+    "text/",
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+)
+"""Prefixos de Content-Type que valem a pena comprimir (imagens e zips já vêm comprimidos)."""
+
+SUFIXOS_ESTATICOS = {".js", ".css", ".html", ".svg", ".json", ".txt", ".map"}
+"""Extensões do frontend que recebem versões pré-comprimidas."""
+
+
+# ============================================================
+# NEGOCIAÇÃO
+# ============================================================
+
+def encodings_suportados() -> tuple:
+    """Encodings disponíveis neste processo, em ordem de preferência."""
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def escolher_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    Escolhe o encoding da resposta a partir do Accept-Encoding.
+
+    Exemplo:
+        >>> escolher_encoding("gzip, deflate, br")
+        'br'            # com o pacote brotli instalado
+        >>> escolher_encoding("gzip;q=0")
+        None
+    """
+    if not accept_encoding:
+        return None
+
+    pesos: Dict[str, float] = {}
+    for item in accept_encoding.lower().split(","):
+        nome, _, params = item.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        pesos[nome.strip()] = q
+
+    melhor, melhor_q = None, 0.0
+    for encoding in encodings_suportados():
+        q = pesos.get(encoding, pesos.get("*", 0.0))
+        if q > melhor_q:
+            melhor, melhor_q = encoding, q
+    return melhor
+
+
+def comprimivel(content_type: str) -> bool:
+    """Verifica se o Content-Type vale a pena comprimir."""
+    return content_type.lower().startswith(TIPOS_COMPRIMIVEIS)
+
+
+class _Compressor:
+    """Compressor incremental com a mesma interface para gzip e brotli."""
+
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._obj = brotli.Compressor(quality=4)
+        else:
+            self._obj = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        self.encoding = encoding
+
+    def bloco(self, dados: bytes) -> bytes:
+        """Comprime um bloco e força a saída (para streaming)."""
+        if self.encoding == "br":
+            return self._obj.process(dados) + self._obj.flush()
+        return self._obj.compress(dados) + self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def fim(self, dados: bytes = b"") -> bytes:
+        """Comprime o último bloco e fecha o stream."""
+        if self.encoding == "br":
+            return self._obj.process(dados) + self._obj.finish()
+        return self._obj.compress(dados) + self._obj.flush()
+
+
+# ============================================================
+# MIDDLEWARE
+# ============================================================
+
+class CompressionMiddleware:
+    """
+    Middleware ASGI que comprime respostas HTTP com gzip ou brotli.
+
+    Não comprime:
+        - Respostas menores que minimum_size (em um único bloco)
+        - Tipos que não ganham com compressão (imagens, zip...)
+        - Respostas que já têm Content-Encoding (arquivos pré-comprimidos)
+        - Status sem corpo (204, 304) e conexões WebSocket
+
+    Uso:
+        >>> app.add_middleware(CompressionMiddleware, minimum_size=1024)
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = escolher_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        await _RespostaComprimida(self.app, encoding, self.minimum_size)(scope, receive, send)
+
+
+class _RespostaComprimida:
+    """Estado de uma resposta passando pelo CompressionMiddleware."""
+
+    def __init__(self, app: ASGIApp, encoding: str, minimum_size: int):
+        self.app = app
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.send: Send = None
+        self.inicio: Optional[Message] = None
+        self.compressor: Optional[_Compressor] = None
+        self.repassar = False
+        self.if_none_match: set = set()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.send = send
+        self.if_none_match = tags_if_none_match(Headers(scope=scope))
+        await self.app(scope, receive, self.enviar)
+
+    async def enviar(self, message: Message) -> None:
+        if self.repassar:
+            await self.send(message)
+            return
+
+        if message["type"] == "http.response.start":
+            # Segura o início até ver o primeiro bloco do corpo
+            self.inicio = message
+            return
+
+        if message["type"] != "http.response.body":
+            # Outras extensões (ex: pathsend) seguem sem compressão
+            await self._desistir(message)
+            return
+
+        corpo = message.get("body", b"")
+        mais = message.get("more_body", False)
+
+        if self.compressor is None:
+            headers = MutableHeaders(raw=self.inicio["headers"])
+            if (
+                self.inicio["status"] in (204, 304)
+                or "content-encoding" in headers
+                or not comprimivel(headers.get("content-type", ""))
+                or (not mais and len(corpo) < self.minimum_size)
+            ):
+                if comprimivel(headers.get("content-type", "")):
+                    headers.add_vary_header("Accept-Encoding")
+                if self.inicio["status"] == 304 and "etag" in headers:
+                    # O cliente validou a versão comprimida: confirma a tag dela
+                    codificada = etag_codificada(headers["etag"], self.encoding)
+                    if codificada in self.if_none_match:
+                        headers["ETag"] = codificada
+                await self._desistir(message)
+                return
+
+            self.compressor = _Compressor(self.encoding)
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            if "etag" in headers:
+                headers["ETag"] = etag_codificada(headers["etag"], self.encoding)
+
+            if not mais:
+                # Resposta inteira em um bloco: comprime e informa o tamanho
+                corpo = self.compressor.fim(corpo)
+                headers["Content-Length"] = str(len(corpo))
+                await self.send(self.inicio)
+                await self.send({"type": "http.response.body", "body": corpo})
+                return
+
+            # Streaming: tamanho final desconhecido
+            del headers["Content-Length"]
+            await self.send(self.inicio)
+
+        if mais:
+            dados = self.compressor.bloco(corpo)
+            if dados:
+                await self.send({"type": "http.response.body", "body": dados, "more_body": True})
+        else:
+            await self.send({"type": "http.response.body", "body": self.compressor.fim(corpo)})
+
+    async def _desistir(self, message: Message) -> None:
+        """Envia a resposta como veio, sem comprimir."""
+        self.repassar = True
+        if self.inicio is not None:
+            await self.send(self.inicio)
+        await self.send(message)
+
+
+# ============================================================
+# ARQUIVOS ESTÁTICOS PRÉ-COMPRIMIDOS
+# ============================================================
+
+_precomprimidos: Dict[str, Dict[str, bytes]] = {}
+"""Versões comprimidas por caminho real do arquivo: {"gzip": ..., "br": ...}."""
+
+
+def precomprimir_diretorio(diretorio: Path, minimum_size: int = COMPRESSION_MIN_SIZE) -> int:
+    """
+    Comprime, com nível máximo, os arquivos de texto do diretório.
+
+    Chamada uma vez na inicialização. As versões ficam em memória
+    (o build do frontend tem poucas centenas de KB comprimido), então
+    o diretório não é alterado e pode ser somente leitura.
+
+    Args:
+        diretorio: Raiz do frontend buildado (front_end/dist)
+        minimum_size: Arquivos menores são servidos sem compressão
+
+    Returns:
+        int: Quantidade de arquivos pré-comprimidos
+    """
+    total = 0
+    for arquivo in Path(diretorio).rglob("*"):
+        if not arquivo.is_file() or arquivo.suffix.lower() not in SUFIXOS_ESTATICOS:
+            continue
+        dados = arquivo.read_bytes()
+        if len(dados) < minimum_size:
+            continue
+
+        versoes = {"gzip": gzip.compress(dados, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            versoes["br"] = brotli.compress(dados, quality=11)
+        _precomprimidos[os.path.realpath(arquivo)] = versoes
+        total += 1
+    return total
+
+
+def negociar_arquivo(response: Response, request: Request) -> Response:
+    """
+    Troca uma FileResponse pela versão pré-comprimida, se houver.
+
+    A ETag ganha o sufixo do encoding (cada representação tem a sua),
+    e o If-None-Match é conferido aqui para responder 304.
+    """
+    if not isinstance(response, FileResponse) or response.status_code != 200:
+        return response
+
+    versoes = _precomprimidos.get(os.path.realpath(response.path))
+    if not versoes:
+        return response
+
+    encoding = escolher_encoding(request.headers.get("accept-encoding", ""))
+    response.headers.add_vary_header("Accept-Encoding")
+    if encoding not in versoes:
+        return response
+
+    cabecalhos = {
+        "Content-Encoding": encoding,
+        "Vary": "Accept-Encoding",
+        "Last-Modified": response.headers["last-modified"],
+        "ETag": etag_codificada(response.headers["etag"], encoding),
+    }
+    if nao_modificado(request, cabecalhos["ETag"]):
+        return Response(status_code=304, headers=cabecalhos)
+
+    return Response(versoes[encoding], media_type=response.media_type, headers=cabecalhos)
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """
+    StaticFiles que serve as versões geradas por precomprimir_diretorio.
+
+    Uso:
+        >>> precomprimir_diretorio(FRONTEND_DIR)
+        >>> app.mount("/assets", PrecompressedStaticFiles(directory=assets_dir))
+    """
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        response = await super().get_response(path, scope)
+        return negociar_arquivo(response, Request(scope))
+
+
+def arquivo_estatico(request: Request, caminho: Path) -> Response:
+    """FileResponse para rotas comuns (ex: index.html), com a versão pré-comprimida."""
+    return negociar_arquivo(FileResponse(caminho, stat_result=os.stat(caminho)), request)
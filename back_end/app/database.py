@@ -6,17 +6,36 @@ Este módulo configura a conexão com o banco de dados SQLite
 e fornece funções utilitárias para sessões.
 
 Componentes:
-    - engine: Motor SQLAlchemy para conexão com SQLite
-    - init_db(): Inicializa o banco e cria as tabelas
-    - get_session(): Gerador de sessões para injeção de dependência
+    - engine: Pool de conexões de leitura
+    - write_engine: Conexão única e serializada para escrita
+    - init_db(): Inicializa o banco, cria as tabelas e aplica migrações
+    - get_session(): Sessão de leitura para injeção de dependência
+    - get_write_session(): Sessão de escrita para injeção de dependência
 
 Persistência:
     O banco de dados SQLite é armazenado em arquivo, persistindo
     os dados entre reinicializações. O caminho pode ser configurado
     via variável de ambiente DATABASE_PATH.
 
+Perfil de produção:
+    Toda conexão é aberta em modo WAL (leitores não bloqueiam o
+    escritor e vice-versa), com synchronous=NORMAL, busy_timeout,
+    cache e mmap configuráveis. As escritas passam por uma única
+    conexão que abre transações com BEGIN IMMEDIATE, evitando o
+    erro "database is locked" quando vários membros de uma carteira
+    compartilhada gravam ao mesmo tempo.
+
+Variáveis de ambiente:
+    - DATABASE_PATH: Caminho do arquivo SQLite
+    - DATABASE_JOURNAL_MODE: Modo de journal (default: WAL)
+    - DATABASE_SYNCHRONOUS: Nível de sincronização (default: NORMAL)
+    - DATABASE_BUSY_TIMEOUT_MS: Espera máxima por lock em ms (default: 5000)
+    - DATABASE_CACHE_SIZE_KB: Cache de páginas por conexão em KB (default: 8192)
+    - DATABASE_MMAP_SIZE_MB: Tamanho do mmap em MB (default: 64)
+    - DATABASE_READ_POOL_SIZE: Conexões de leitura no pool (default: 4)
+
 Uso com FastAPI:
-    >>> from app.database import get_session
+    >>> from app.database import get_session, get_write_session
     >>> @router.get("/items")
     >>> def get_items(session: Session = Depends(get_session)):
     ...     return session.query(Item).all()
@@ -29,6 +48,8 @@ import os
 from typing import Generator
 from pathlib import Path
 
+from sqlalchemy import event, inspect
+from sqlalchemy.pool import QueuePool
 from sqlmodel import SQLModel, create_engine, Session
 
 
@@ -61,28 +82,111 @@ SQLITE_URL = f"sqlite:///{DATABASE_PATH}"
 """URL de conexão SQLite no formato SQLAlchemy."""
 
 
+# ============================================================
+# PERFIL DE PRODUÇÃO DO SQLITE (PRAGMAS)
+# ============================================================
+
+JOURNAL_MODE = os.environ.get("DATABASE_JOURNAL_MODE", "WAL")
+"""Modo de journal. WAL permite leituras concorrentes com uma escrita."""
+
+SYNCHRONOUS = os.environ.get("DATABASE_SYNCHRONOUS", "NORMAL")
+"""NORMAL é seguro em WAL e evita um fsync a cada commit."""
+
+BUSY_TIMEOUT_MS = int(os.environ.get("DATABASE_BUSY_TIMEOUT_MS", "5000"))
+"""Tempo que uma conexão espera por um lock antes de falhar."""
+
+CACHE_SIZE_KB = int(os.environ.get("DATABASE_CACHE_SIZE_KB", "8192"))
+"""Cache de páginas por conexão (em KB)."""
+
+MMAP_SIZE_MB = int(os.environ.get("DATABASE_MMAP_SIZE_MB", "64"))
+"""Quantidade do arquivo mapeada em memória (em MB). 0 desativa."""
+
+READ_POOL_SIZE = int(os.environ.get("DATABASE_READ_POOL_SIZE", "4"))
+"""Número de conexões mantidas no pool de leitura."""
+
+
+def apply_pragmas(dbapi_connection, connection_record) -> None:
+    """
+    Aplica o perfil de produção a cada nova conexão SQLite.
+
+    Registrada no evento 'connect' dos dois engines, então vale
+    tanto para o pool de leitura quanto para a conexão de escrita.
+
+    Args:
+        dbapi_connection: Conexão sqlite3 recém-aberta
+        connection_record: Registro do pool (não utilizado)
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    # Valor negativo = tamanho em KB (e não em páginas)
+    cursor.execute(f"PRAGMA cache_size=-{CACHE_SIZE_KB}")
+    cursor.execute(f"PRAGMA mmap_size={MMAP_SIZE_MB * 1024 * 1024}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
 
 # ============================================================
-# ENGINE E CONFIGURAÇÕES DE CONEXÃO
+# ENGINES E CONFIGURAÇÕES DE CONEXÃO
 # ============================================================
 
 # Configuração específica para SQLite
 # check_same_thread=False permite uso em múltiplas threads (necessário para FastAPI)
-connect_args = {"check_same_thread": False}
+connect_args = {"check_same_thread": False, "timeout": BUSY_TIMEOUT_MS / 1000}
 
 engine = create_engine(
-    SQLITE_URL, 
-    connect_args=connect_args, 
+    SQLITE_URL,
+    connect_args=connect_args,
+    poolclass=QueuePool,
+    pool_size=READ_POOL_SIZE,
+    max_overflow=READ_POOL_SIZE,
     echo=False  # True para debug SQL, False em produção
 )
 """
-Engine SQLAlchemy para conexão com o banco.
+Engine SQLAlchemy para leituras.
 
 Notas:
     - echo=False: Não loga queries SQL (mais limpo em produção)
     - check_same_thread=False: Permite threads múltiplas
+    - Pool de READ_POOL_SIZE conexões; em WAL as leituras não
+      esperam pelas escritas
+"""
+
+write_engine = create_engine(
+    SQLITE_URL,
+    connect_args=connect_args,
+    poolclass=QueuePool,
+    pool_size=1,
+    max_overflow=0,
+    pool_timeout=BUSY_TIMEOUT_MS / 1000,
+    echo=False
+)
+"""
+Engine SQLAlchemy para escritas.
+
+Notas:
+    - Pool com exatamente uma conexão: as escritas do processo são
+      serializadas na própria aplicação, sem disputar o lock do SQLite
+    - Transações abrem com BEGIN IMMEDIATE, garantindo o lock de escrita
+      logo no início (respeitando busy_timeout) em vez de falhar no commit
 """
 
+event.listen(engine, "connect", apply_pragmas)
+event.listen(write_engine, "connect", apply_pragmas)
+
+
+@event.listens_for(write_engine, "connect")
+def _disable_pysqlite_transactions(dbapi_connection, connection_record):
+    """Desliga o BEGIN implícito do driver sqlite3 na conexão de escrita."""
+    dbapi_connection.isolation_level = None
+
+
+@event.listens_for(write_engine, "begin")
+def _begin_immediate(conn):
+    """Abre toda transação de escrita já com o lock reservado."""
+    conn.exec_driver_sql("BEGIN IMMEDIATE")
+
 
 # ============================================================
 # FUNÇÕES DE INICIALIZAÇÃO E SESSÃO
@@ -90,49 +194,80 @@ Notas:
 
 def init_db() -> None:
     """
-    Inicializa o banco de dados criando todas as tabelas definidas nos models.
-    
+    Inicializa o banco de dados e aplica as migrações pendentes.
+
     Esta função deve ser chamada na inicialização da aplicação
     (evento startup do FastAPI). Ela usa create_all() que é
-    idempotente - não recria tabelas que já existem.
-    
+    idempotente - não recria tabelas que já existem - e em seguida
+    atualiza bancos antigos até a versão atual do esquema.
+
     Exemplo:
         >>> # No main.py:
         >>> @app.on_event("startup")
         >>> def on_startup():
         ...     init_db()
-    
+
     Notas:
         - Importa models dentro da função para evitar imports circulares
         - Todas as classes SQLModel com table=True serão criadas
+        - Tudo roda em uma única transação na conexão de escrita:
+          se uma migração falhar, o banco continua como estava
     """
     # Import aqui para garantir que todos os models são registrados
     # antes de criar as tabelas (evita imports circulares)
     from app import models  # noqa: F401
-    
-    SQLModel.metadata.create_all(engine)
+    from app.migrations import run_migrations
+
+    with write_engine.begin() as conn:
+        fresh = not inspect(conn).has_table("transacao")
+        SQLModel.metadata.create_all(conn)
+        run_migrations(conn, fresh=fresh)
 
 
 def get_session() -> Generator[Session, None, None]:
     """
-    Fornece uma sessão do banco de dados para injeção de dependência.
-    
+    Fornece uma sessão de leitura para injeção de dependência.
+
     Esta é uma função geradora que:
-    1. Cria uma nova sessão
+    1. Cria uma nova sessão no pool de leitura
     2. Fornece a sessão para a rota
     3. Fecha a sessão automaticamente após o uso
-    
+
     Uso com FastAPI Depends:
         >>> @router.get("/users")
         >>> def list_users(session: Session = Depends(get_session)):
         ...     return session.query(User).all()
-    
+
     Yields:
         Session: Sessão SQLModel/SQLAlchemy pronta para uso
-        
+
     Notas:
         - O 'with' garante que a sessão é fechada mesmo se houver exceção
         - Cada request recebe sua própria sessão (thread-safe)
+        - Rotas que gravam dados devem usar get_write_session
     """
     with Session(engine) as session:
         yield session
+
+
+def get_write_session() -> Generator[Session, None, None]:
+    """
+    Fornece uma sessão ligada à conexão de escrita.
+
+    Usada pelas rotas que alteram dados (POST, PATCH, DELETE).
+    Como o pool de escrita tem uma única conexão, requests de
+    escrita simultâneos esperam a vez em vez de disputar o lock
+    do arquivo. Leituras feitas na mesma sessão enxergam as
+    próprias alterações ainda não commitadas.
+
+    Uso com FastAPI Depends:
+        >>> @router.post("/items")
+        >>> def create_item(session: Session = Depends(get_write_session)):
+        ...     session.add(item)
+        ...     session.commit()
+
+    Yields:
+        Session: Sessão SQLModel/SQLAlchemy ligada ao write_engine
+    """
+    with Session(write_engine) as session:
+        yield session
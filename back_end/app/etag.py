@@ -0,0 +1,117 @@
+"""
+TwoBolsos Backend - ETags (GET Condicional)
+===========================================
+
+Este módulo gera ETags a partir dos contadores de versão das
+carteiras (Negocio.versao) e responde 304 Not Modified quando o
+cliente já tem a versão atual.
+
+Funcionamento:
+    1. A rota verifica a permissão e monta a tag com o que define
+       a resposta (ex: carteira, versão, parâmetros, role)
+    2. Se o If-None-Match do request contém a tag, responde 304
+       sem calcular nada
+    3. Senão calcula normalmente e devolve a tag no header ETag
+
+    O navegador guarda a resposta (Cache-Control: private, no-cache)
+    e revalida sozinho com If-None-Match; para o frontend um 304 é
+    transparente e chega como a resposta 200 guardada.
+
+Compressão:
+    Cada content-coding é uma representação diferente e precisa da
+    sua própria ETag forte (RFC 9110). O CompressionMiddleware troca
+    '"x"' por '"x-gzip"' / '"x-br"' ao comprimir (ver etag_codificada),
+    e nao_modificado() aceita essas variantes da tag da rota, então os
+    routers continuam comparando só a tag base.
+
+Uso nos routers:
+    >>> tag = etag("dashboard", n.id, n.versao, dias)
+    >>> if nao_modificado(request, tag):
+    ...     return resposta_304(tag)
+    >>> marcar_etag(response, tag)
+
+Autor: K4nishi
+Versão: 3.0.0
+"""
+
+import hashlib
+
+from fastapi import Request, Response
+
+
+CACHE_CONTROL = "private, no-cache"
+"""Permite ao navegador guardar a resposta, mas sempre revalidando."""
+
+ENCODINGS_ETAG = ("gzip", "br")
+"""Content-codings que ganham sufixo na ETag (ver etag_codificada)."""
+
+
+def etag(*partes) -> str:
+    """
+    Monta uma ETag forte a partir das partes que definem a resposta.
+
+    Exemplo:
+        >>> etag("fixas", 1, 7, 202412)
+        '"fixas-1-7-202412"'
+    """
+    texto = "-".join(str(p) for p in partes)
+    if len(texto) > 64 or not texto.isascii():
+        texto = hashlib.sha1(texto.encode("utf-8")).hexdigest()
+    return f'"{texto}"'
+
+
+def etag_codificada(tag: str, encoding: str) -> str:
+    """
+    ETag da representação comprimida com `encoding`.
+
+    Exemplo:
+        >>> etag_codificada('"fixas-1-7"', "gzip")
+        '"fixas-1-7-gzip"'
+
+    Tags fracas (W/) ficam como estão: já não prometem bytes idênticos.
+    """
+    if tag.startswith("W/") or not tag.endswith('"'):
+        return tag
+    return f'{tag[:-1]}-{encoding}"'
+
+
+def _sem_encoding(tag: str) -> str:
+    """Remove o sufixo de content-coding de uma tag ('"x-br"' -> '"x"')."""
+    for encoding in ENCODINGS_ETAG:
+        sufixo = f'-{encoding}"'
+        if tag.endswith(sufixo):
+            return tag[:-len(sufixo)] + '"'
+    return tag
+
+
+def tags_if_none_match(headers) -> set:
+    """Tags do If-None-Match, sem o prefixo W/ (comparação fraca)."""
+    header = headers.get("if-none-match") or ""
+    return {t.strip().removeprefix("W/") for t in header.split(",") if t.strip()}
+
+
+def nao_modificado(request: Request, tag: str) -> bool:
+    """
+    Verifica se o If-None-Match do request já contém a tag.
+
+    Segue a comparação fraca da RFC 9110 (W/"x" equivale a "x"),
+    que é a exigida para If-None-Match. A tag de uma versão comprimida
+    ('"x-gzip"') também vale para a tag base '"x"': o conteúdo é o mesmo.
+    """
+    candidatas = tags_if_none_match(request.headers)
+    if not candidatas:
+        return False
+    if "*" in candidatas:
+        return True
+    return tag in candidatas or tag in {_sem_encoding(t) for t in candidatas}
+
+
+def marcar_etag(response: Response, tag: str) -> None:
+    """Adiciona ETag e Cache-Control à resposta."""
+    response.headers["ETag"] = tag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+
+
+def resposta_304(tag: str) -> Response:
+    """Resposta 304 Not Modified, sem corpo."""
+    return Response(status_code=304, headers={"ETag": tag, "Cache-Control": CACHE_CONTROL})
@@ -0,0 +1,131 @@
+"""
+TwoBolsos Backend - Exportação do Extrato
+=========================================
+
+Este módulo gera o extrato completo de uma carteira em CSV ou
+NDJSON (um objeto JSON por linha), em streaming.
+
+Funcionamento:
+    - A consulta roda com stream_results: as linhas saem do cursor
+      em blocos de EXPORT_CHUNK_SIZE, sem carregar a carteira inteira
+    - Cada bloco é formatado e enviado ao cliente antes do próximo
+      ser lido, então memória e tempo até o primeiro byte não
+      dependem do tamanho da carteira
+    - O gerador abre a própria conexão de leitura (o StreamingResponse
+      continua depois que a sessão do request foi fechada)
+
+Uso nos routers:
+    >>> return StreamingResponse(gerar_csv(id, inicio, fim), media_type="text/csv")
+
+Variáveis de ambiente:
+    - EXPORT_CHUNK_SIZE: Linhas por bloco (default: 1000)
+
+Autor: K4nishi
+Versão: 3.0.0
+"""
+
+import csv
+import io
+import json
+import os
+from datetime import date
+from typing import Iterator, Optional, Sequence
+
+from sqlalchemy import Row
+from sqlmodel import select
+
+from app.database import engine
+from app.models import Transacao, User
+
+
+EXPORT_CHUNK_SIZE = int(os.environ.get("EXPORT_CHUNK_SIZE", "1000"))
+"""Número de linhas lidas do cursor e enviadas por bloco."""
+
+COLUNAS = [
+    "id", "data", "tipo", "valor", "descricao", "tag",
+    "km", "litros", "fixa_id", "created_by_name"
+]
+"""Colunas exportadas, na ordem do CSV."""
+
+
+# ============================================================
+# LEITURA
+# ============================================================
+
+def blocos_extrato(
+    negocio_id: int,
+    inicio: Optional[date] = None,
+    fim: Optional[date] = None,
+    tamanho: int = EXPORT_CHUNK_SIZE
+) -> Iterator[Sequence[Row]]:
+    """
+    Lê as transações da carteira em blocos, por (data, id).
+
+    Args:
+        negocio_id: ID da carteira
+        inicio: Primeiro dia incluído (opcional)
+        fim: Último dia incluído (opcional)
+        tamanho: Linhas por bloco
+
+    Yields:
+        list: Linhas com as colunas de COLUNAS
+    """
+    query = (
+        select(
+            Transacao.id,
+            Transacao.data,
+            Transacao.tipo,
+            Transacao.valor,
+            Transacao.descricao,
+            Transacao.tag,
+            Transacao.km,
+            Transacao.litros,
+            Transacao.fixa_id,
+            User.username
+        )
+        .outerjoin(User, User.id == Transacao.created_by_id)
+        .where(Transacao.negocio_id == negocio_id)
+        .order_by(Transacao.data, Transacao.id)
+    )
+    if inicio:
+        query = query.where(Transacao.data >= inicio)
+    if fim:
+        query = query.where(Transacao.data <= fim)
+
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True).execute(query)
+        for bloco in result.partitions(tamanho):
+            yield bloco
+
+
+# ============================================================
+# FORMATOS
+# ============================================================
+
+def gerar_csv(negocio_id: int, inicio: Optional[date] = None, fim: Optional[date] = None) -> Iterator[str]:
+    """Gera o extrato em CSV (cabeçalho + um bloco de texto por bloco do cursor)."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow(COLUNAS)
+    yield buffer.getvalue()
+
+    for bloco in blocos_extrato(negocio_id, inicio, fim):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(
+            (r[0], r[1].isoformat(), *r[2:9], r[9] or "N/A") for r in bloco
+        )
+        yield buffer.getvalue()
+
+
+def gerar_ndjson(negocio_id: int, inicio: Optional[date] = None, fim: Optional[date] = None) -> Iterator[str]:
+    """Gera o extrato em NDJSON (um objeto por linha)."""
+    for bloco in blocos_extrato(negocio_id, inicio, fim):
+        yield "".join(
+            json.dumps(
+                dict(zip(COLUNAS, (r[0], r[1].isoformat(), *r[2:9], r[9] or "N/A"))),
+                ensure_ascii=False
+            ) + "\n"
+            for r in bloco
+        )
@@ -0,0 +1,221 @@
+"""
+TwoBolsos Backend - Pool de Hash de Senhas
+==========================================
+
+Este módulo executa o bcrypt (hash e verificação de senhas) em um
+pool de processos dedicado, com tamanho e fila limitados.
+
+Por que:
+    O bcrypt é lento de propósito (dezenas a centenas de ms por
+    chamada). Rodando nas rotas síncronas, uma rajada de logins
+    ocupava o threadpool do FastAPI, o mesmo que atende dashboards
+    e transações. Aqui o trabalho vai para outros processos (sem
+    disputar o GIL) e as rotas de login/registro apenas aguardam,
+    sem prender nenhuma thread.
+
+Limite de fila:
+    Cada hash/verificação ocupa uma vaga até terminar. Com todas as
+    PASSWORD_QUEUE_LIMIT vagas ocupadas o pedido falha na hora com
+    503 (e Retry-After), em vez de acumular espera e degradar a API.
+
+Ciclo de vida:
+    - iniciar_pool(): no startup (cria os processos de uma vez)
+    - encerrar_pool(): no shutdown
+
+Falhas:
+    Se um processo filho morrer (OOM killer, sinal), o executor fica
+    quebrado e recusa qualquer tarefa nova. O pool quebrado é então
+    descartado, um novo é criado e a operação é repetida uma vez (hash
+    e verificação não têm efeito colateral). Se falhar de novo, ou se
+    o pool novo não subir, 503.
+
+    O pool novo nasce com o servidor já rodando (threadpool, executores
+    do asyncio, poller do backplane), então usa forkserver/spawn em vez
+    de fork, e é aquecido numa thread para não travar o event loop.
+
+Variáveis de ambiente:
+    - PASSWORD_POOL_SIZE: Processos do pool (default: 2)
+    - PASSWORD_QUEUE_LIMIT: Hashes em andamento + na fila (default: 16)
+
+Autor: K4nishi
+Versão: 3.0.0
+"""
+
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import HTTPException, status
+
+from app.auth import get_password_hash, verify_password
+
+
+PASSWORD_POOL_SIZE = int(os.environ.get("PASSWORD_POOL_SIZE", "2"))
+"""Número de processos dedicados ao bcrypt."""
+
+PASSWORD_QUEUE_LIMIT = int(os.environ.get("PASSWORD_QUEUE_LIMIT", "16"))
+"""Máximo de operações em andamento ou aguardando um processo livre."""
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pendentes = 0
+_contadores = {"completed": 0, "rejected": 0, "restarts": 0}
+_troca = asyncio.Lock()
+
+
+# ============================================================
+# CICLO DE VIDA
+# ============================================================
+
+def _contexto(startup: bool = True) -> multiprocessing.context.BaseContext:
+    """
+    Contexto dos processos filhos.
+
+    No startup usa fork quando disponível: o filho já tem o passlib
+    carregado e não reexecuta o módulo principal (o que, com spawn,
+    refaria toda a inicialização do main.py da raiz em cada processo).
+
+    Depois do startup o processo já tem outras threads, e um fork
+    copiaria locks presos por elas. Aí usa forkserver (o servidor
+    importa o módulo principal e o app.auth uma vez só e os filhos
+    nascem dele) ou, sem ele, spawn.
+    """
+    metodos = multiprocessing.get_all_start_methods()
+    if startup:
+        if "fork" in metodos:
+            return multiprocessing.get_context("fork")
+        return multiprocessing.get_context()
+    if "forkserver" in metodos:
+        contexto = multiprocessing.get_context("forkserver")
+        contexto.set_forkserver_preload(["__main__", "app.auth"])
+        return contexto
+    return multiprocessing.get_context("spawn")
+
+
+def _aquecer() -> None:
+    """Tarefa vazia, só para o pool criar os processos."""
+
+
+def _aquecer_pool(pool: ProcessPoolExecutor) -> None:
+    """Espera o pool subir um processo (bloqueia: chamar fora do event loop)."""
+    pool.submit(_aquecer).result()
+
+
+def iniciar_pool() -> None:
+    """
+    Cria o pool e seus processos.
+
+    Chamada no startup, antes do servidor abrir threads de trabalho,
+    para que o fork aconteça com o processo ainda tranquilo. Durante
+    os requests, quem recria o pool é _pool_pronto().
+    """
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=PASSWORD_POOL_SIZE, mp_context=_contexto())
+        _aquecer_pool(_pool)
+
+
+def encerrar_pool() -> None:
+    """Encerra os processos do pool (no shutdown)."""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=True, cancel_futures=True)
+        _pool = None
+
+
+async def _pool_pronto(
+    quebrado: Optional[ProcessPoolExecutor] = None,
+) -> Optional[ProcessPoolExecutor]:
+    """
+    Pool atual, recriado se não existir ou se for o `quebrado`.
+
+    Com vários pedidos falhando juntos, apenas o primeiro recria os
+    processos; os outros esperam no lock e recebem o pool novo.
+
+    Returns:
+        O pool pronto, ou None se o pool novo também quebrar ao subir
+    """
+    global _pool
+    async with _troca:
+        if _pool is not None and _pool is not quebrado:
+            return _pool
+        if _pool is not None:
+            _pool = None
+            quebrado.shutdown(wait=False, cancel_futures=True)
+            _contadores["restarts"] += 1
+
+        novo = ProcessPoolExecutor(max_workers=PASSWORD_POOL_SIZE, mp_context=_contexto(startup=False))
+        try:
+            await asyncio.to_thread(_aquecer_pool, novo)
+        except BrokenProcessPool:
+            novo.shutdown(wait=False, cancel_futures=True)
+            return None
+        _pool = novo
+        return novo
+
+
+# ============================================================
+# EXECUÇÃO
+# ============================================================
+
+async def _executar(funcao: Callable[..., Any], *args: Any) -> Any:
+    """
+    Executa funcao(*args) no pool, respeitando o limite de fila.
+
+    Raises:
+        HTTPException 503: Se todas as vagas estiverem ocupadas, ou se
+            o pool continuar quebrado (ou não subir) depois de recriado
+    """
+    global _pendentes
+    if _pendentes >= PASSWORD_QUEUE_LIMIT:
+        _contadores["rejected"] += 1
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Servidor ocupado, tente novamente em instantes",
+            headers={"Retry-After": "1"},
+        )
+
+    _pendentes += 1
+    try:
+        quebrado = None
+        for _ in range(2):
+            pool = await _pool_pronto(quebrado)
+            if pool is None:
+                break
+            try:
+                resultado = await asyncio.wrap_future(pool.submit(funcao, *args))
+            except BrokenProcessPool:
+                quebrado = pool
+                continue
+            _contadores["completed"] += 1
+            return resultado
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Servidor ocupado, tente novamente em instantes",
+            headers={"Retry-After": "1"},
+        )
+    finally:
+        _pendentes -= 1
+
+
+async def verificar_senha(plain_password: str, hashed_password: str) -> bool:
+    """verify_password() executado no pool de processos."""
+    return await _executar(verify_password, plain_password, hashed_password)
+
+
+async def gerar_hash_senha(password: str) -> str:
+    """get_password_hash() executado no pool de processos."""
+    return await _executar(get_password_hash, password)
+
+
+def stats() -> Dict[str, Any]:
+    """Contadores para o endpoint /metrics."""
+    return {
+        "workers": PASSWORD_POOL_SIZE,
+        "queue_limit": PASSWORD_QUEUE_LIMIT,
+        "pending": _pendentes,
+        **_contadores,
+    }
@@ -0,0 +1,355 @@
+"""
+TwoBolsos Backend - Importação de Extratos
+==========================================
+
+Este módulo lê extratos bancários (CSV ou OFX) e grava as linhas
+como transações de uma carteira.
+
+Pipeline (tudo em streaming, linha a linha):
+    arquivo -> ler_csv()/ler_ofx() -> LinhaExtrato
+            -> importar_extrato() -> lotes de IMPORT_BATCH_SIZE linhas
+            -> INSERT (executemany) + ledger + commit por lote
+
+Memória:
+    Os leitores são geradores e o importador só guarda o lote atual,
+    mais um contador por conteúdo distinto do arquivo (algumas dezenas
+    de bytes cada), então extratos com centenas de milhares de linhas
+    cabem na instância de 512 MB.
+
+Deduplicação:
+    Cada linha recebe o hash de conteúdo (ver models.hash_conteudo),
+    o mesmo gravado pelo formulário e pelo lote. Linhas idênticas são
+    numeradas pela ordem em que aparecem no arquivo (0, 1, 2...), em
+    qualquer posição, e a n-ésima só é gravada se a carteira tinha
+    menos de n+1 transações com aquele hash antes da importação.
+    Assim reimportar o extrato não duplica nada, dois cafés iguais
+    no mesmo dia continuam sendo dois, e lançamentos feitos à mão
+    contam como já importados.
+
+Variáveis de ambiente:
+    - IMPORT_BATCH_SIZE: Linhas por commit (default: 500)
+
+Autor: K4nishi
+Versão: 3.0.0
+"""
+
+import csv
+import os
+import re
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, TextIO, Union
+
+from sqlalchemy import func, insert
+from sqlmodel import Session, SQLModel, select
+
+from app.ledger import registrar_transacoes
+from app.models import VALOR_MAXIMO, Transacao, TransacaoCreate, hash_conteudo
+
+
+IMPORT_BATCH_SIZE = int(os.environ.get("IMPORT_BATCH_SIZE", "500"))
+"""Número de linhas gravadas por commit."""
+
+MAX_ERROS_RELATORIO = 20
+"""Quantos erros de linha são devolvidos no relatório (o total é sempre contado)."""
+
+
+# ============================================================
+# CONFIGURAÇÃO E TIPOS
+# ============================================================
+
+class MapeamentoCSV(SQLModel):
+    """
+    Mapeamento das colunas do CSV para os campos da transação.
+
+    Os nomes são os do cabeçalho do arquivo. O padrão segue o
+    formato mais comum dos bancos brasileiros (';' e vírgula decimal).
+
+    Attributes:
+        data: Coluna com a data
+        descricao: Coluna com a descrição/histórico
+        valor: Coluna com o valor (negativo = despesa, se não houver tipo)
+        tipo: Coluna opcional com 'receita'/'despesa' (ou 'C'/'D')
+        tag: Coluna opcional com a categoria
+        formato_data: Formato strptime da data
+        separador_decimal: ',' ou '.'
+        delimitador: Separador de colunas
+    """
+    data: str = "data"
+    descricao: str = "descricao"
+    valor: str = "valor"
+    tipo: Optional[str] = None
+    tag: Optional[str] = None
+    formato_data: str = "%d/%m/%Y"
+    separador_decimal: str = ","
+    delimitador: str = ";"
+
+
+class LinhaExtrato(NamedTuple):
+    """
+    Resultado da leitura de uma linha do arquivo.
+
+    Attributes:
+        numero: Número da linha no arquivo (ou do lançamento no OFX)
+        transacao: Transação válida, ou None se a linha foi rejeitada
+        erro: Motivo da rejeição
+    """
+    numero: int
+    transacao: Optional[TransacaoCreate]
+    erro: Optional[str] = None
+
+
+# ============================================================
+# CONVERSÕES
+# ============================================================
+
+def parse_valor(texto: str, separador_decimal: str = ",") -> Decimal:
+    """
+    Converte um valor de extrato em Decimal.
+
+    Aceita 'R$', espaços, separador de milhar e negativos
+    com sinal ou entre parênteses. Rejeita NaN, infinito e valores
+    acima de VALOR_MAXIMO (não cabem em centavos no banco).
+
+    Exemplo:
+        >>> parse_valor("-R$ 1.234,56")
+        Decimal('-1234.56')
+    """
+    t = texto.strip().replace("R$", "").replace(" ", "")
+    negativo = t.startswith("(") and t.endswith(")")
+    t = t.strip("()")
+    if separador_decimal == ",":
+        t = t.replace(".", "").replace(",", ".")
+    else:
+        t = t.replace(",", "")
+    try:
+        valor = Decimal(t)
+    except InvalidOperation:
+        raise ValueError(f"Valor inválido: {texto!r}")
+    if not valor.is_finite() or abs(valor) > VALOR_MAXIMO:
+        raise ValueError(f"Valor inválido: {texto!r}")
+    return -valor if negativo else valor
+
+
+def _tipo_de(texto: Optional[str], valor: Decimal) -> str:
+    """Define receita/despesa pela coluna de tipo ou, sem ela, pelo sinal."""
+    if texto:
+        t = texto.strip().lower()
+        if t in ("receita", "credito", "crédito", "c", "credit"):
+            return "receita"
+        if t in ("despesa", "debito", "débito", "d", "debit"):
+            return "despesa"
+        raise ValueError(f"Tipo inválido: {texto!r}")
+    return "despesa" if valor < 0 else "receita"
+
+
+def _nova_transacao(
+    negocio_id: int, dia: date, valor: Decimal, descricao: str,
+    tipo: Optional[str] = None, tag: Optional[str] = None
+) -> TransacaoCreate:
+    """Monta o TransacaoCreate com valor sempre positivo."""
+    if valor == 0:
+        raise ValueError("Valor zero")
+    return TransacaoCreate(
+        negocio_id=negocio_id,
+        tipo=_tipo_de(tipo, valor),
+        valor=float(abs(valor)),
+        descricao=(descricao or "").strip() or "Importado",
+        tag=(tag or "").strip() or "Importado",
+        data=dia
+    )
+
+
+# ============================================================
+# LEITORES (GERADORES)
+# ============================================================
+
+def ler_csv(arquivo: TextIO, negocio_id: int, mapeamento: MapeamentoCSV) -> Iterator[LinhaExtrato]:
+    """
+    Lê um CSV linha a linha.
+
+    Args:
+        arquivo: Arquivo texto aberto (não é lido inteiro)
+        negocio_id: Carteira de destino
+        mapeamento: Colunas e formatos do arquivo
+
+    Yields:
+        LinhaExtrato: Uma por linha de dados
+    """
+    reader = csv.DictReader(arquivo, delimiter=mapeamento.delimitador)
+
+    obrigatorias = [mapeamento.data, mapeamento.descricao, mapeamento.valor]
+    faltando = [c for c in obrigatorias if c not in (reader.fieldnames or [])]
+    if faltando:
+        raise ValueError(f"Colunas não encontradas no CSV: {', '.join(faltando)}")
+
+    for row in reader:
+        numero = reader.line_num
+        try:
+            dia = datetime.strptime(row[mapeamento.data].strip(), mapeamento.formato_data).date()
+            valor = parse_valor(row[mapeamento.valor] or "", mapeamento.separador_decimal)
+            t = _nova_transacao(
+                negocio_id, dia, valor, row[mapeamento.descricao],
+                tipo=row.get(mapeamento.tipo) if mapeamento.tipo else None,
+                tag=row.get(mapeamento.tag) if mapeamento.tag else None
+            )
+            yield LinhaExtrato(numero, t)
+        except (ValueError, TypeError, AttributeError) as e:
+            yield LinhaExtrato(numero, None, str(e))
+
+
+_TAG_OFX = re.compile(r"<(/?)([A-Za-z0-9.]+)>([^<]*)")
+"""Uma tag OFX e o texto até a próxima tag (funciona em SGML e XML)."""
+
+
+def ler_ofx(arquivo: TextIO, negocio_id: int) -> Iterator[LinhaExtrato]:
+    """
+    Lê os lançamentos (<STMTTRN>) de um arquivo OFX linha a linha.
+
+    Usa DTPOSTED, TRNAMT e MEMO (ou NAME). O sinal de TRNAMT
+    define receita/despesa.
+
+    Args:
+        arquivo: Arquivo texto aberto (não é lido inteiro)
+        negocio_id: Carteira de destino
+
+    Yields:
+        LinhaExtrato: Uma por lançamento
+    """
+    numero = 0
+    atual: Optional[Dict[str, str]] = None
+
+    for linha in arquivo:
+        for m in _TAG_OFX.finditer(linha):
+            fecha, nome, texto = m.group(1), m.group(2).upper(), m.group(3).strip()
+
+            if nome == "STMTTRN":
+                if not fecha:
+                    atual = {}
+                    continue
+                if atual is None:
+                    continue
+                numero += 1
+                try:
+                    dia = datetime.strptime(atual.get("DTPOSTED", "")[:8], "%Y%m%d").date()
+                    valor = parse_valor(atual.get("TRNAMT", ""), ".")
+                    descricao = atual.get("MEMO") or atual.get("NAME") or ""
+                    yield LinhaExtrato(numero, _nova_transacao(negocio_id, dia, valor, descricao))
+                except (ValueError, TypeError) as e:
+                    yield LinhaExtrato(numero, None, str(e))
+                atual = None
+            elif atual is not None and not fecha and texto:
+                atual[nome] = texto
+
+
+# ============================================================
+# IMPORTAÇÃO EM LOTES
+# ============================================================
+
+def _gravar_lote(
+    session: Session, negocio_id: int, user_id: int,
+    lote: List[TransacaoCreate], hashes: List[str], ocorrencias: List[int],
+    existentes: Dict[str, int]
+) -> int:
+    """
+    Grava um lote ignorando as linhas que a carteira já tinha.
+
+    Args:
+        ocorrencias: Número de cada linha entre as idênticas do arquivo
+        existentes: Transações por hash na carteira antes da importação;
+            preenchido aqui na primeira vez que cada hash aparece (antes
+            de qualquer INSERT dele) e reaproveitado nos lotes seguintes
+
+    Returns:
+        int: Quantidade inserida
+    """
+    novos = {h for h in hashes if h not in existentes}
+    if novos:
+        contagem = dict(session.exec(
+            select(Transacao.hash_conteudo, func.count()).where(
+                Transacao.negocio_id == negocio_id,
+                Transacao.hash_conteudo.in_(novos)
+            ).group_by(Transacao.hash_conteudo)
+        ).all())
+        for h in novos:
+            existentes[h] = contagem.get(h, 0)
+
+    novas = [
+        (t, h) for t, h, n in zip(lote, hashes, ocorrencias)
+        if n >= existentes[h]
+    ]
+    if novas:
+        session.exec(insert(Transacao), params=[
+            {**t.dict(), "created_by_id": user_id, "hash_conteudo": h}
+            for t, h in novas
+        ])
+        registrar_transacoes(session, [t for t, _ in novas])
+    session.commit()
+    return len(novas)
+
+
+def importar_extrato(
+    session: Session,
+    negocio_id: int,
+    user_id: int,
+    linhas: Iterable[LinhaExtrato],
+    tamanho_lote: int = IMPORT_BATCH_SIZE
+) -> Dict[str, Union[int, list]]:
+    """
+    Consome as linhas do leitor e grava em lotes.
+
+    Cada lote é uma transação do banco: um extrato enorme não segura
+    a conexão de escrita do começo ao fim, e uma falha no meio mantém
+    os lotes anteriores (reimportar o arquivo só grava o que faltou).
+
+    Args:
+        session: Sessão de escrita
+        negocio_id: Carteira de destino
+        user_id: Usuário que está importando (created_by_id)
+        linhas: Gerador de LinhaExtrato (ler_csv ou ler_ofx)
+        tamanho_lote: Linhas por commit
+
+    Returns:
+        dict: inseridas, ignoradas (duplicadas), rejeitadas e
+              os primeiros erros ({"linha", "erro"})
+    """
+    relatorio = {"inseridas": 0, "ignoradas": 0, "rejeitadas": 0, "erros": []}
+    lote: List[TransacaoCreate] = []
+    hashes: List[str] = []
+    numeros: List[int] = []
+
+    # Linhas idênticas já vistas no arquivo (o hash inclui a data, então
+    # a contagem vale mesmo com o extrato fora de ordem) e transações
+    # por hash que a carteira tinha antes da importação
+    ocorrencias: Dict[str, int] = {}
+    existentes: Dict[str, int] = {}
+
+    def descarregar():
+        inseridas = _gravar_lote(session, negocio_id, user_id, lote, hashes, numeros, existentes)
+        relatorio["inseridas"] += inseridas
+        relatorio["ignoradas"] += len(lote) - inseridas
+        lote.clear()
+        hashes.clear()
+        numeros.clear()
+
+    for numero, t, erro in linhas:
+        if t is None:
+            relatorio["rejeitadas"] += 1
+            if len(relatorio["erros"]) < MAX_ERROS_RELATORIO:
+                relatorio["erros"].append({"linha": numero, "erro": erro})
+            continue
+
+        h = hash_conteudo(t.data, t.tipo, t.valor, t.descricao)
+        n = ocorrencias.get(h, 0)
+        ocorrencias[h] = n + 1
+
+        lote.append(t)
+        hashes.append(h)
+        numeros.append(n)
+        if len(lote) >= tamanho_lote:
+            descarregar()
+
+    if lote:
+        descarregar()
+
+    return relatorio
@@ -0,0 +1,259 @@
+"""
+TwoBolsos Backend - Ledger (Agregados Materializados)
+======================================================
+
+Este módulo mantém os agregados derivados das transações sempre
+em dia, no mesmo commit que grava ou remove cada transação.
+
+Agregados mantidos:
+    - NegocioSaldo: Totais de receita e despesa por carteira
+    - ResumoDiario: Totais por carteira × dia × tipo × categoria
+    - PagamentoFixa: Liberado quando a transação de pagamento é removida
+    - Negocio.versao: Incrementada a cada alteração da carteira
+
+Uso nos routers:
+    >>> session.add(t)
+    >>> registrar_transacoes(session, [t])
+    >>> session.commit()
+
+    >>> estornar_transacoes(session, [t])
+    >>> session.delete(t)
+    >>> session.commit()
+
+Notas:
+    - Os valores são acumulados como Decimal e gravados em centavos,
+      então somar e subtrair a mesma transação sempre volta a zero
+    - As atualizações usam INSERT ... ON CONFLICT DO UPDATE (upsert),
+      uma instrução por carteira afetada, sem ler a tabela antes
+
+Autor: K4nishi
+Versão: 3.0.0
+"""
+
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy import delete, update
+from sqlalchemy.dialects.sqlite import insert
+from sqlmodel import Session, select
+
+from app.models import DespesaFixa, Negocio, NegocioSaldo, PagamentoFixa, ResumoDiario
+
+
+# ============================================================
+# SALDOS POR CARTEIRA
+# ============================================================
+
+def _deltas_por_negocio(transacoes: Iterable, sinal: int) -> Dict[int, List[Decimal]]:
+    """
+    Agrupa os valores das transações por carteira.
+
+    Args:
+        transacoes: Objetos com negocio_id, tipo e valor
+        sinal: +1 para inclusão, -1 para estorno
+
+    Returns:
+        dict: negocio_id -> [delta_receita, delta_despesa]
+    """
+    deltas: Dict[int, List[Decimal]] = defaultdict(lambda: [Decimal(0), Decimal(0)])
+
+    for t in transacoes:
+        valor = Decimal(str(t.valor)) * sinal
+        if t.tipo == 'receita':
+            deltas[t.negocio_id][0] += valor
+        elif t.tipo == 'despesa':
+            deltas[t.negocio_id][1] += valor
+
+    return deltas
+
+
+def _aplicar_saldos(session: Session, transacoes: Iterable, sinal: int) -> None:
+    """Soma (ou subtrai) as transações em NegocioSaldo com um upsert por carteira."""
+    for negocio_id, (receita, despesa) in _deltas_por_negocio(transacoes, sinal).items():
+        stmt = insert(NegocioSaldo).values(
+            negocio_id=negocio_id,
+            receita=receita,
+            despesa=despesa
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[NegocioSaldo.negocio_id],
+            set_={
+                "receita": NegocioSaldo.receita + stmt.excluded.receita,
+                "despesa": NegocioSaldo.despesa + stmt.excluded.despesa,
+            }
+        )
+        session.exec(stmt)
+
+
+# ============================================================
+# RESUMO DIÁRIO
+# ============================================================
+
+ChaveResumo = Tuple[int, date, str, str]
+"""Chave do resumo: (negocio_id, dia, tipo, tag)."""
+
+
+def _deltas_por_dia(transacoes: Iterable, sinal: int) -> Dict[ChaveResumo, list]:
+    """
+    Agrupa as transações pela chave do resumo diário.
+
+    Args:
+        transacoes: Objetos com negocio_id, data, tipo, tag, valor, km e litros
+        sinal: +1 para inclusão, -1 para estorno
+
+    Returns:
+        dict: chave -> [valor, quantidade, km, litros]
+    """
+    deltas: Dict[ChaveResumo, list] = defaultdict(lambda: [Decimal(0), 0, 0.0, 0.0])
+
+    for t in transacoes:
+        chave = (t.negocio_id, t.data, t.tipo, t.tag)
+        d = deltas[chave]
+        d[0] += Decimal(str(t.valor)) * sinal
+        d[1] += sinal
+        d[2] += (t.km or 0.0) * sinal
+        d[3] += (t.litros or 0.0) * sinal
+
+    return deltas
+
+
+def _upsert_resumo():
+    """INSERT ... ON CONFLICT que soma os deltas na linha existente."""
+    tabela = ResumoDiario.__table__
+    stmt = insert(tabela)
+    return stmt.on_conflict_do_update(
+        index_elements=[tabela.c.negocio_id, tabela.c.dia, tabela.c.tipo, tabela.c.tag],
+        set_={
+            "valor": tabela.c.valor + stmt.excluded.valor,
+            "quantidade": tabela.c.quantidade + stmt.excluded.quantidade,
+            "km": tabela.c.km + stmt.excluded.km,
+            "litros": tabela.c.litros + stmt.excluded.litros,
+        }
+    )
+
+
+def _aplicar_resumo(session: Session, transacoes: Iterable, sinal: int) -> None:
+    """
+    Soma (ou subtrai) as transações em ResumoDiario.
+
+    Todas as chaves afetadas vão em um único executemany, então um
+    lote grande (importação, bulk) custa uma instrução e não uma por dia.
+    """
+    deltas = _deltas_por_dia(transacoes, sinal)
+    if not deltas:
+        return
+
+    session.exec(_upsert_resumo(), params=[
+        {
+            "negocio_id": negocio_id,
+            "dia": dia,
+            "tipo": tipo,
+            "tag": tag,
+            "valor": valor,
+            "quantidade": qtd,
+            "km": km,
+            "litros": litros,
+        }
+        for (negocio_id, dia, tipo, tag), (valor, qtd, km, litros) in deltas.items()
+    ])
+
+    if sinal < 0:
+        # Remove os grupos cuja última transação saiu
+        negocios = {chave[0] for chave in deltas}
+        session.exec(
+            delete(ResumoDiario).where(
+                ResumoDiario.negocio_id.in_(negocios),
+                ResumoDiario.quantidade <= 0
+            )
+        )
+
+
+# ============================================================
+# PAGAMENTOS DE FIXAS
+# ============================================================
+
+def _liberar_pagamentos(session: Session, transacoes: Iterable) -> None:
+    """Remove os PagamentoFixa das transações de pagamento estornadas."""
+    ids = [t.id for t in transacoes if getattr(t, "fixa_id", None) and t.id]
+    if ids:
+        session.exec(delete(PagamentoFixa).where(PagamentoFixa.transacao_id.in_(ids)))
+
+
+# ============================================================
+# API PÚBLICA
+# ============================================================
+
+def marcar_alteracao(session: Session, *negocio_ids: int) -> None:
+    """
+    Incrementa a versão das carteiras alteradas.
+
+    Toda escrita que muda o que os membros veem chama esta função
+    (direto ou via registrar/estornar_transacoes) antes do commit.
+    Caches e ETags usam a versão como chave, então basta ela mudar
+    para que nenhum dado antigo seja servido.
+
+    Args:
+        session: Sessão de escrita
+        negocio_ids: IDs das carteiras alteradas
+    """
+    ids = set(negocio_ids)
+    if ids:
+        session.exec(
+            update(Negocio)
+            .where(Negocio.id.in_(ids))
+            .values(versao=Negocio.versao + 1)
+        )
+
+
+def registrar_transacoes(session: Session, transacoes: Iterable) -> None:
+    """
+    Atualiza os agregados após inserir transações.
+
+    Deve ser chamada na mesma sessão, antes do commit.
+
+    Args:
+        session: Sessão de escrita
+        transacoes: Transações recém-adicionadas (ou schemas de criação)
+    """
+    transacoes = list(transacoes)
+    _aplicar_saldos(session, transacoes, +1)
+    _aplicar_resumo(session, transacoes, +1)
+    marcar_alteracao(session, *(t.negocio_id for t in transacoes))
+
+
+def estornar_transacoes(session: Session, transacoes: Iterable) -> None:
+    """
+    Atualiza os agregados antes de remover transações.
+
+    Deve ser chamada na mesma sessão, antes do commit.
+
+    Args:
+        session: Sessão de escrita
+        transacoes: Transações que serão removidas
+    """
+    transacoes = list(transacoes)
+    _aplicar_saldos(session, transacoes, -1)
+    _aplicar_resumo(session, transacoes, -1)
+    _liberar_pagamentos(session, transacoes)
+    marcar_alteracao(session, *(t.negocio_id for t in transacoes))
+
+
+def remover_negocio(session: Session, negocio_id: int) -> None:
+    """
+    Apaga os agregados de uma carteira que está sendo deletada.
+
+    Args:
+        session: Sessão de escrita
+        negocio_id: ID da carteira
+    """
+    session.exec(delete(NegocioSaldo).where(NegocioSaldo.negocio_id == negocio_id))
+    session.exec(delete(ResumoDiario).where(ResumoDiario.negocio_id == negocio_id))
+    session.exec(
+        delete(PagamentoFixa).where(
+            PagamentoFixa.fixa_id.in_(
+                select(DespesaFixa.id).where(DespesaFixa.negocio_id == negocio_id)
+            )
+        )
+    )
@@ -10,7 +10,9 @@ Endpoints principais:
     - /negocios/*: Carteiras (CRUD, compartilhamento)
     - /transacoes/*: Transações financeiras
     - /negocios/{id}/fixas/*: Despesas fixas
-    - /ws/{user_id}: WebSocket para tempo real
+    - /negocios/{id}/importar: Importação de extratos CSV/OFX
+    - /ws?token=<jwt>: WebSocket para tempo real (assinatura por carteira)
+    - /metrics: Contadores internos (caches), com METRICS_TOKEN
 
 Arquitetura:
     A aplicação segue o padrão de separação por camadas:
@@ -18,8 +20,15 @@ Arquitetura:
     - routers/: Endpoints da API
     - models.py: Modelos de dados
     - database.py: Conexão com banco
+    - migrations.py: Versionamento do esquema
+    - importacao.py: Leitura de extratos em streaming
     - auth.py: Autenticação
-    - realtime/: WebSocket manager
+    - acesso.py: Papéis dos usuários nas carteiras (cache)
+    - hashing.py: Pool de processos do bcrypt
+    - realtime/: WebSocket manager e backplane entre workers
+    - cache.py: Caches em memória
+    - responses.py: Serialização JSON rápida
+    - compression.py: Compressão gzip/brotli
 
 Execução:
     Development:
@@ -27,6 +36,10 @@ Execução:
     
     Production:
         $ uvicorn app.main:app --host 0.0.0.0 --port 8000
+    
+    Production com vários workers (avisos em tempo real compartilhados
+    pelo backplane, ver app/realtime/backplane.py):
+        $ REALTIME_BACKPLANE=sqlite uvicorn app.main:app --workers 4 --port 8000
 
 Documentação automática:
     - Swagger UI: http://localhost:8000/docs
@@ -36,14 +49,25 @@ Autor: K4nishi
 Versão: 3.0.0
 """
 
+import asyncio
+import hmac
+import json
 import os
+from typing import Optional
 
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import Depends, FastAPI, Header, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from sqlmodel import Session
 
-from app.database import init_db
-from app.routers import negocios, transacoes, fixas, auth
-from app.realtime.manager import manager
+from app.acesso import acesso_cache, pode_ler
+from app.auth import get_user_from_token
+from app.cache import dashboard_cache, dashboard_flight, principal_cache, token_cache
+from app.compression import CompressionMiddleware
+from app.database import engine, init_db
+from app import hashing
+from app.routers import negocios, transacoes, fixas, auth, importacao
+from app.realtime.manager import WS_IDLE_TIMEOUT, manager
 
 
 # ============================================================
@@ -67,7 +91,8 @@ app = FastAPI(
     Inclua o token no header: `Authorization: Bearer <token>`
     
     ### WebSocket
-    Conecte-se a `/ws/{user_id}` para receber atualizações em tempo real.
+    Conecte-se a `/ws?token=<jwt>` e assine as carteiras com
+    `{"action": "subscribe", "wallet": <id>}` para receber atualizações.
     """,
     version="3.0.0",
     contact={
@@ -99,19 +124,43 @@ domínios específicos do seu frontend por segurança.
 """
 
 
+# ============================================================
+# COMPRESSÃO (gzip / brotli)
+# ============================================================
+
+app.add_middleware(CompressionMiddleware)
+"""
+Comprime as respostas conforme o Accept-Encoding do cliente,
+a partir de COMPRESSION_MIN_SIZE bytes (ver app/compression.py).
+Payloads de dashboard e exportações caem para uma fração do tamanho.
+"""
+
+
 # ============================================================
 # EVENTOS DE CICLO DE VIDA
 # ============================================================
 
 @app.on_event("startup")
-def on_startup():
+async def on_startup():
     """
     Inicializa recursos quando a aplicação inicia.
     
     Executado uma única vez quando o servidor é iniciado.
-    Cria as tabelas do banco de dados se não existirem.
+    Cria as tabelas do banco de dados se não existirem e
+    aplica as migrações pendentes (ver app/migrations.py).
+    Sobe também o pool de processos do bcrypt (ver app/hashing.py)
+    e liga o backplane de tempo real (ver app/realtime/backplane.py).
     """
     init_db()
+    hashing.iniciar_pool()
+    await manager.iniciar()
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    """Desliga o backplane e encerra o pool de processos do bcrypt."""
+    await manager.encerrar()
+    hashing.encerrar_pool()
 
 
 # ============================================================
@@ -130,29 +179,152 @@ app.include_router(transacoes.router)
 # Rota de despesas fixas
 app.include_router(fixas.router)
 
+# Rota de importação de extratos
+app.include_router(importacao.router)
+
+
+# ============================================================
+# MÉTRICAS
+# ============================================================
+
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+"""Token exigido pelo /metrics. Vazio: o endpoint fica fechado."""
+
+
+async def exigir_token_metrics(authorization: Optional[str] = Header(None)) -> None:
+    """
+    Dependência que protege o /metrics.
+
+    Exige o header `Authorization: Bearer <METRICS_TOKEN>`. Os
+    contadores expõem números de usuários e conexões, então sem
+    METRICS_TOKEN configurado ninguém acessa.
+
+    Raises:
+        HTTPException 403: Token ausente, errado ou não configurado
+    """
+    esperado = f"Bearer {METRICS_TOKEN}".encode()
+    recebido = (authorization or "").encode()
+    if not METRICS_TOKEN or not hmac.compare_digest(recebido, esperado):
+        raise HTTPException(403, "Sem permissão")
+
+
+@app.get("/metrics", tags=["Metrics"], dependencies=[Depends(exigir_token_metrics)])
+async def metrics():
+    """
+    Retorna contadores internos do processo.
+    
+    Útil para acompanhar a eficácia dos caches em produção.
+    Os valores são por processo (cada worker tem os seus).
+    Requer `Authorization: Bearer <METRICS_TOKEN>`.
+
+    É async de propósito: roda no event loop, a mesma thread que altera
+    o estado do manager de WebSocket, e não lê os dicts dele no meio
+    de uma alteração.
+    
+    Returns:
+        dict: Estatísticas por componente
+        
+    Exemplo de resposta:
+        ```json
+        {
+            "dashboard_cache": {
+                "entries": 12, "max_entries": 256,
+                "hits": 340, "misses": 25, "evictions": 0,
+                "hit_ratio": 0.9315
+            },
+            "dashboard_singleflight": {
+                "in_flight": 0, "executions": 25, "shared": 41
+            },
+            "auth_token_cache": {...},
+            "auth_principal_cache": {...},
+            "access_cache": {...},
+            "websocket": {
+                "users": 3, "connections": 5,
+                "wallet_topics": 2, "subscriptions": 6, "queued": 0,
+                "backplane": {
+                    "backend": "sqlite", "published": 52,
+                    "delivered": 160, "errors": 0, "last_id": 1840
+                },
+                "opened": 40, "closed": 35,
+                "messages_sent": 310, "pings_sent": 120,
+                "dropped_overflow": 0, "dropped_timeout": 1,
+                "dropped_error": 0, "dropped_idle": 2, "dropped_limit": 0,
+                "fanout_latency_ms": {
+                    "samples": 310, "p50": 0.4, "p95": 2.1, "max": 5000.3
+                }
+            },
+            "password_pool": {
+                "workers": 2, "queue_limit": 16, "pending": 0,
+                "completed": 120, "rejected": 0, "restarts": 0
+            }
+        }
+        ```
+        
+        Em dashboard_singleflight, `shared` é o número de cálculos
+        poupados: requests que receberam o resultado de outro em andamento.
+        Em websocket, `fanout_latency_ms` mede do broadcast até o envio
+        em cada conexão; `dropped_*` conta as conexões derrubadas por
+        motivo (fila cheia, envio lento, erro, inatividade, limite por
+        usuário) e `opened - closed` deve bater com `connections`.
+    """
+    return {
+        "dashboard_cache": dashboard_cache.stats(),
+        "dashboard_singleflight": dashboard_flight.stats(),
+        "auth_token_cache": token_cache.stats(),
+        "auth_principal_cache": principal_cache.stats(),
+        "access_cache": acesso_cache.stats(),
+        "websocket": manager.stats(),
+        "password_pool": hashing.stats()
+    }
+
 
 # ============================================================
 # WEBSOCKET PARA ATUALIZAÇÕES EM TEMPO REAL
 # ============================================================
 
-@app.websocket("/ws/{user_id}")
-async def websocket_endpoint(websocket: WebSocket, user_id: int):
+def _autenticar_ws(token: str) -> Optional[int]:
+    """Resolve o user_id do token (no threadpool; usa o cache de autenticação)."""
+    with Session(engine) as session:
+        user = get_user_from_token(token, session)
+        return user.id if user else None
+
+
+def _pode_assinar(user_id: int, negocio_id: int) -> bool:
+    """Verifica a leitura da carteira (no threadpool; usa o cache de papéis)."""
+    with Session(engine) as session:
+        return pode_ler(session, user_id, negocio_id)
+
+
+@app.websocket("/ws")
+async def websocket_endpoint(websocket: WebSocket, token: str = ""):
     """
     Endpoint WebSocket para atualizações em tempo real.
     
-    Clientes conectam-se passando seu user_id na URL.
-    Quando dados são alterados (transações, membros, etc),
-    todos os membros da carteira afetada recebem uma notificação.
+    O cliente se autentica com o mesmo JWT da API (query param
+    `token`, já que o navegador não envia headers no WebSocket) e
+    assina as carteiras que está exibindo. Quando dados de uma
+    carteira mudam, só as conexões que a assinam são notificadas.
+    
+    Mensagens do cliente:
+        - {"action": "subscribe", "wallet": 5}: Passa a receber a carteira
+          (ignorado se o usuário não for membro)
+        - {"action": "unsubscribe", "wallet": 5}: Deixa de receber
+        - 'PONG': Resposta ao heartbeat
     
     Mensagens enviadas:
-        - 'UPDATE_DASHBOARD': Dados da carteira mudaram
-        - 'UPDATE_LIST': Lista de carteiras mudou
+        - 'UPDATE_DASHBOARD': Dados de uma carteira assinada mudaram
+        - 'UPDATE_LIST': Lista de carteiras do usuário mudou
+        - 'PING': Heartbeat; sem nenhuma mensagem do cliente em
+          WS_IDLE_TIMEOUT segundos a conexão é fechada (código 1001)
         
     Uso no Frontend:
         ```javascript
-        const ws = new WebSocket(`ws://api.exemplo.com/ws/${userId}`);
+        const ws = new WebSocket(`wss://api.exemplo.com/ws?token=${token}`);
+        ws.onopen = () => ws.send(JSON.stringify({action: 'subscribe', wallet: 5}));
         ws.onmessage = (event) => {
-            if (event.data === 'UPDATE_DASHBOARD') {
+            if (event.data === 'PING') {
+                ws.send('PONG');
+            } else if (event.data === 'UPDATE_DASHBOARD') {
                 // Recarregar dados do dashboard
                 fetchDashboard();
             }
@@ -161,17 +333,42 @@ async def websocket_endpoint(websocket: WebSocket, user_id: int):
     
     Args:
         websocket: Conexão WebSocket do cliente
-        user_id: ID do usuário que está conectando
+        token: JWT obtido em /auth/token
     """
+    user_id = await run_in_threadpool(_autenticar_ws, token) if token else None
+    if user_id is None:
+        # 1008 = policy violation (token ausente ou inválido)
+        await websocket.close(code=1008)
+        return
+    
     # Registra a conexão
-    await manager.connect(user_id, websocket)
+    conexao = await manager.connect(websocket, user_id)
     
     try:
-        # Mantém a conexão aberta, aguardando mensagens
-        while True:
-            # Recebe mensagens (não usamos, mas mantém a conexão viva)
-            await websocket.receive_text()
+        while conexao.aberta:
+            try:
+                texto = await asyncio.wait_for(websocket.receive_text(), WS_IDLE_TIMEOUT)
+            except asyncio.TimeoutError:
+                # Nem o PONG chegou: cliente inativo ou socket morto
+                manager.prune_idle(conexao)
+                break
+            
+            if texto == "PONG":
+                continue
+            try:
+                pedido = json.loads(texto)
+                acao, negocio_id = pedido["action"], int(pedido["wallet"])
+            except (ValueError, TypeError, KeyError, OverflowError):
+                continue
+            
+            if acao == "subscribe":
+                if await run_in_threadpool(_pode_assinar, user_id, negocio_id):
+                    manager.subscribe(conexao, negocio_id)
+            elif acao == "unsubscribe":
+                manager.unsubscribe(conexao, negocio_id)
             
     except WebSocketDisconnect:
+        pass
+    finally:
         # Remove a conexão quando o cliente desconecta
-        manager.disconnect(user_id, websocket)
+        manager.disconnect(conexao)
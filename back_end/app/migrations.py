@@ -0,0 +1,307 @@
+"""
+TwoBolsos Backend - Schema Migrations
+======================================
+
+Este módulo mantém o esquema do banco SQLite atualizado entre versões.
+
+Funcionamento:
+    - A versão do esquema fica gravada no próprio banco
+      (PRAGMA user_version), sem tabelas extras
+    - Cada migração é uma função registrada com @migration(versao, descricao)
+    - Na inicialização, as migrações com versão maior que a gravada
+      são aplicadas em ordem, dentro da mesma transação
+    - Se qualquer passo falhar, nada é gravado e a versão não muda
+
+Bancos novos:
+    Quando o banco ainda não tem tabelas, create_all() já gera o
+    esquema mais recente; as migrações são apenas marcadas como aplicadas.
+
+Bancos existentes:
+    Um twobolsos_v2.db criado por versões anteriores (user_version = 0)
+    recebe todas as migrações, sem perda de dados.
+
+Adicionando uma migração:
+    >>> @migration(2, "Descrição curta da mudança")
+    >>> def _v2(conn):
+    ...     conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ...")
+
+Autor: K4nishi
+Versão: 3.0.0
+"""
+
+from datetime import date
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from sqlalchemy import Table, inspect
+from sqlalchemy.engine import Connection
+from sqlalchemy.schema import CreateTable
+
+
+# ============================================================
+# REGISTRO DE MIGRAÇÕES
+# ============================================================
+
+class Migration(NamedTuple):
+    """
+    Uma migração de esquema.
+
+    Attributes:
+        version: Número sequencial da migração (1, 2, 3...)
+        descricao: Texto curto descrevendo a mudança
+        upgrade: Função que recebe a conexão e aplica a mudança
+    """
+    version: int
+    descricao: str
+    upgrade: Callable[[Connection], None]
+
+
+MIGRATIONS: List[Migration] = []
+"""Lista de migrações registradas, em ordem de versão."""
+
+
+def migration(version: int, descricao: str):
+    """
+    Decorator que registra uma função como migração.
+
+    Args:
+        version: Número da migração (deve ser o próximo da sequência)
+        descricao: Descrição curta da mudança
+
+    Raises:
+        ValueError: Se a versão não for a próxima da sequência
+    """
+    def decorator(fn: Callable[[Connection], None]):
+        expected = len(MIGRATIONS) + 1
+        if version != expected:
+            raise ValueError(f"Migração {version} fora de ordem (esperado {expected})")
+        MIGRATIONS.append(Migration(version, descricao, fn))
+        return fn
+    return decorator
+
+
+# ============================================================
+# VERSÃO DO ESQUEMA
+# ============================================================
+
+def get_schema_version(conn: Connection) -> int:
+    """Retorna a versão do esquema gravada no banco."""
+    return conn.exec_driver_sql("PRAGMA user_version").scalar() or 0
+
+
+def set_schema_version(conn: Connection, version: int) -> None:
+    """Grava a versão do esquema no banco."""
+    conn.exec_driver_sql(f"PRAGMA user_version = {int(version)}")
+
+
+def latest_version() -> int:
+    """Versão mais recente conhecida pelo código."""
+    return MIGRATIONS[-1].version if MIGRATIONS else 0
+
+
+def run_migrations(conn: Connection, fresh: bool = False) -> List[Migration]:
+    """
+    Aplica as migrações pendentes.
+
+    Deve ser chamada dentro de uma transação (ver init_db), para
+    que uma falha no meio desfaça também os passos anteriores.
+
+    Args:
+        conn: Conexão de escrita com transação aberta
+        fresh: True se o banco acabou de ser criado por create_all()
+
+    Returns:
+        list: Migrações aplicadas nesta execução
+    """
+    current = get_schema_version(conn)
+
+    if fresh:
+        set_schema_version(conn, latest_version())
+        return []
+
+    pending = [m for m in MIGRATIONS if m.version > current]
+    for m in pending:
+        m.upgrade(conn)
+        set_schema_version(conn, m.version)
+
+    if pending:
+        # Atualiza as estatísticas do planejador para os novos índices
+        conn.exec_driver_sql("ANALYZE")
+
+    return pending
+
+
+# ============================================================
+# UTILITÁRIOS
+# ============================================================
+
+def rebuild_table(
+    conn: Connection,
+    table: Table,
+    expressions: Optional[Dict[str, str]] = None
+) -> None:
+    """
+    Recria uma tabela com o DDL atual do model, preservando os dados.
+
+    O SQLite não altera o tipo de uma coluna existente, então segue o
+    procedimento recomendado: cria a tabela nova com outro nome, copia
+    os dados, apaga a antiga, renomeia e recria os índices.
+
+    Args:
+        conn: Conexão com transação aberta
+        table: Tabela SQLAlchemy (ex: Transacao.__table__)
+        expressions: Expressões SQL por coluna para converter os dados
+            (ex: {"data": "CAST(julianday(data) AS INTEGER)"}).
+            Colunas sem expressão são copiadas como estão.
+    """
+    expressions = expressions or {}
+    preparer = conn.dialect.identifier_preparer
+    nome = preparer.format_table(table)
+    novo = preparer.quote(f"_{table.name}_novo")
+
+    existentes = {c["name"] for c in inspect(conn).get_columns(table.name)}
+    colunas = [
+        c.name for c in table.columns
+        if c.name in existentes or c.name in expressions
+    ]
+
+    ddl = str(CreateTable(table).compile(dialect=conn.dialect))
+    conn.exec_driver_sql(
+        ddl.replace(f"CREATE TABLE {nome} (", f"CREATE TABLE {novo} (", 1)
+    )
+
+    destino = ", ".join(preparer.quote(c) for c in colunas)
+    origem = ", ".join(expressions.get(c, preparer.quote(c)) for c in colunas)
+    conn.exec_driver_sql(
+        f"INSERT INTO {novo} ({destino}) SELECT {origem} FROM {nome}"
+    )
+
+    conn.exec_driver_sql(f"DROP TABLE {nome}")
+    conn.exec_driver_sql(f"ALTER TABLE {novo} RENAME TO {nome}")
+
+    for index in table.indexes:
+        index.create(conn)
+
+
+# ============================================================
+# MIGRAÇÕES
+# ============================================================
+
+@migration(1, "Índices das consultas do dashboard, fixas e membros")
+def _v1_indices(conn: Connection) -> None:
+    statements = [
+        "CREATE INDEX IF NOT EXISTS ix_transacao_negocio_id_data "
+        "ON transacao (negocio_id, data)",
+        "CREATE INDEX IF NOT EXISTS ix_transacao_fixa_id_data "
+        "ON transacao (fixa_id, data)",
+        "CREATE INDEX IF NOT EXISTS ix_transacao_created_by_id "
+        "ON transacao (created_by_id)",
+        "CREATE INDEX IF NOT EXISTS ix_negocioshare_negocio_id "
+        "ON negocioshare (negocio_id)",
+        "CREATE INDEX IF NOT EXISTS ix_despesafixa_negocio_id "
+        "ON despesafixa (negocio_id)",
+    ]
+    for sql in statements:
+        conn.exec_driver_sql(sql)
+
+
+@migration(2, "Transacao.data de texto ISO para dias desde 1970-01-01")
+def _v2_data_epoch_day(conn: Connection) -> None:
+    from app.models import Transacao
+
+    # julianday('1970-01-01') = 2440587.5; date() normaliza datas com hora
+    rebuild_table(conn, Transacao.__table__, {
+        "data": (
+            "CASE WHEN typeof(data) = 'integer' THEN data "
+            "ELSE CAST(julianday(date(data)) - 2440587.5 AS INTEGER) END"
+        ),
+    })
+
+
+@migration(3, "Valores em centavos inteiros (transacao e despesafixa)")
+def _v3_valor_centavos(conn: Connection) -> None:
+    from app.models import DespesaFixa, Transacao
+
+    # O ROUND interno descarta o ruído do float (10.145 * 100 = 1014.4999...)
+    # e deixa o arredondamento igual ao de models.Centavos
+    centavos = {"valor": "CAST(ROUND(ROUND(valor * 100, 6)) AS INTEGER)"}
+    rebuild_table(conn, Transacao.__table__, centavos)
+    rebuild_table(conn, DespesaFixa.__table__, centavos)
+
+
+@migration(4, "Saldo materializado por carteira (negociosaldo)")
+def _v4_negocio_saldo(conn: Connection) -> None:
+    # A tabela já foi criada por create_all(); aqui só calculamos os totais
+    conn.exec_driver_sql(
+        "INSERT OR REPLACE INTO negociosaldo (negocio_id, receita, despesa) "
+        "SELECT negocio_id, "
+        "COALESCE(SUM(CASE WHEN tipo = 'receita' THEN valor END), 0), "
+        "COALESCE(SUM(CASE WHEN tipo = 'despesa' THEN valor END), 0) "
+        "FROM transacao GROUP BY negocio_id"
+    )
+
+
+@migration(5, "Resumo diário por carteira, dia, tipo e categoria (resumodiario)")
+def _v5_resumo_diario(conn: Connection) -> None:
+    conn.exec_driver_sql(
+        "INSERT OR REPLACE INTO resumodiario "
+        "(negocio_id, dia, tipo, tag, valor, quantidade, km, litros) "
+        "SELECT negocio_id, data, tipo, tag, SUM(valor), COUNT(*), "
+        "COALESCE(SUM(km), 0), COALESCE(SUM(litros), 0) "
+        "FROM transacao GROUP BY negocio_id, data, tipo, tag"
+    )
+
+
+@migration(6, "Pagamentos de despesas fixas por mês (pagamentofixa)")
+def _v6_pagamento_fixa(conn: Connection) -> None:
+    # Um pagamento por fixa e mês; se houver duplicatas antigas, vale o primeiro
+    conn.exec_driver_sql(
+        "INSERT OR IGNORE INTO pagamentofixa (fixa_id, competencia, transacao_id) "
+        "SELECT fixa_id, "
+        "CAST(strftime('%Y%m', data * 86400, 'unixepoch') AS INTEGER) AS competencia, "
+        "MIN(id) "
+        "FROM transacao WHERE fixa_id IS NOT NULL "
+        "GROUP BY fixa_id, competencia"
+    )
+
+
+@migration(7, "Hash de conteúdo das transações (deduplicação de importações)")
+def _v7_hash_conteudo(conn: Connection) -> None:
+    from app.models import EPOCH_ORDINAL, hash_conteudo
+
+    # As reconstruções das migrações 2 e 3 já usam o DDL atual
+    colunas = {c["name"] for c in inspect(conn).get_columns("transacao")}
+    if "hash_conteudo" not in colunas:
+        conn.exec_driver_sql("ALTER TABLE transacao ADD COLUMN hash_conteudo VARCHAR")
+
+    # Calcula em blocos pelo id, sem carregar a tabela inteira
+    ultimo_id = 0
+    while True:
+        linhas = conn.exec_driver_sql(
+            "SELECT id, data, tipo, valor, descricao FROM transacao "
+            "WHERE id > ? ORDER BY id LIMIT 1000",
+            (ultimo_id,)
+        ).all()
+        if not linhas:
+            break
+        conn.exec_driver_sql(
+            "UPDATE transacao SET hash_conteudo = ? WHERE id = ?",
+            [
+                (hash_conteudo(date.fromordinal(data + EPOCH_ORDINAL), tipo, valor / 100, descricao), id_)
+                for id_, data, tipo, valor, descricao in linhas
+            ]
+        )
+        ultimo_id = linhas[-1][0]
+
+    conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_transacao_negocio_id_hash "
+        "ON transacao (negocio_id, hash_conteudo)"
+    )
+
+
+@migration(8, "Contador de versão por carteira (negocio.versao)")
+def _v8_negocio_versao(conn: Connection) -> None:
+    colunas = {c["name"] for c in inspect(conn).get_columns("negocio")}
+    if "versao" not in colunas:
+        conn.exec_driver_sql(
+            "ALTER TABLE negocio ADD COLUMN versao INTEGER NOT NULL DEFAULT 0"
+        )
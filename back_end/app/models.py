@@ -8,10 +8,13 @@ SQLModel combina Pydantic (validação) com SQLAlchemy (ORM).
 Entidades:
     - User: Usuários do sistema
     - Negocio: Carteiras/Bolsos financeiros
+    - NegocioSaldo: Totais materializados de cada carteira
+    - ResumoDiario: Totais por carteira × dia × tipo × categoria
     - NegocioShare: Compartilhamento de carteiras entre usuários
     - InviteCode: Códigos de convite temporários
     - Transacao: Receitas e despesas
     - DespesaFixa: Contas fixas mensais
+    - PagamentoFixa: Registro de pagamento mensal de cada conta fixa
 
 Relacionamentos:
     User 1:N Negocio (proprietário)
@@ -19,6 +22,7 @@ Relacionamentos:
     Negocio 1:N Transacao
     Negocio 1:N DespesaFixa
     Negocio 1:N InviteCode
+    DespesaFixa 1:N PagamentoFixa (no máximo um por mês)
 
 Hierarquia de Classes:
     - Base classes (ex: UserBase) contêm apenas os campos compartilhados
@@ -29,12 +33,127 @@ Autor: K4nishi
 Versão: 3.0.0
 """
 
+import hashlib
 from typing import List, Optional
-from datetime import datetime
+from datetime import date, datetime
+from decimal import Decimal, ROUND_HALF_UP
 
+from sqlalchemy import Index, Integer, UniqueConstraint
+from sqlalchemy.types import TypeDecorator
 from sqlmodel import SQLModel, Field, Relationship
 
 
+# ============================================================
+# TIPOS DE COLUNA
+# ============================================================
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+"""Ordinal de 1970-01-01, base da contagem de dias."""
+
+
+class EpochDay(TypeDecorator):
+    """
+    Data armazenada como número inteiro de dias desde 1970-01-01.
+
+    No Python (e na API) o valor é um `date` ('YYYY-MM-DD' no JSON);
+    no SQLite é um INTEGER indexável. Filtros por período e GROUP BY
+    dia rodam direto no banco, sem comparar strings.
+
+    Exemplo:
+        >>> EpochDay().process_bind_param(date(2024, 12, 26), None)
+        20083
+    """
+    impl = Integer
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if isinstance(value, str):
+            value = date.fromisoformat(value[:10])
+        elif isinstance(value, datetime):
+            value = value.date()
+        return value.toordinal() - EPOCH_ORDINAL
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return date.fromordinal(int(value) + EPOCH_ORDINAL)
+
+
+VALOR_MAXIMO = 10_000_000_000_000
+"""
+Maior valor aceito em reais (R$ 10 trilhões).
+
+Em centavos (1e15) cabe com folga no INTEGER de 64 bits do SQLite;
+sem limite, um valor como 1e30 estourava o INSERT com erro 500.
+"""
+
+
+class Centavos(TypeDecorator):
+    """
+    Valor monetário armazenado como número inteiro de centavos.
+
+    No Python (e na API) o valor continua em reais (float); no SQLite
+    é um INTEGER. Somas feitas com func.sum() acontecem em inteiros
+    dentro do banco e só o total é convertido de volta para reais,
+    então saldos não acumulam erro de arredondamento.
+
+    Exemplo:
+        >>> Centavos().process_bind_param(0.29, None)
+        29
+        >>> Centavos().process_result_value(29, None)
+        0.29
+    """
+    impl = Integer
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        # str() evita herdar o erro binário do float (0.29 * 100 = 28.999...)
+        centavos = (Decimal(str(value)) * 100).quantize(Decimal(1), ROUND_HALF_UP)
+        return int(centavos)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return value / 100
+
+
+# ============================================================
+# HASH DE CONTEÚDO (DEDUPLICAÇÃO DE IMPORTAÇÕES)
+# ============================================================
+
+def hash_conteudo(data, tipo: str, valor, descricao: str) -> str:
+    """
+    Calcula a identidade de conteúdo de uma transação.
+
+    Duas transações com mesma data, tipo, valor em centavos e
+    descrição (sem diferença de espaços/maiúsculas) têm o mesmo hash,
+    venham elas de um extrato, do formulário ou do lote. Linhas
+    idênticas legítimas (ex: dois cafés iguais no mesmo dia) são
+    distinguidas na importação pela contagem (ver app/importacao.py).
+
+    Returns:
+        str: 20 caracteres hexadecimais
+    """
+    if isinstance(data, str):
+        data = date.fromisoformat(data[:10])
+    elif isinstance(data, datetime):
+        data = data.date()
+    centavos = Centavos().process_bind_param(valor, None)
+    texto = " ".join((descricao or "").split()).lower()
+    chave = f"{data.isoformat()}|{tipo}|{centavos}|{texto}"
+    return hashlib.sha1(chave.encode("utf-8")).hexdigest()[:20]
+
+
+def _hash_conteudo_padrao(context) -> str:
+    """Default da coluna Transacao.hash_conteudo (vale para ORM e executemany)."""
+    p = context.get_current_parameters()
+    return hash_conteudo(p["data"], p["tipo"], p["valor"], p["descricao"])
+
+
 # ============================================================
 # USUÁRIO (USER)
 # ============================================================
@@ -100,7 +219,13 @@ class NegocioShare(SQLModel, table=True):
     Notas:
         - Usa chave primária composta (user_id + negocio_id)
         - O dono da carteira NÃO aparece nesta tabela
+        - A PK começa por user_id; listar membros de uma carteira
+          usa o índice ix_negocioshare_negocio_id
     """
+    __table_args__ = (
+        Index("ix_negocioshare_negocio_id", "negocio_id"),
+    )
+
     user_id: int = Field(foreign_key="user.id", primary_key=True)
     negocio_id: int = Field(foreign_key="negocio.id", primary_key=True)
     role: str = "editor"
@@ -174,6 +299,7 @@ class Negocio(NegocioBase, table=True):
         shares: Lista de compartilhamentos
         transacoes: Lista de transações da carteira
         fixas: Lista de despesas fixas
+        versao: Contador de alterações da carteira
         
     Categorias:
         - 'PADRAO': Carteira comum sem controle de KM
@@ -181,9 +307,13 @@ class Negocio(NegocioBase, table=True):
         
     Notas:
         - Transações e fixas são deletadas em cascata
+        - versao é incrementada por toda alteração que muda o que os
+          membros veem (transações, fixas, membros); serve de chave
+          para caches e ETags (ver app/ledger.py)
     """
     id: Optional[int] = Field(default=None, primary_key=True)
     owner_id: int = Field(foreign_key="user.id")
+    versao: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
     
     # Relacionamentos
     owner: User = Relationship(back_populates="owned_negocios")
@@ -200,6 +330,69 @@ class Negocio(NegocioBase, table=True):
     )
 
 
+# ============================================================
+# SALDO MATERIALIZADO DA CARTEIRA (NEGOCIO SALDO)
+# ============================================================
+
+class NegocioSaldo(SQLModel, table=True):
+    """
+    Totais de receita e despesa de uma carteira, mantidos incrementalmente.
+
+    Cada inserção ou remoção de transação (inclusive pagamento de
+    despesa fixa) soma ou subtrai o valor aqui, na mesma transação
+    do banco (ver app/ledger.py). Assim a lista de carteiras mostra
+    o saldo sem ler o histórico de transações.
+
+    Attributes:
+        negocio_id: ID da carteira (chave primária)
+        receita: Soma das receitas (reais na API, centavos no banco)
+        despesa: Soma das despesas (reais na API, centavos no banco)
+
+    Notas:
+        - Carteiras sem transações podem não ter linha nesta tabela
+    """
+    negocio_id: int = Field(foreign_key="negocio.id", primary_key=True)
+    receita: float = Field(default=0, sa_type=Centavos)
+    despesa: float = Field(default=0, sa_type=Centavos)
+
+
+# ============================================================
+# RESUMO DIÁRIO (ROLLUP PARA GRÁFICOS)
+# ============================================================
+
+class ResumoDiario(SQLModel, table=True):
+    """
+    Totais pré-agregados por carteira, dia, tipo e categoria.
+
+    Mantido incrementalmente junto com NegocioSaldo (ver app/ledger.py).
+    Os gráficos do dashboard leem daqui, então o custo depende do
+    número de dias e categorias, e não do número de transações.
+
+    Attributes:
+        negocio_id: ID da carteira
+        dia: Data ('YYYY-MM-DD' na API, dia inteiro no banco)
+        tipo: 'receita' ou 'despesa'
+        tag: Categoria das transações
+        valor: Soma dos valores (reais na API, centavos no banco)
+        quantidade: Número de transações agregadas
+        km: Soma dos KM
+        litros: Soma dos litros
+
+    Notas:
+        - Chave primária composta (negocio_id, dia, tipo, tag), que
+          também serve de índice para filtros por período
+        - Linhas que voltam a zero transações são removidas
+    """
+    negocio_id: int = Field(foreign_key="negocio.id", primary_key=True)
+    dia: date = Field(sa_type=EpochDay, primary_key=True)
+    tipo: str = Field(primary_key=True)
+    tag: str = Field(primary_key=True)
+    valor: float = Field(default=0, sa_type=Centavos)
+    quantidade: int = 0
+    km: float = 0.0
+    litros: float = 0.0
+
+
 # ============================================================
 # DESPESAS FIXAS (DESPESA FIXA)
 # ============================================================
@@ -210,12 +403,13 @@ class DespesaFixaBase(SQLModel):
     
     Attributes:
         nome: Nome da despesa (ex: 'Aluguel', 'Internet')
-        valor: Valor mensal da despesa
+        valor: Valor mensal da despesa (reais na API, centavos no banco;
+            de 0 até VALOR_MAXIMO)
         tag: Categoria para agrupamento (ex: 'Moradia', 'Lazer')
         dia_vencimento: Dia do mês em que vence (1-31)
     """
     nome: str
-    valor: float
+    valor: float = Field(sa_type=Centavos, ge=0, le=VALOR_MAXIMO)
     tag: str = "Fixas"
     dia_vencimento: int = 1
 
@@ -244,9 +438,14 @@ class DespesaFixa(DespesaFixaBase, table=True):
     Fluxo de pagamento:
         1. Usuário visualiza lista de fixas com status de pagamento
         2. Clica em 'Pagar' para uma despesa não paga
-        3. Sistema cria Transacao com fixa_id preenchido
+        3. Sistema cria Transacao com fixa_id preenchido e um
+           PagamentoFixa para o mês corrente
         4. Na próxima visualização, aparece como 'Pago neste mês'
     """
+    __table_args__ = (
+        Index("ix_despesafixa_negocio_id", "negocio_id"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     negocio_id: int = Field(foreign_key="negocio.id")
     
@@ -264,18 +463,19 @@ class TransacaoBase(SQLModel):
     Attributes:
         tag: Categoria da transação (ex: 'Alimentação', 'Transporte')
         descricao: Descrição do que foi a transação
-        valor: Valor da transação (sempre positivo)
+        valor: Valor da transação, de 0 até VALOR_MAXIMO (reais na
+            API, centavos no banco; 0 no fechamento de KM do motorista)
         tipo: 'receita' ou 'despesa'
-        data: Data no formato ISO (YYYY-MM-DD)
+        data: Data da transação ('YYYY-MM-DD' na API, dia inteiro no banco)
         km: Quilômetros rodados (para motoristas)
         litros: Litros abastecidos (para motoristas)
         fixa_id: ID da despesa fixa relacionada (se for pagamento de fixa)
     """
     tag: str = "Geral"
     descricao: str
-    valor: float
+    valor: float = Field(sa_type=Centavos, ge=0, le=VALOR_MAXIMO)
     tipo: str  # 'receita' ou 'despesa'
-    data: str  # Formato: 'YYYY-MM-DD'
+    data: date = Field(sa_type=EpochDay)  # API: 'YYYY-MM-DD'
     km: Optional[float] = 0.0
     litros: Optional[float] = 0.0
     fixa_id: Optional[int] = None
@@ -316,7 +516,20 @@ class Transacao(TransacaoBase, table=True):
     Notas:
         - created_by permite identificar quem fez cada transação
           em carteiras compartilhadas
+
+    Índices:
+        - (negocio_id, data): dashboard, extrato e filtros por período
+        - (fixa_id, data): status de pagamento das despesas fixas
+        - created_by_id: busca por autor
+        - (negocio_id, hash_conteudo): deduplicação de extratos importados
     """
+    __table_args__ = (
+        Index("ix_transacao_negocio_id_data", "negocio_id", "data"),
+        Index("ix_transacao_fixa_id_data", "fixa_id", "data"),
+        Index("ix_transacao_created_by_id", "created_by_id"),
+        Index("ix_transacao_negocio_id_hash", "negocio_id", "hash_conteudo"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     negocio_id: int = Field(foreign_key="negocio.id")
     
@@ -325,3 +538,42 @@ class Transacao(TransacaoBase, table=True):
     # Quem criou a transação (útil em carteiras compartilhadas)
     created_by_id: Optional[int] = Field(foreign_key="user.id", default=None)
     created_by: Optional["User"] = Relationship()
+
+    # Identidade de conteúdo (ver hash_conteudo); calculada no INSERT
+    hash_conteudo: Optional[str] = Field(
+        default=None,
+        sa_column_kwargs={"default": _hash_conteudo_padrao}
+    )
+
+
+# ============================================================
+# PAGAMENTOS DE DESPESAS FIXAS (PAGAMENTO FIXA)
+# ============================================================
+
+class PagamentoFixa(SQLModel, table=True):
+    """
+    Pagamento de uma despesa fixa em um mês de competência.
+
+    A restrição única (fixa_id, competencia) garante no próprio banco
+    que cada conta é paga no máximo uma vez por mês, mesmo com dois
+    cliques simultâneos em 'Pagar'.
+
+    Attributes:
+        id: Identificador único
+        fixa_id: ID da despesa fixa paga
+        competencia: Mês pago no formato AAAAMM (ex: 202412)
+        transacao_id: Transação de despesa gerada pelo pagamento
+
+    Notas:
+        - Removido junto com a transação de pagamento, liberando o mês
+        - Removido quando a despesa fixa é deletada (a transação fica)
+    """
+    __table_args__ = (
+        UniqueConstraint("fixa_id", "competencia", name="uq_pagamentofixa_fixa_competencia"),
+        Index("ix_pagamentofixa_transacao_id", "transacao_id"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    fixa_id: int = Field(foreign_key="despesafixa.id")
+    competencia: int
+    transacao_id: int = Field(foreign_key="transacao.id")
@@ -6,10 +6,11 @@ Este pacote contém módulos para comunicação em tempo real via WebSocket.
 
 Módulos:
     - manager: Gerenciador de conexões WebSocket
+    - backplane: Distribuição dos eventos entre workers
 
 Uso:
     >>> from app.realtime.manager import manager
-    >>> await manager.broadcast_to_wallet("UPDATE_DASHBOARD", [1, 2, 3])
+    >>> await manager.broadcast_to_wallet("UPDATE_DASHBOARD", 5)
 """
 
 from app.realtime.manager import manager
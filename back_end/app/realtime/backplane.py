@@ -0,0 +1,410 @@
+"""
+TwoBolsos Backend - Backplane de Tempo Real
+============================================
+
+Este módulo distribui os eventos do ConnectionManager entre processos,
+para que vários workers do uvicorn atendam a mesma porta e cada aviso
+chegue a todas as conexões, qualquer que seja o worker que as segura.
+
+Funcionamento:
+    O manager não envia direto às suas conexões: publica um evento
+    (dict serializável em JSON) no backplane, e todo processo, inclusive
+    o que publicou, recebe o evento uma vez e o aplica às conexões
+    locais. Como só o caminho "publicar -> receber" entrega, cada
+    conexão recebe cada aviso exatamente uma vez.
+
+Falhas:
+    A task que recebe os eventos (SQLite e Redis) nunca morre: um erro
+    ao ler ou ao aplicar um evento é contado em `errors`, e uma queda
+    da leitura reabre a conexão após REALTIME_RETRY_DELAY segundos
+    (contada em `restarts`). Eventos publicados enquanto a assinatura
+    Redis está caída se perdem; o cache de papéis expira sozinho
+    (ACCESS_CACHE_TTL em app/acesso.py) para que isso não deixe
+    permissões antigas valendo.
+
+Implementações:
+    - LocalBackplane: Um único processo; entrega na hora (padrão)
+    - SQLiteBackplane: Tabela de eventos num arquivo SQLite compartilhado,
+      lida por polling (sem dependências, serve para N workers na
+      mesma máquina)
+    - RedisBackplane: PUBLISH/SUBSCRIBE de um canal Redis (para
+      workers em máquinas diferentes). Requer `pip install redis`;
+      aceita um cliente pronto, então pode ser testado com um substituto
+      local como o fakeredis
+
+Uso:
+    >>> backplane = criar_backplane()          # conforme REALTIME_BACKPLANE
+    >>> await backplane.iniciar(manager._aplicar)
+    >>> await backplane.publicar({"op": "wallet", "id": 5, "msg": "UPDATE_DASHBOARD"})
+    >>> await backplane.encerrar()
+
+Variáveis de ambiente:
+    - REALTIME_BACKPLANE: local | sqlite | redis (default: local)
+    - REALTIME_SQLITE_PATH: Arquivo de eventos (default: <DATABASE_PATH>.realtime)
+    - REALTIME_POLL_INTERVAL: Segundos entre leituras do SQLite (default: 0.1)
+    - REALTIME_RETENTION: Segundos que um evento fica no SQLite (default: 60)
+    - REALTIME_RETRY_DELAY: Espera antes de reabrir a leitura (default: 1)
+    - REDIS_URL: URL do Redis (default: redis://localhost:6379/0)
+    - REALTIME_REDIS_CHANNEL: Canal usado (default: twobolsos:realtime)
+
+Autor: K4nishi
+Versão: 3.0.0
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.database import DATABASE_PATH
+
+
+REALTIME_BACKPLANE = os.environ.get("REALTIME_BACKPLANE", "local").lower()
+"""Implementação usada pelo manager: local, sqlite ou redis."""
+
+REALTIME_SQLITE_PATH = os.environ.get("REALTIME_SQLITE_PATH", f"{DATABASE_PATH}.realtime")
+"""Arquivo SQLite compartilhado pelos workers (separado do banco principal)."""
+
+REALTIME_POLL_INTERVAL = float(os.environ.get("REALTIME_POLL_INTERVAL", "0.1"))
+"""Intervalo (segundos) entre as leituras de novos eventos no SQLite."""
+
+REALTIME_RETENTION = float(os.environ.get("REALTIME_RETENTION", "60"))
+"""Tempo (segundos) que um evento fica na tabela antes de ser apagado."""
+
+REALTIME_RETRY_DELAY = float(os.environ.get("REALTIME_RETRY_DELAY", "1"))
+"""Espera (segundos) antes de reabrir a leitura de eventos após uma falha."""
+
+REDIS_URL = os.environ.get("REDIS_URL", "redis://localhost:6379/0")
+"""URL do servidor Redis."""
+
+REALTIME_REDIS_CHANNEL = os.environ.get("REALTIME_REDIS_CHANNEL", "twobolsos:realtime")
+"""Canal Redis dos eventos."""
+
+
+Evento = Dict[str, Any]
+Entregar = Callable[[Evento], None]
+
+
+class Backplane:
+    """
+    Interface de um backplane.
+
+    `entregar` é chamado no event loop, uma vez por evento publicado
+    por qualquer processo (inclusive este).
+    """
+
+    nome = "base"
+
+    def __init__(self):
+        self._entregar: Optional[Entregar] = None
+        self._contadores = {"published": 0, "delivered": 0, "errors": 0, "restarts": 0}
+
+    async def iniciar(self, entregar: Entregar) -> None:
+        """Passa a receber eventos (chamado no startup)."""
+        self._entregar = entregar
+
+    async def publicar(self, evento: Evento) -> None:
+        """Publica um evento para todos os processos."""
+        raise NotImplementedError
+
+    async def encerrar(self) -> None:
+        """Para de receber eventos (chamado no shutdown)."""
+        self._entregar = None
+
+    def _receber(self, evento: Evento) -> None:
+        """Entrega um evento recebido ao manager (um evento com erro não para os seguintes)."""
+        if self._entregar is None:
+            return
+        self._contadores["delivered"] += 1
+        try:
+            self._entregar(evento)
+        except Exception:
+            self._contadores["errors"] += 1
+
+    async def _acompanhar(self) -> None:
+        """
+        Task de recebimento: roda _escutar() e o reinicia se ele falhar.
+
+        Só termina cancelada (em encerrar()).
+        """
+        while True:
+            try:
+                await self._escutar()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self._contadores["restarts"] += 1
+            await self._descartar_leitura()
+            await asyncio.sleep(REALTIME_RETRY_DELAY)
+
+    async def _escutar(self) -> None:
+        """Recebe eventos até falhar (implementado por SQLite e Redis)."""
+        raise NotImplementedError
+
+    async def _descartar_leitura(self) -> None:
+        """Fecha o que _escutar() usava; a próxima volta reabre."""
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores para o endpoint /metrics."""
+        return {"backend": self.nome, **self._contadores}
+
+
+# ============================================================
+# LOCAL (UM PROCESSO)
+# ============================================================
+
+class LocalBackplane(Backplane):
+    """Entrega direto no próprio processo. Só serve com um worker."""
+
+    nome = "local"
+
+    async def publicar(self, evento: Evento) -> None:
+        if self._entregar is None:
+            raise RuntimeError("Backplane não iniciado")
+        self._contadores["published"] += 1
+        self._receber(evento)
+
+
+# ============================================================
+# SQLITE (VÁRIOS PROCESSOS NA MESMA MÁQUINA)
+# ============================================================
+
+class SQLiteBackplane(Backplane):
+    """
+    Eventos numa tabela SQLite, lidos por polling.
+
+    Cada publicação é um INSERT; cada processo guarda o maior id que já
+    entregou e, a cada REALTIME_POLL_INTERVAL, lê os eventos acima dele.
+    O AUTOINCREMENT garante ids crescentes e nunca reaproveitados, e as
+    escritas no SQLite são serializadas, então nenhum evento é pulado.
+
+    O arquivo é separado do banco principal: os INSERTs não disputam o
+    lock de escrita das transações. Eventos mais velhos que
+    REALTIME_RETENTION são apagados; um processo travado por mais tempo
+    que isso perde os avisos do período (são só avisos de "recarregue").
+    """
+
+    nome = "sqlite"
+
+    def __init__(self, caminho: str = REALTIME_SQLITE_PATH, intervalo: float = REALTIME_POLL_INTERVAL):
+        super().__init__()
+        self.caminho = caminho
+        self.intervalo = intervalo
+        self._conexao: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._ultimo_id = 0
+        self._tarefa: Optional[asyncio.Task] = None
+
+    def _abrir(self) -> None:
+        """Abre o arquivo e cria a tabela."""
+        conexao = sqlite3.connect(self.caminho, timeout=5, isolation_level=None, check_same_thread=False)
+        conexao.execute("PRAGMA journal_mode=WAL")
+        conexao.execute("PRAGMA synchronous=NORMAL")
+        conexao.execute(
+            "CREATE TABLE IF NOT EXISTS realtime_evento ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " evento TEXT NOT NULL,"
+            " criado_em REAL NOT NULL)"
+        )
+        with self._lock:
+            self._conexao = conexao
+
+    def _maior_id(self) -> int:
+        with self._lock:
+            return self._conexao.execute("SELECT COALESCE(MAX(id), 0) FROM realtime_evento").fetchone()[0]
+
+    def _inserir(self, texto: str) -> None:
+        with self._lock:
+            self._conexao.execute(
+                "INSERT INTO realtime_evento (evento, criado_em) VALUES (?, ?)",
+                (texto, time.time())
+            )
+
+    def _ler(self, depois_de: int) -> List[Tuple[int, str]]:
+        with self._lock:
+            return self._conexao.execute(
+                "SELECT id, evento FROM realtime_evento WHERE id > ? ORDER BY id",
+                (depois_de,)
+            ).fetchall()
+
+    def _limpar(self) -> None:
+        with self._lock:
+            self._conexao.execute(
+                "DELETE FROM realtime_evento WHERE criado_em < ?",
+                (time.time() - REALTIME_RETENTION,)
+            )
+
+    async def iniciar(self, entregar: Entregar) -> None:
+        await super().iniciar(entregar)
+        await asyncio.to_thread(self._abrir)
+        # Só interessam os eventos publicados a partir de agora
+        self._ultimo_id = await asyncio.to_thread(self._maior_id)
+        self._tarefa = asyncio.create_task(self._acompanhar())
+
+    async def publicar(self, evento: Evento) -> None:
+        if self._conexao is None:
+            await asyncio.to_thread(self._abrir)
+        await asyncio.to_thread(self._inserir, json.dumps(evento))
+        self._contadores["published"] += 1
+
+    async def _escutar(self) -> None:
+        """
+        Polling: entrega, em ordem, os eventos acima do último id visto.
+
+        Ao reabrir depois de uma falha continua do mesmo id, então os
+        eventos do intervalo (ainda na tabela) não se perdem.
+        """
+        if self._conexao is None:
+            await asyncio.to_thread(self._abrir)
+        proxima_limpeza = time.monotonic() + REALTIME_RETENTION
+        while True:
+            await asyncio.sleep(self.intervalo)
+            try:
+                linhas = await asyncio.to_thread(self._ler, self._ultimo_id)
+                if time.monotonic() >= proxima_limpeza:
+                    await asyncio.to_thread(self._limpar)
+                    proxima_limpeza = time.monotonic() + REALTIME_RETENTION
+            except sqlite3.Error:
+                # Arquivo ocupado por outro worker: tenta na próxima volta
+                self._contadores["errors"] += 1
+                continue
+
+            for id_evento, texto in linhas:
+                self._ultimo_id = id_evento
+                try:
+                    evento = json.loads(texto)
+                except ValueError:
+                    self._contadores["errors"] += 1
+                    continue
+                self._receber(evento)
+
+    async def _descartar_leitura(self) -> None:
+        with self._lock:
+            if self._conexao is not None:
+                self._conexao.close()
+            self._conexao = None
+
+    async def encerrar(self) -> None:
+        await super().encerrar()
+        if self._tarefa is not None:
+            self._tarefa.cancel()
+            self._tarefa = None
+        await self._descartar_leitura()
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), "last_id": self._ultimo_id}
+
+
+# ============================================================
+# REDIS (VÁRIAS MÁQUINAS)
+# ============================================================
+
+class RedisBackplane(Backplane):
+    """
+    Eventos num canal Redis (PUBLISH / SUBSCRIBE).
+
+    Cada processo assina o canal; o Redis entrega cada mensagem uma
+    vez a cada assinante, inclusive ao processo que publicou.
+
+    Args:
+        url: URL do Redis (ignorada se `cliente` for passado)
+        canal: Canal dos eventos
+        cliente: Cliente `redis.asyncio` já criado (ex: fakeredis nos testes)
+    """
+
+    nome = "redis"
+
+    def __init__(self, url: str = REDIS_URL, canal: str = REALTIME_REDIS_CHANNEL, cliente: Any = None):
+        super().__init__()
+        self.url = url
+        self.canal = canal
+        self._cliente = cliente
+        self._proprio = cliente is None
+        self._pubsub: Any = None
+        self._tarefa: Optional[asyncio.Task] = None
+
+    async def iniciar(self, entregar: Entregar) -> None:
+        await super().iniciar(entregar)
+        if self._cliente is None:
+            try:
+                import redis.asyncio as redis
+            except ImportError as erro:
+                raise RuntimeError("REALTIME_BACKPLANE=redis requer o pacote redis (pip install redis)") from erro
+            self._cliente = redis.from_url(self.url)
+
+        # A primeira assinatura acontece aqui: sem Redis o startup falha
+        await self._assinar()
+        self._tarefa = asyncio.create_task(self._acompanhar())
+
+    async def _assinar(self) -> None:
+        pubsub = self._cliente.pubsub(ignore_subscribe_messages=True)
+        await pubsub.subscribe(self.canal)
+        self._pubsub = pubsub
+
+    async def publicar(self, evento: Evento) -> None:
+        await self._cliente.publish(self.canal, json.dumps(evento))
+        self._contadores["published"] += 1
+
+    async def _escutar(self) -> None:
+        """Lê as mensagens do canal e as entrega ao manager."""
+        if self._pubsub is None:
+            await self._assinar()
+        # get_message com timeout (e não listen()) faz uma conexão caída
+        # aparecer como erro em até um segundo, em vez de travar a leitura
+        while self._pubsub.subscribed:
+            mensagem = await self._pubsub.get_message(timeout=1.0)
+            if mensagem is None or mensagem.get("type") != "message":
+                continue
+            try:
+                evento = json.loads(mensagem["data"])
+            except (TypeError, ValueError):
+                self._contadores["errors"] += 1
+                continue
+            self._receber(evento)
+        raise ConnectionError("Assinatura do canal Redis encerrada")
+
+    async def _descartar_leitura(self) -> None:
+        pubsub, self._pubsub = self._pubsub, None
+        if pubsub is not None:
+            try:
+                await pubsub.aclose()
+            except Exception:
+                pass
+
+    async def encerrar(self) -> None:
+        await super().encerrar()
+        if self._tarefa is not None:
+            self._tarefa.cancel()
+            self._tarefa = None
+        if self._pubsub is not None:
+            try:
+                await self._pubsub.unsubscribe(self.canal)
+            except Exception:
+                pass
+        await self._descartar_leitura()
+        if self._proprio and self._cliente is not None:
+            await self._cliente.aclose()
+            self._cliente = None
+
+
+# ============================================================
+# FÁBRICA
+# ============================================================
+
+def criar_backplane(tipo: str = REALTIME_BACKPLANE) -> Backplane:
+    """
+    Cria o backplane configurado em REALTIME_BACKPLANE.
+
+    Raises:
+        ValueError: Se o tipo não for local, sqlite ou redis
+    """
+    if tipo == "local":
+        return LocalBackplane()
+    if tipo == "sqlite":
+        return SQLiteBackplane()
+    if tipo == "redis":
+        return RedisBackplane()
+    raise ValueError(f"REALTIME_BACKPLANE inválido: {tipo!r} (use local, sqlite ou redis)")
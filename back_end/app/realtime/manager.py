@@ -6,149 +6,526 @@ Este módulo gerencia conexões WebSocket para atualizações em tempo real.
 
 Funcionalidades:
     - Conexões múltiplas por usuário (multi-dispositivo)
-    - Broadcast para todos os membros de uma carteira
+    - Assinatura de tópicos por carteira
+    - Broadcast para as conexões que assinam uma carteira
     - Mensagens individuais para usuários específicos
+    - Fila de envio por conexão, com descarte de clientes lentos
+    - Heartbeat (PING/PONG), detecção de inatividade e limite por usuário
 
 Arquitetura:
-    O manager mantém um dicionário que mapeia user_id para uma
-    lista de conexões WebSocket. Isso permite que um usuário
-    esteja conectado de vários dispositivos simultaneamente.
+    Cada conexão autenticada é uma `Conexao` (socket + user_id +
+    carteiras assinadas). O manager mantém dois índices:
+    - active_connections: user_id -> conexões do usuário
+    - wallet_connections: negocio_id -> conexões que assinam a carteira
+
+    O broadcast de uma carteira é uma consulta a wallet_connections:
+    não acessa o banco e só alcança quem está vendo aquela carteira.
+    A permissão de leitura é verificada uma vez, na assinatura.
+
+    Os índices só são alterados no event loop: rotas síncronas
+    chamam os métodos async via background_tasks.
+
+Vários workers:
+    Os métodos de notificação (broadcast_to_wallet, send_personal_message,
+    revoke_access, close_wallet, invalidate_access) não tocam nas
+    conexões: publicam um evento no backplane (app/realtime/backplane.py).
+    Cada processo recebe cada evento uma vez e o aplica às suas conexões
+    em _aplicar(), então o aviso chega exatamente uma vez a cada conexão,
+    esteja ela no worker que publicou ou em outro. Com
+    REALTIME_BACKPLANE=local (padrão) tudo fica no próprio processo.
+
+    Heartbeat, filas e o limite de conexões por usuário continuam
+    locais a cada worker.
+
+Envio:
+    Cada conexão tem uma fila limitada (WS_SEND_QUEUE_SIZE) esvaziada
+    por uma task própria. O broadcast só enfileira (put_nowait) e
+    nunca espera um socket, então um celular lento não atrasa os
+    outros. Uma mensagem igual a outra ainda na fila é descartada.
+    A conexão é derrubada quando:
+    - a fila enche (o cliente não acompanha as mensagens), ou
+    - um envio leva mais que WS_SEND_TIMEOUT segundos, ou falha.
+
+    A latência de fan-out (do broadcast até o envio em cada conexão)
+    fica disponível em stats(), exposto em /metrics.
+
+Heartbeat e inatividade:
+    Enquanto houver conexões, uma task envia 'PING' a todas a cada
+    WS_PING_INTERVAL segundos; o cliente responde 'PONG'. O endpoint
+    (app/main.py) espera cada mensagem por até WS_IDLE_TIMEOUT segundos
+    (maior que o intervalo do PING): sem nada nesse tempo, nem o PONG,
+    a conexão é derrubada. Um socket morto sem close limpo sai assim
+    pelo timeout de inatividade ou pelo primeiro envio que falhar.
+
+    Cada usuário tem no máximo WS_MAX_CONNECTIONS_PER_USER conexões:
+    uma nova conexão além do limite derruba a mais antiga dele.
 
 Tipos de mensagem:
     - 'UPDATE_DASHBOARD': Dados da carteira foram alterados
     - 'UPDATE_LIST': Lista de carteiras do usuário mudou
+    - 'PING': Heartbeat (o cliente responde 'PONG')
 
 Fluxo de notificação:
     1. Usuário faz uma alteração (ex: nova transação)
     2. Router adiciona task em background_tasks
-    3. Manager envia mensagem para todos os membros da carteira
-    4. Frontend recebe e atualiza a interface
+    3. Manager publica o evento no backplane
+    4. Cada worker enfileira a mensagem para quem assina a carteira
+    5. A task de cada conexão envia; o frontend atualiza a interface
+
+Variáveis de ambiente:
+    - WS_SEND_QUEUE_SIZE: Mensagens pendentes por conexão (default: 32)
+    - WS_SEND_TIMEOUT: Segundos para um envio antes de derrubar (default: 5)
+    - WS_PING_INTERVAL: Segundos entre heartbeats (default: 25)
+    - WS_IDLE_TIMEOUT: Segundos sem mensagens do cliente (default: 60)
+    - WS_MAX_CONNECTIONS_PER_USER: Conexões simultâneas (default: 5)
 
 Autor: K4nishi
 Versão: 3.0.0
 """
 
-from typing import List, Dict
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Set, Tuple
 
 from fastapi import WebSocket
 
+from app.acesso import invalidar_carteira
+from app.realtime.backplane import Backplane, LocalBackplane, criar_backplane
+
+
+WS_SEND_QUEUE_SIZE = int(os.environ.get("WS_SEND_QUEUE_SIZE", "32"))
+"""Mensagens aguardando envio por conexão antes de ela ser derrubada."""
+
+WS_SEND_TIMEOUT = float(os.environ.get("WS_SEND_TIMEOUT", "5"))
+"""Tempo máximo (segundos) de um envio antes de derrubar a conexão."""
+
+WS_PING_INTERVAL = float(os.environ.get("WS_PING_INTERVAL", "25"))
+"""Intervalo (segundos) entre os PINGs enviados às conexões."""
+
+WS_IDLE_TIMEOUT = float(os.environ.get("WS_IDLE_TIMEOUT", "60"))
+"""Tempo máximo (segundos) sem receber nada do cliente, PONG incluído."""
+
+WS_MAX_CONNECTIONS_PER_USER = int(os.environ.get("WS_MAX_CONNECTIONS_PER_USER", "5"))
+"""Conexões simultâneas por usuário; além disso a mais antiga cai."""
+
+AMOSTRAS_LATENCIA = 1024
+"""Últimas latências de fan-out guardadas para os percentis."""
+
+# Códigos de fechamento (RFC 6455)
+FECHAMENTO_INATIVO = 1001  # going away: sem atividade
+FECHAMENTO_LIMITE = 1008   # policy violation: limite de conexões
+FECHAMENTO_LENTO = 1013    # try again later: cliente não acompanhou
+FECHAMENTO_ERRO = 1011     # erro no envio
+
+
+class Conexao:
+    """
+    Uma conexão WebSocket autenticada.
+
+    Attributes:
+        websocket: Socket do cliente
+        user_id: Usuário dono do token usado na conexão
+        carteiras: IDs das carteiras assinadas
+        fila: Mensagens aguardando envio (mensagem, instante do enfileiramento)
+        pendentes: Mensagens na fila (para não repetir o mesmo aviso)
+        escritor: Task que esvazia a fila
+        aberta: False depois de disconnect()
+        conectada_em: Instante da conexão (monotonic)
+    """
+
+    def __init__(self, websocket: WebSocket, user_id: int):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.carteiras: Set[int] = set()
+        self.fila: "asyncio.Queue[Tuple[str, float]]" = asyncio.Queue(maxsize=WS_SEND_QUEUE_SIZE)
+        self.pendentes: Set[str] = set()
+        self.escritor: Optional[asyncio.Task] = None
+        self.aberta = True
+        self.conectada_em = time.monotonic()
+
+    def enfileirar(self, message: str) -> bool:
+        """
+        Enfileira uma mensagem sem esperar.
+
+        As mensagens são avisos ("recarregue"), então uma igual que
+        ainda não saiu já cobre esta: uma rajada de alterações na mesma
+        carteira não enche a fila.
+
+        Returns:
+            False se a fila estiver cheia
+        """
+        if message in self.pendentes:
+            return True
+        try:
+            self.fila.put_nowait((message, time.perf_counter()))
+        except asyncio.QueueFull:
+            return False
+        self.pendentes.add(message)
+        return True
+
 
 class ConnectionManager:
     """
     Gerenciador de conexões WebSocket para atualizações em tempo real.
-    
+
     Esta classe mantém um registro de todas as conexões WebSocket
-    ativas, organizadas por user_id. Permite que usuários recebam
-    notificações instantâneas quando dados são alterados.
-    
+    ativas, indexadas por usuário e por carteira assinada. Todas as
+    operações rodam no event loop, então os índices não precisam de lock.
+
     Attributes:
-        active_connections: Dicionário mapeando user_id -> lista de WebSockets
-        
+        active_connections: Dicionário mapeando user_id -> conexões
+        wallet_connections: Dicionário mapeando negocio_id -> conexões
+
     Exemplo de uso:
         >>> manager = ConnectionManager()
-        >>> await manager.connect(user_id=1, websocket=ws)
-        >>> await manager.send_personal_message("UPDATE", user_id=1)
-        >>> manager.disconnect(user_id=1, websocket=ws)
+        >>> conexao = await manager.connect(ws, user_id=1)
+        >>> manager.subscribe(conexao, negocio_id=5)
+        >>> await manager.broadcast_to_wallet("UPDATE_DASHBOARD", 5)
+        >>> manager.disconnect(conexao)
     """
-    
-    def __init__(self):
+
+    def __init__(self, backplane: Optional[Backplane] = None):
         """
-        Inicializa o manager com dicionário vazio de conexões.
+        Inicializa o manager com os índices vazios.
+
+        Args:
+            backplane: Distribuição dos eventos entre processos
+                (default: LocalBackplane, um único processo)
         """
-        self.active_connections: Dict[int, List[WebSocket]] = {}
+        self.backplane = backplane or LocalBackplane()
+        self.active_connections: Dict[int, Set[Conexao]] = {}
+        self.wallet_connections: Dict[int, Set[Conexao]] = {}
+        self._latencias: Deque[float] = deque(maxlen=AMOSTRAS_LATENCIA)
+        self._heartbeat: Optional[asyncio.Task] = None
+        self._contadores = {
+            "opened": 0,
+            "closed": 0,
+            "messages_sent": 0,
+            "pings_sent": 0,
+            "dropped_overflow": 0,
+            "dropped_timeout": 0,
+            "dropped_error": 0,
+            "dropped_idle": 0,
+            "dropped_limit": 0,
+        }
+
+    async def iniciar(self) -> None:
+        """Liga o backplane (startup); a partir daí os eventos são aplicados."""
+        await self.backplane.iniciar(self._aplicar)
+
+    async def encerrar(self) -> None:
+        """Desliga o backplane (shutdown)."""
+        await self.backplane.encerrar()
 
-    async def connect(self, user_id: int, websocket: WebSocket) -> None:
+    async def connect(self, websocket: WebSocket, user_id: int) -> Conexao:
         """
         Aceita e registra uma nova conexão WebSocket.
-        
+
         Um usuário pode ter múltiplas conexões (ex: celular e computador).
-        Todas as conexões do mesmo usuário receberão as mesmas mensagens.
-        
+        A conexão começa sem carteiras assinadas e com sua task de envio
+        já rodando. Se o usuário já estiver no limite de conexões, a
+        mais antiga dele é derrubada.
+
         Args:
-            user_id: ID do usuário que está conectando
             websocket: Objeto WebSocket da conexão
-            
-        Exemplo:
-            >>> @app.websocket("/ws/{user_id}")
-            >>> async def ws_endpoint(websocket: WebSocket, user_id: int):
-            ...     await manager.connect(user_id, websocket)
+            user_id: ID do usuário já autenticado pelo token
+
+        Returns:
+            Conexao: Registro usado em subscribe/disconnect
         """
         await websocket.accept()
-        
-        if user_id not in self.active_connections:
-            self.active_connections[user_id] = []
-            
-        self.active_connections[user_id].append(websocket)
-
-    def disconnect(self, user_id: int, websocket: WebSocket) -> None:
-        """
-        Remove uma conexão WebSocket quando ela é fechada.
-        
-        Remove apenas a conexão específica, mantendo outras conexões
-        do mesmo usuário ativas (se houver).
-        
+
+        conexoes = self.active_connections.setdefault(user_id, set())
+        while len(conexoes) >= WS_MAX_CONNECTIONS_PER_USER:
+            self._contadores["dropped_limit"] += 1
+            self._derrubar(min(conexoes, key=lambda c: c.conectada_em), FECHAMENTO_LIMITE)
+            conexoes = self.active_connections.setdefault(user_id, set())
+
+        conexao = Conexao(websocket, user_id)
+        conexao.escritor = asyncio.create_task(self._escrever(conexao))
+        conexoes.add(conexao)
+        self._contadores["opened"] += 1
+
+        if self._heartbeat is None or self._heartbeat.done():
+            self._heartbeat = asyncio.create_task(self._pingar())
+        return conexao
+
+    def disconnect(self, conexao: Conexao) -> None:
+        """
+        Remove uma conexão de todos os índices e para sua task de envio.
+
+        Pode ser chamado mais de uma vez (pelo endpoint e pela própria
+        task de envio, ao derrubar um cliente lento).
+
         Args:
-            user_id: ID do usuário que está desconectando
-            websocket: Objeto WebSocket da conexão a remover
-        """
-        if user_id in self.active_connections:
-            # Remove a conexão específica
-            if websocket in self.active_connections[user_id]:
-                self.active_connections[user_id].remove(websocket)
-            
+            conexao: Conexão retornada por connect()
+        """
+        if conexao.aberta:
+            self._contadores["closed"] += 1
+        conexao.aberta = False
+        if conexao.escritor is not None and conexao.escritor is not asyncio.current_task():
+            conexao.escritor.cancel()
+
+        for negocio_id in list(conexao.carteiras):
+            self.unsubscribe(conexao, negocio_id)
+
+        conexoes = self.active_connections.get(conexao.user_id)
+        if conexoes is not None:
+            conexoes.discard(conexao)
             # Se não houver mais conexões, remove a entrada do dicionário
-            if not self.active_connections[user_id]:
-                del self.active_connections[user_id]
+            if not conexoes:
+                del self.active_connections[conexao.user_id]
+
+        # Sem conexões, o heartbeat para (volta no próximo connect)
+        if not self.active_connections and self._heartbeat is not None:
+            if self._heartbeat is not asyncio.current_task():
+                self._heartbeat.cancel()
+            self._heartbeat = None
+
+    def prune_idle(self, conexao: Conexao) -> None:
+        """
+        Derruba uma conexão que passou de WS_IDLE_TIMEOUT sem mensagens.
+
+        Chamado pelo endpoint quando o receive estoura o tempo.
+        """
+        if conexao.aberta:
+            self._contadores["dropped_idle"] += 1
+            self._derrubar(conexao, FECHAMENTO_INATIVO)
+
+    # ============================================================
+    # TÓPICOS POR CARTEIRA
+    # ============================================================
+
+    def subscribe(self, conexao: Conexao, negocio_id: int) -> None:
+        """
+        Inscreve a conexão nas notificações de uma carteira.
+
+        A permissão de leitura deve ser verificada antes (ver app/main.py).
+        """
+        if not conexao.aberta:
+            return
+        conexao.carteiras.add(negocio_id)
+        self.wallet_connections.setdefault(negocio_id, set()).add(conexao)
+
+    def unsubscribe(self, conexao: Conexao, negocio_id: int) -> None:
+        """Cancela a inscrição da conexão em uma carteira."""
+        conexao.carteiras.discard(negocio_id)
+        conexoes = self.wallet_connections.get(negocio_id)
+        if conexoes is not None:
+            conexoes.discard(conexao)
+            if not conexoes:
+                del self.wallet_connections[negocio_id]
+
+    def unsubscribe_user(self, negocio_id: int, user_id: int) -> None:
+        """
+        Remove as inscrições de um usuário em uma carteira.
+
+        Usado quando o membro é removido: ele perde o acesso e
+        deixa de receber as notificações na hora.
+        """
+        for conexao in list(self.wallet_connections.get(negocio_id, ())):
+            if conexao.user_id == user_id:
+                self.unsubscribe(conexao, negocio_id)
+
+    # ============================================================
+    # NOTIFICAÇÕES (publicadas no backplane)
+    # ============================================================
+
+    async def revoke_access(self, negocio_id: int, user_id: int) -> None:
+        """
+        Tira o usuário do tópico da carteira e avisa que sua lista mudou.
+
+        Chamada (como background task) quando um membro é removido.
+        """
+        await self.backplane.publicar({"op": "revoke", "id": negocio_id, "user": user_id})
+
+    async def close_wallet(self, negocio_id: int) -> None:
+        """
+        Avisa quem assina uma carteira excluída e remove o tópico.
+
+        Chamada (como background task) quando a carteira é excluída.
+        """
+        await self.backplane.publicar({"op": "close", "id": negocio_id})
+
+    async def invalidate_access(self, negocio_id: int) -> None:
+        """
+        Descarta os papéis em cache da carteira em todos os processos.
+
+        Chamada (como background task) quando membros entram ou mudam de
+        role. O processo que fez a alteração já invalidou no commit (ver
+        app/acesso.py); os outros workers só ficam sabendo por aqui.
+        Remoção de membro e exclusão de carteira já invalidam junto.
+        """
+        await self.backplane.publicar({"op": "acesso", "id": negocio_id})
 
     async def send_personal_message(self, message: str, user_id: int) -> None:
         """
         Envia uma mensagem para todas as conexões de um usuário específico.
-        
+
         Útil para notificar apenas um usuário sobre mudanças que
         afetam apenas ele (ex: sua lista de carteiras mudou).
-        
+        Só publica: retorna sem esperar nenhum socket.
+
         Args:
             message: Texto da mensagem a enviar
             user_id: ID do usuário destinatário
-            
+
         Exemplo:
             >>> # Notifica usuário 1 que sua lista de carteiras mudou
             >>> await manager.send_personal_message("UPDATE_LIST", 1)
         """
-        if user_id in self.active_connections:
-            for connection in self.active_connections[user_id]:
-                try:
-                    await connection.send_text(message)
-                except Exception:
-                    # Ignora erros de conexões já fechadas
-                    pass
+        await self.backplane.publicar({"op": "user", "id": user_id, "msg": message})
 
-    async def broadcast_to_wallet(self, message: str, user_ids: List[int]) -> None:
+    async def broadcast_to_wallet(self, message: str, negocio_id: int) -> None:
         """
-        Envia uma mensagem para todos os membros de uma carteira.
-        
+        Envia uma mensagem para todas as conexões que assinam a carteira.
+
         Usado quando uma alteração afeta todos os membros de uma
         carteira compartilhada (ex: nova transação adicionada).
-        
+        Só publica: retorna sem esperar nenhum socket.
+
         Args:
             message: Texto da mensagem a enviar
-            user_ids: Lista de IDs dos usuários membros da carteira
-            
+            negocio_id: ID da carteira alterada
+
         Exemplo:
-            >>> # Carteira com dono (id=1) e membro (id=2)
-            >>> member_ids = [1, 2]
-            >>> await manager.broadcast_to_wallet("UPDATE_DASHBOARD", member_ids)
+            >>> await manager.broadcast_to_wallet("UPDATE_DASHBOARD", 5)
+        """
+        await self.backplane.publicar({"op": "wallet", "id": negocio_id, "msg": message})
+
+    # ============================================================
+    # APLICAÇÃO DOS EVENTOS (em cada processo)
+    # ============================================================
+
+    def _aplicar(self, evento: Dict[str, Any]) -> None:
+        """
+        Aplica às conexões deste processo um evento vindo do backplane.
+
+        Chamado uma vez por evento em cada processo, inclusive no que
+        publicou; eventos desconhecidos são ignorados.
+        """
+        op, alvo = evento.get("op"), evento.get("id")
+        if op == "wallet":
+            self._enfileirar(self.wallet_connections.get(alvo, ()), evento["msg"])
+        elif op == "user":
+            self._enfileirar(self.active_connections.get(alvo, ()), evento["msg"])
+        elif op == "revoke":
+            invalidar_carteira(alvo)
+            self.unsubscribe_user(alvo, evento["user"])
+            self._enfileirar(self.active_connections.get(evento["user"], ()), "UPDATE_LIST")
+        elif op == "close":
+            invalidar_carteira(alvo)
+            conexoes = self.wallet_connections.pop(alvo, set())
+            for conexao in conexoes:
+                conexao.carteiras.discard(alvo)
+            self._enfileirar(conexoes, "UPDATE_LIST")
+        elif op == "acesso":
+            invalidar_carteira(alvo)
+
+    # ============================================================
+    # ENVIO
+    # ============================================================
+
+    def _enfileirar(self, conexoes, message: str) -> None:
+        """Enfileira a mensagem em cada conexão; derruba as que estão com a fila cheia."""
+        for conexao in list(conexoes):
+            if not conexao.enfileirar(message):
+                self._contadores["dropped_overflow"] += 1
+                self._derrubar(conexao, FECHAMENTO_LENTO)
+
+    async def _escrever(self, conexao: Conexao) -> None:
         """
-        for uid in user_ids:
-            await self.send_personal_message(message, uid)
+        Task de envio de uma conexão: esvazia a fila em ordem.
+
+        Um envio que passa de WS_SEND_TIMEOUT ou falha derruba a
+        conexão; as mensagens restantes são descartadas.
+        """
+        while True:
+            message, enfileirada = await conexao.fila.get()
+            conexao.pendentes.discard(message)
+            try:
+                await asyncio.wait_for(conexao.websocket.send_text(message), WS_SEND_TIMEOUT)
+            except asyncio.TimeoutError:
+                self._contadores["dropped_timeout"] += 1
+                self._derrubar(conexao, FECHAMENTO_LENTO)
+                return
+            except Exception:
+                self._contadores["dropped_error"] += 1
+                self._derrubar(conexao, FECHAMENTO_ERRO)
+                return
+
+            self._contadores["messages_sent"] += 1
+            self._latencias.append(time.perf_counter() - enfileirada)
+
+    async def _pingar(self) -> None:
+        """
+        Heartbeat: enfileira 'PING' em todas as conexões periodicamente.
+
+        Passa pela mesma fila dos avisos, então um socket morto cai no
+        timeout de envio; a resposta 'PONG' renova a atividade.
+        """
+        while True:
+            await asyncio.sleep(WS_PING_INTERVAL)
+            if self._heartbeat is not asyncio.current_task():
+                # Todas as conexões caíram enquanto esta task dormia
+                return
+            conexoes = [c for cs in self.active_connections.values() for c in cs]
+            self._contadores["pings_sent"] += len(conexoes)
+            self._enfileirar(conexoes, "PING")
+
+    def _derrubar(self, conexao: Conexao, codigo: int) -> None:
+        """Remove a conexão dos índices e fecha o socket em segundo plano."""
+        if not conexao.aberta:
+            return
+        self.disconnect(conexao)
+        asyncio.ensure_future(self._fechar(conexao.websocket, codigo))
+
+    @staticmethod
+    async def _fechar(websocket: WebSocket, codigo: int) -> None:
+        """Fecha o socket sem esperar indefinidamente por um cliente travado."""
+        try:
+            await asyncio.wait_for(websocket.close(code=codigo), WS_SEND_TIMEOUT)
+        except Exception:
+            pass
+
+    # ============================================================
+    # MÉTRICAS
+    # ============================================================
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores para o endpoint /metrics."""
+        latencias = sorted(self._latencias)
+
+        def percentil(p: float) -> float:
+            if not latencias:
+                return 0.0
+            return round(latencias[min(len(latencias) - 1, int(len(latencias) * p))] * 1000, 3)
+
+        return {
+            "users": len(self.active_connections),
+            "connections": sum(len(c) for c in self.active_connections.values()),
+            "wallet_topics": len(self.wallet_connections),
+            "subscriptions": sum(len(c) for c in self.wallet_connections.values()),
+            "queued": sum(c.fila.qsize() for conexoes in self.active_connections.values() for c in conexoes),
+            "backplane": self.backplane.stats(),
+            **self._contadores,
+            "fanout_latency_ms": {
+                "samples": len(latencias),
+                "p50": percentil(0.50),
+                "p95": percentil(0.95),
+                "max": round(latencias[-1] * 1000, 3) if latencias else 0.0,
+            },
+        }
 
 
 # Instância global do manager (singleton)
-manager = ConnectionManager()
+manager = ConnectionManager(criar_backplane())
 """
 Instância única do ConnectionManager usada por toda a aplicação.
 
 Importar e usar em outros módulos:
     >>> from app.realtime.manager import manager
-    >>> await manager.send_personal_message("UPDATE", user_id)
+    >>> await manager.broadcast_to_wallet("UPDATE_DASHBOARD", negocio_id)
 """
@@ -0,0 +1,73 @@
+"""
+TwoBolsos Backend - Respostas JSON Rápidas
+==========================================
+
+Este módulo fornece FastJSONResponse, usada pelas rotas de leitura
+mais pesadas (dashboard, extrato, lista de carteiras).
+
+Por que:
+    Quando uma rota retorna um dict, o FastAPI primeiro percorre a
+    estrutura inteira com jsonable_encoder (criando uma cópia) e só
+    depois serializa. Retornando uma FastJSONResponse pronta, esse
+    passo é pulado: o conteúdo vai direto para o serializador, que
+    já entende date, datetime e float.
+
+Serializador:
+    - orjson, se estiver instalado (opcional, ver requirements.txt)
+    - json da biblioteca padrão, caso contrário
+
+    O JSON gerado é o mesmo nos dois casos (UTF-8, datas em ISO 8601),
+    e igual ao que o frontend já recebe.
+
+Uso nos routers:
+    >>> @router.get("/pesado", response_class=FastJSONResponse)
+    >>> def pesado():
+    ...     return FastJSONResponse({"data": date.today(), "valor": 1.5})
+
+Autor: K4nishi
+Versão: 3.0.0
+"""
+
+import json
+from datetime import date, datetime
+from typing import Any
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depende do ambiente
+    orjson = None
+
+
+def _default(obj: Any) -> Any:
+    """Tipos que nenhum dos serializadores conhece nativamente."""
+    if isinstance(obj, (date, datetime)):
+        return obj.isoformat()
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    raise TypeError(f"Tipo não serializável: {type(obj).__name__}")
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse que serializa sem passar pelo jsonable_encoder.
+
+    Notas:
+        - Deve ser retornada pela rota (não basta response_class),
+          senão o FastAPI ainda converte o dict antes
+        - Headers como ETag são passados no construtor ou
+          adicionados na própria instância
+    """
+
+    def render(self, content: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+        return json.dumps(
+            content,
+            default=_default,
+            ensure_ascii=False,
+            allow_nan=False,
+            separators=(",", ":"),
+        ).encode("utf-8")
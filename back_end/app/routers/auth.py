@@ -14,24 +14,28 @@ Fluxo de autenticação:
     3. Token é incluído em requests: Authorization: Bearer <token>
     4. Token expira em 7 dias
 
+Hash de senhas:
+    O bcrypt roda no pool de processos de app/hashing.py. As rotas
+    são async e só aguardam o resultado; o acesso ao banco vai para
+    o threadpool. Com o pool saturado respondem 503.
+
 Autor: K4nishi
 Versão: 3.0.0
 """
 
 from datetime import timedelta
 
+from typing import Optional
+
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlmodel import Session
 
-from app.database import get_session
+from app.database import engine, get_write_session
 from app.models import User, UserBase
-from app.auth import (
-    get_password_hash, 
-    verify_password, 
-    create_access_token, 
-    ACCESS_TOKEN_EXPIRE_MINUTES
-)
+from app.auth import create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
+from app.hashing import gerar_hash_senha, verificar_senha
 
 
 router = APIRouter(prefix="/auth", tags=["Auth"])
@@ -57,14 +61,54 @@ class UserCreate(UserBase):
     password: str
 
 
+# ============================================================
+# ACESSO AO BANCO (executado no threadpool)
+# ============================================================
+
+def buscar_usuario(session: Session, username: str) -> Optional[User]:
+    """Busca um usuário pelo username."""
+    return session.query(User).filter(User.username == username).first()
+
+
+def carregar_usuario(username: str) -> Optional[User]:
+    """
+    Busca o usuário em uma sessão própria e curta.
+    
+    A conexão volta ao pool antes do bcrypt, no mesmo thread que a
+    pegou; com a sessão do request, cada login em espera prenderia
+    uma conexão de leitura até o fim da verificação.
+    """
+    with Session(engine) as session:
+        return buscar_usuario(session, username)
+
+
+def criar_usuario(session: Session, user_data: UserCreate, hashed_password: str) -> bool:
+    """
+    Grava o novo usuário com o hash já calculado.
+    
+    Returns:
+        False se o username já estiver em uso
+    """
+    if buscar_usuario(session, user_data.username):
+        return False
+    
+    session.add(User(
+        username=user_data.username,
+        email=user_data.email,
+        hashed_password=hashed_password
+    ))
+    session.commit()
+    return True
+
+
 # ============================================================
 # ENDPOINTS
 # ============================================================
 
 @router.post("/register")
-def register(
+async def register(
     user_data: UserCreate, 
-    session: Session = Depends(get_session)
+    session: Session = Depends(get_write_session)
 ):
     """
     Registra um novo usuário no sistema.
@@ -81,6 +125,7 @@ def register(
         
     Raises:
         HTTPException 400: Se o username já estiver em uso
+        HTTPException 503: Se o pool de hash estiver saturado
         
     Exemplo de request:
         ```json
@@ -99,35 +144,22 @@ def register(
         }
         ```
     """
-    # Verifica se username já existe
-    existing = session.query(User).filter(
-        User.username == user_data.username
-    ).first()
+    # O hash é calculado antes de tocar no banco: a sessão de escrita
+    # abre a transação (e o lock de escrita) na primeira consulta
+    hashed_password = await gerar_hash_senha(user_data.password)
     
-    if existing:
+    # Verifica se username já existe e cria o usuário
+    if not await run_in_threadpool(criar_usuario, session, user_data, hashed_password):
         raise HTTPException(
             status_code=400, 
             detail="Username already registered"
         )
     
-    # Cria novo usuário com senha hasheada
-    new_user = User(
-        username=user_data.username,
-        email=user_data.email,
-        hashed_password=get_password_hash(user_data.password)
-    )
-    
-    session.add(new_user)
-    session.commit()
-    
     return {"msg": "User created successfully"}
 
 
 @router.post("/token")
-def login(
-    form_data: OAuth2PasswordRequestForm = Depends(), 
-    session: Session = Depends(get_session)
-):
+async def login(form_data: OAuth2PasswordRequestForm = Depends()):
     """
     Autentica um usuário e retorna um token JWT.
     
@@ -137,7 +169,6 @@ def login(
     
     Args:
         form_data: Formulário OAuth2 com username e password
-        session: Sessão do banco de dados
         
     Returns:
         dict: Token de acesso e informações do usuário
@@ -148,6 +179,7 @@ def login(
             
     Raises:
         HTTPException 401: Se credenciais forem inválidas
+        HTTPException 503: Se o pool de hash estiver saturado
         
     Exemplo de request (form-data):
         ```
@@ -168,12 +200,10 @@ def login(
         ```
     """
     # Busca usuário pelo username
-    user = session.query(User).filter(
-        User.username == form_data.username
-    ).first()
+    user = await run_in_threadpool(carregar_usuario, form_data.username)
     
     # Verifica credenciais
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    if not user or not await verificar_senha(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -183,7 +213,7 @@ def login(
     # Gera token JWT
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.username}, 
+        data={"sub": user.username, "uid": user.id}, 
         expires_delta=access_token_expires
     )
     
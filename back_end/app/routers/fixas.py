@@ -14,6 +14,8 @@ Conceito de Despesas Fixas:
     São contas que se repetem mensalmente (aluguel, internet, etc).
     O sistema rastreia se já foram pagas no mês atual, gerando
     uma transação quando o usuário clica em "Pagar".
+    Cada pagamento fica registrado em PagamentoFixa, com uma
+    restrição única por (fixa, mês) no banco.
 
 Autor: K4nishi
 Versão: 3.0.0
@@ -22,19 +24,24 @@ Versão: 3.0.0
 from datetime import date
 from typing import List, Dict, Any
 
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Request, Response
+from sqlalchemy import delete
+from sqlalchemy.exc import IntegrityError
 from sqlmodel import Session, select
 
-from app.database import get_session
+from app.database import get_session, get_write_session
 from app.models import (
     DespesaFixa, 
     Transacao, 
     Negocio, 
     DespesaFixaCreate, 
     User,
-    NegocioShare
+    PagamentoFixa
 )
+from app.acesso import pode_editar, pode_ler
 from app.auth import get_current_user
+from app.etag import etag, marcar_etag, nao_modificado, resposta_304
+from app.ledger import marcar_alteracao, registrar_transacoes
 from app.realtime.manager import manager
 
 
@@ -43,64 +50,18 @@ router = APIRouter(tags=["Fixas"])
 
 
 # ============================================================
-# FUNÇÕES AUXILIARES DE PERMISSÃO
+# FUNÇÕES AUXILIARES
 # ============================================================
 
-def check_read_permission(session: Session, user_id: int, negocio_id: int) -> bool:
+def competencia(dia: date) -> int:
     """
-    Verifica se o usuário pode visualizar a carteira.
-    
-    Retorna True se o usuário é dono ou membro (qualquer role).
-    
-    Args:
-        session: Sessão do banco de dados
-        user_id: ID do usuário
-        negocio_id: ID da carteira
-        
-    Returns:
-        bool: True se pode visualizar
-    """
-    n = session.get(Negocio, negocio_id)
-    if not n: 
-        return False
-    
-    # Dono sempre pode ver
-    if n.owner_id == user_id: 
-        return True
-    
-    # Qualquer membro pode ver
-    share = next((s for s in n.shares if s.user_id == user_id), None)
-    return share is not None
-
+    Retorna o mês de `dia` no formato AAAAMM usado em PagamentoFixa.
 
-def check_edit_permission(session: Session, user_id: int, negocio_id: int) -> bool:
-    """
-    Verifica se o usuário pode editar a carteira.
-    
-    Retorna True se é dono ou membro com role editor/admin.
-    
-    Args:
-        session: Sessão do banco de dados
-        user_id: ID do usuário
-        negocio_id: ID da carteira
-        
-    Returns:
-        bool: True se pode editar
+    Exemplo:
+        >>> competencia(date(2024, 12, 26))
+        202412
     """
-    n = session.get(Negocio, negocio_id)
-    if not n: 
-        return False
-    
-    # Dono sempre pode editar
-    if n.owner_id == user_id: 
-        return True
-    
-    # Verifica role do membro
-    share = next((s for s in n.shares if s.user_id == user_id), None)
-    if share and share.role in ['admin', 'editor']: 
-        return True
-        
-    return False
+    return dia.year * 100 + dia.month
 
 
 # ============================================================
@@ -112,7 +73,7 @@ def criar_fixa(
     id: int, 
     f_in: DespesaFixaCreate, 
     background_tasks: BackgroundTasks, 
-    session: Session = Depends(get_session), 
+    session: Session = Depends(get_write_session), 
     user: User = Depends(get_current_user)
 ):
     """
@@ -146,7 +107,7 @@ def criar_fixa(
         }
         ```
     """
-    if not check_edit_permission(session, user.id, id):
+    if not pode_editar(session, user.id, id):
         raise HTTPException(403, "Sem permissão")
     
     # Garante que o negocio_id é o do path
@@ -155,14 +116,12 @@ def criar_fixa(
     
     f = DespesaFixa(**data)
     session.add(f)
+    marcar_alteracao(session, id)
     session.commit()
     session.refresh(f)
     
     # Notifica membros
-    n = session.get(Negocio, id)
-    shares = session.query(NegocioShare).filter(NegocioShare.negocio_id == id).all()
-    all_ids = [n.owner_id] + [s.user_id for s in shares]
-    background_tasks.add_task(manager.broadcast_to_wallet, "UPDATE_DASHBOARD", all_ids)
+    background_tasks.add_task(manager.broadcast_to_wallet, "UPDATE_DASHBOARD", id)
     
     return f
 
@@ -170,14 +129,16 @@ def criar_fixa(
 @router.get("/negocios/{id}/fixas", response_model=List[Dict[str, Any]])
 def listar_fixas_de_negocio(
     id: int, 
+    request: Request,
+    response: Response,
     session: Session = Depends(get_session), 
     user: User = Depends(get_current_user)
 ):
     """
     Lista todas as despesas fixas de uma carteira com status de pagamento.
     
-    Para cada despesa fixa, verifica se já existe uma transação
-    de pagamento no mês atual e retorna essa informação.
+    Busca as fixas junto com o PagamentoFixa do mês atual em uma
+    única consulta (LEFT JOIN) e retorna essa informação.
     
     Args:
         id: ID da carteira
@@ -215,39 +176,45 @@ def listar_fixas_de_negocio(
         ]
         ```
     """
-    if not check_read_permission(session, user.id, id):
+    if not pode_ler(session, user.id, id):
         raise HTTPException(403, "Sem permissão")
 
-    # Busca todas as fixas da carteira
+    # Criar, pagar ou remover fixas incrementa a versão da carteira;
+    # a virada do mês muda pago_neste_mes, então entra na tag também
+    mes = competencia(date.today())
+    tag = etag("fixas", id, session.get(Negocio, id).versao, mes)
+    if nao_modificado(request, tag):
+        return resposta_304(tag)
+    marcar_etag(response, tag)
+
+    # Uma única consulta: fixas da carteira + pagamento do mês (se houver)
     fixas = session.exec(
-        select(DespesaFixa).where(DespesaFixa.negocio_id == id)
-    ).all()
-    
-    hoje = date.today()
-    resposta = []
-    
-    for f in fixas:
-        # Busca transações desta fixa no mês atual
-        query = select(Transacao).where(
-            Transacao.fixa_id == f.id, 
-            Transacao.data >= date(hoje.year, hoje.month, 1).isoformat()
+        select(
+            DespesaFixa.id,
+            DespesaFixa.nome,
+            DespesaFixa.valor,
+            DespesaFixa.tag,
+            PagamentoFixa.id
         )
-        pagamentos = session.exec(query).all()
-        
-        # Verifica se algum pagamento é do mês atual
-        foi_pago = any(
-            date.fromisoformat(p.data).month == hoje.month and 
-            date.fromisoformat(p.data).year == hoje.year 
-            for p in pagamentos
+        .outerjoin(
+            PagamentoFixa,
+            (PagamentoFixa.fixa_id == DespesaFixa.id)
+            & (PagamentoFixa.competencia == mes)
         )
-        
-        resposta.append({
-            "id": f.id, 
-            "nome": f.nome, 
-            "valor": f.valor, 
-            "tag": f.tag, 
-            "pago_neste_mes": foi_pago
-        })
+        .where(DespesaFixa.negocio_id == id)
+        .order_by(DespesaFixa.id)
+    ).all()
+
+    resposta = [
+        {
+            "id": fixa_id,
+            "nome": nome,
+            "valor": valor,
+            "tag": tag,
+            "pago_neste_mes": pagamento_id is not None
+        }
+        for fixa_id, nome, valor, tag, pagamento_id in fixas
+    ]
         
     return resposta
 
@@ -257,13 +224,14 @@ def pagar_fixa(
     id: int, 
     fixa_id: int, 
     background_tasks: BackgroundTasks, 
-    session: Session = Depends(get_session), 
+    session: Session = Depends(get_write_session), 
     user: User = Depends(get_current_user)
 ):
     """
     Registra o pagamento de uma despesa fixa no mês atual.
     
-    Cria uma transação do tipo 'despesa' vinculada à despesa fixa.
+    Cria uma transação do tipo 'despesa' vinculada à despesa fixa
+    e o PagamentoFixa do mês, na mesma transação do banco.
     Se a fixa já foi paga neste mês, retorna erro.
     
     Args:
@@ -291,19 +259,10 @@ def pagar_fixa(
     if not f or f.negocio_id != id: 
         raise HTTPException(404, "Não encontrada")
     
-    if not check_edit_permission(session, user.id, f.negocio_id):
+    if not pode_editar(session, user.id, f.negocio_id):
         raise HTTPException(403, "Sem permissão")
 
-    # Verifica se já foi paga neste mês
     hoje = date.today()
-    existentes = session.exec(
-        select(Transacao).where(Transacao.fixa_id == fixa_id)
-    ).all()
-    
-    for t in existentes:
-        d = date.fromisoformat(t.data)
-        if d.month == hoje.month and d.year == hoje.year:
-            raise HTTPException(400, "Já pago")
     
     # Cria transação de pagamento
     t = Transacao(
@@ -312,20 +271,28 @@ def pagar_fixa(
         descricao=f"{f.nome} (Ref: {hoje.strftime('%m/%Y')})", 
         valor=f.valor,
         tipo="despesa",
-        data=hoje.isoformat(), 
+        data=hoje, 
         tag=f.tag,
         created_by_id=user.id
     )
     
     session.add(t)
+    session.flush()
+
+    # A restrição única (fixa_id, competencia) decide quem pagou primeiro
+    session.add(PagamentoFixa(fixa_id=f.id, competencia=competencia(hoje), transacao_id=t.id))
+    try:
+        session.flush()
+    except IntegrityError:
+        session.rollback()
+        raise HTTPException(400, "Já pago")
+
+    registrar_transacoes(session, [t])  # Atualiza saldo da carteira
     session.commit()
     session.refresh(t)
 
     # Notifica membros
-    n = session.get(Negocio, id)
-    shares = session.query(NegocioShare).filter(NegocioShare.negocio_id == id).all()
-    all_ids = [n.owner_id] + [s.user_id for s in shares]
-    background_tasks.add_task(manager.broadcast_to_wallet, "UPDATE_DASHBOARD", all_ids)
+    background_tasks.add_task(manager.broadcast_to_wallet, "UPDATE_DASHBOARD", id)
     
     return t
 
@@ -335,14 +302,15 @@ def deletar_fixa(
     id: int, 
     fixa_id: int, 
     background_tasks: BackgroundTasks, 
-    session: Session = Depends(get_session), 
+    session: Session = Depends(get_write_session), 
     user: User = Depends(get_current_user)
 ):
     """
     Deleta uma despesa fixa.
     
-    Remove permanentemente a despesa fixa. As transações de
-    pagamento já criadas NÃO são removidas (histórico mantido).
+    Remove permanentemente a despesa fixa e seus registros de
+    pagamento. As transações de pagamento já criadas NÃO são
+    removidas (histórico mantido).
     
     Args:
         id: ID da carteira
@@ -362,16 +330,15 @@ def deletar_fixa(
     if not f or f.negocio_id != id: 
         raise HTTPException(404)
     
-    if not check_edit_permission(session, user.id, f.negocio_id): 
+    if not pode_editar(session, user.id, f.negocio_id): 
         raise HTTPException(403)
     
+    session.exec(delete(PagamentoFixa).where(PagamentoFixa.fixa_id == fixa_id))
     session.delete(f)
+    marcar_alteracao(session, id)
     session.commit()
 
     # Notifica membros
-    n = session.get(Negocio, id)
-    shares = session.query(NegocioShare).filter(NegocioShare.negocio_id == id).all()
-    all_ids = [n.owner_id] + [s.user_id for s in shares]
-    background_tasks.add_task(manager.broadcast_to_wallet, "UPDATE_DASHBOARD", all_ids)
+    background_tasks.add_task(manager.broadcast_to_wallet, "UPDATE_DASHBOARD", id)
 
     return {"ok": True}
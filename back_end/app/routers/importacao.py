@@ -0,0 +1,132 @@
+"""
+TwoBolsos Backend - Statement Import Router
+============================================
+
+Router responsável pela importação de extratos bancários.
+
+Endpoints:
+    POST /negocios/{id}/importar: Importar extrato CSV ou OFX
+
+Fluxo:
+    1. O arquivo chega como upload multipart (o Starlette já o
+       guarda em disco a partir de 1 MB, sem ocupar memória)
+    2. O leitor (app/importacao.py) percorre o arquivo linha a linha
+    3. As transações são gravadas em lotes, ignorando duplicadas
+    4. Os membros recebem uma única notificação no final
+
+Autor: K4nishi
+Versão: 3.0.0
+"""
+
+import codecs
+import io
+from typing import Optional
+
+from fastapi import APIRouter, BackgroundTasks, Depends, File, Form, HTTPException, UploadFile
+from pydantic import ValidationError
+from sqlmodel import Session
+
+from app.acesso import pode_editar
+from app.auth import get_current_user
+from app.database import get_write_session
+from app.importacao import MapeamentoCSV, importar_extrato, ler_csv, ler_ofx
+from app.models import User
+from app.realtime.manager import manager
+
+
+router = APIRouter(tags=["Importacao"])
+"""Router de importação (sem prefixo, usa o path completo)"""
+
+ENCODING_PADRAO = {"csv": "utf-8-sig", "ofx": "cp1252"}
+"""Codificação usada quando o cliente não informa (OFX costuma vir em CHARSET 1252)."""
+
+
+# ============================================================
+# ENDPOINTS
+# ============================================================
+
+@router.post("/negocios/{id}/importar")
+def importar(
+    id: int,
+    background_tasks: BackgroundTasks,
+    arquivo: UploadFile = File(...),
+    formato: str = Form("csv"),
+    mapeamento: Optional[str] = Form(None),
+    encoding: Optional[str] = Form(None),
+    session: Session = Depends(get_write_session),
+    user: User = Depends(get_current_user)
+):
+    """
+    Importa um extrato bancário para a carteira.
+
+    As linhas são lidas em streaming e gravadas em lotes, então
+    arquivos grandes não aumentam o uso de memória. Linhas já
+    existentes na carteira (mesmo hash de conteúdo) são ignoradas.
+
+    Args:
+        id: ID da carteira de destino
+        background_tasks: Para notificações WebSocket
+        arquivo: Arquivo do extrato
+        formato: 'csv' ou 'ofx'
+        mapeamento: JSON com o MapeamentoCSV (apenas CSV)
+        encoding: Codificação do arquivo (padrão depende do formato)
+        session: Sessão do banco de dados
+        user: Usuário autenticado
+
+    Returns:
+        dict: inseridas, ignoradas, rejeitadas e os primeiros erros
+
+    Raises:
+        HTTPException 403: Se não tiver permissão de edição
+        HTTPException 400: Formato, mapeamento ou cabeçalho inválido
+
+    Exemplo de request (multipart):
+        ```
+        POST /negocios/1/importar
+        arquivo=@extrato.csv
+        formato=csv
+        mapeamento={"data": "Data", "descricao": "Histórico", "valor": "Valor"}
+        ```
+
+    Exemplo de resposta:
+        ```json
+        {"inseridas": 812, "ignoradas": 30, "rejeitadas": 1,
+         "erros": [{"linha": 57, "erro": "Valor inválido: 'abc'"}]}
+        ```
+    """
+    if not pode_editar(session, user.id, id):
+        raise HTTPException(403, "Sem permissão")
+
+    formato = formato.lower()
+    if formato not in ENCODING_PADRAO:
+        raise HTTPException(400, "Formato deve ser 'csv' ou 'ofx'")
+
+    try:
+        mapa = MapeamentoCSV.model_validate_json(mapeamento) if mapeamento else MapeamentoCSV()
+    except ValidationError as e:
+        raise HTTPException(400, f"Mapeamento inválido: {e.errors()[0]['msg']}")
+
+    encoding = encoding or ENCODING_PADRAO[formato]
+    try:
+        codecs.lookup(encoding)
+    except LookupError:
+        raise HTTPException(400, f"Encoding desconhecido: {encoding}")
+
+    texto = io.TextIOWrapper(arquivo.file, encoding=encoding, errors="replace", newline="")
+
+    try:
+        if formato == "csv":
+            linhas = ler_csv(texto, id, mapa)
+        else:
+            linhas = ler_ofx(texto, id)
+        relatorio = importar_extrato(session, id, user.id, linhas)
+    except ValueError as e:
+        # Cabeçalho sem as colunas do mapeamento
+        raise HTTPException(400, str(e))
+    finally:
+        texto.detach()
+
+    if relatorio["inseridas"]:
+        background_tasks.add_task(manager.broadcast_to_wallet, "UPDATE_DASHBOARD", id)
+
+    return relatorio
@@ -10,6 +10,8 @@ Endpoints:
         GET /negocios: Listar carteiras do usuário
         DELETE /negocios/{id}: Deletar carteira
         GET /negocios/{id}/dashboard: Dashboard completo
+        GET /negocios/{id}/extrato: Extrato paginado (cursor)
+        GET /negocios/{id}/export: Extrato completo em CSV ou NDJSON
         
     Compartilhamento:
         POST /negocios/{id}/invite: Gerar código de convite
@@ -20,37 +22,66 @@ Endpoints:
 
 Dashboard:
     O endpoint /dashboard retorna todos os dados necessários para
-    a interface, incluindo KPIs, gráficos e extrato de transações.
+    a interface, incluindo KPIs, gráficos e a primeira página do
+    extrato. As páginas seguintes vêm de /extrato, paginadas por
+    cursor sobre (data, id).
+
+    O payload calculado fica em cache por (carteira, versão, dias, dia);
+    como toda escrita incrementa Negocio.versao, um dashboard só é
+    recalculado depois que algo na carteira muda.
+
+ETags:
+    Os GETs devolvem uma ETag montada a partir de Negocio.versao (ver
+    app/etag.py). Com If-None-Match atual a resposta é 304, sem
+    consultar agregados nem serializar nada.
 
 Autor: K4nishi
 Versão: 3.0.0
 """
 
 from datetime import date, timedelta, datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
+import base64
 import random
 import string
 
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
-from sqlmodel import Session, select
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import and_, case, or_, type_coerce
+from sqlmodel import Session, select, func
 from pydantic import BaseModel
 
-from app.database import get_session
+from app.database import get_session, get_write_session
 from app.models import (
+    Centavos,
     Negocio, 
+    NegocioSaldo,
+    ResumoDiario,
     Transacao, 
     User, 
     NegocioShare, 
     InviteCode, 
     NegocioBase
 )
+from app.acesso import exigir_leitura, papel
 from app.auth import get_current_user
+from app.cache import dashboard_cache, dashboard_flight
+from app.etag import etag, marcar_etag, nao_modificado, resposta_304
+from app.exportacao import gerar_csv, gerar_ndjson
+from app.ledger import marcar_alteracao, remover_negocio
 from app.realtime.manager import manager
+from app.responses import FastJSONResponse
 
 
 router = APIRouter(prefix="/negocios", tags=["Negocios"])
 """Router de carteiras com prefixo /negocios"""
 
+EXTRATO_PAGE_SIZE = 50
+"""Tamanho padrão de uma página do extrato."""
+
+EXTRATO_MAX_PAGE_SIZE = 200
+"""Maior página aceita em /extrato?limit=."""
+
 
 # ============================================================
 # SCHEMAS AUXILIARES
@@ -61,6 +92,231 @@ class RoleUpdate(BaseModel):
     role: str
 
 
+# ============================================================
+# FUNÇÕES AUXILIARES
+# ============================================================
+
+def soma_tipo_sql(modelo, tipo: str):
+    """
+    Expressão SQL da soma condicional de um tipo: SUM(CASE tipo = ... ).
+
+    Funciona para Transacao e ResumoDiario (ambos têm tipo e valor
+    em centavos); retorna 0 quando não há linhas.
+    """
+    return func.coalesce(
+        func.sum(case((modelo.tipo == tipo, modelo.valor), else_=0)),
+        0
+    )
+
+
+def saldo_sql(modelo=Transacao):
+    """
+    Expressão SQL do saldo: SUM(receitas) - SUM(despesas).
+
+    A soma é feita em centavos inteiros pelo SQLite e convertida
+    para reais uma única vez (ver models.Centavos).
+    """
+    return func.coalesce(func.sum(case(
+        (modelo.tipo == 'receita', modelo.valor),
+        (modelo.tipo == 'despesa', -modelo.valor),
+        else_=0
+    )), 0)
+
+
+def codificar_cursor(dia: date, transacao_id: int) -> str:
+    """Cursor opaco do extrato: base64 de 'YYYY-MM-DD|id'."""
+    texto = f"{dia.isoformat()}|{transacao_id}"
+    return base64.urlsafe_b64encode(texto.encode()).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor: str) -> Tuple[date, int]:
+    """
+    Lê um cursor gerado por codificar_cursor.
+
+    Raises:
+        HTTPException 400: Se o cursor for inválido
+    """
+    try:
+        texto = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        dia, transacao_id = texto.split("|")
+        return date.fromisoformat(dia), int(transacao_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(400, "Cursor inválido")
+
+
+def pagina_extrato(
+    session: Session,
+    negocio_id: int,
+    limit: int = EXTRATO_PAGE_SIZE,
+    cursor: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Busca uma página do extrato, da transação mais recente para a mais antiga.
+
+    Paginação por chave (keyset) sobre (data, id): cada página continua
+    depois da última linha da anterior, usando o índice
+    (negocio_id, data), sem OFFSET. O nome do criador vem do mesmo
+    SELECT (LEFT JOIN em user), sem um lazy load por linha.
+
+    Args:
+        session: Sessão do banco de dados
+        negocio_id: ID da carteira
+        limit: Número máximo de itens
+        cursor: next_cursor da página anterior (None = primeira página)
+
+    Returns:
+        dict: {"itens": [...], "next_cursor": str ou None}
+    """
+    query = (
+        select(
+            Transacao.id,
+            Transacao.negocio_id,
+            Transacao.data,
+            Transacao.tipo,
+            Transacao.valor,
+            Transacao.descricao,
+            Transacao.tag,
+            Transacao.km,
+            Transacao.litros,
+            Transacao.fixa_id,
+            Transacao.created_by_id,
+            func.coalesce(User.username, "N/A").label("created_by_name")
+        )
+        .outerjoin(User, User.id == Transacao.created_by_id)
+        .where(Transacao.negocio_id == negocio_id)
+        .order_by(Transacao.data.desc(), Transacao.id.desc())
+        .limit(limit + 1)
+    )
+
+    if cursor:
+        dia, ultimo_id = decodificar_cursor(cursor)
+        query = query.where(or_(
+            Transacao.data < dia,
+            and_(Transacao.data == dia, Transacao.id < ultimo_id)
+        ))
+
+    linhas = session.exec(query).all()
+
+    # Uma linha a mais indica que existe próxima página
+    next_cursor = None
+    if len(linhas) > limit:
+        linhas = linhas[:limit]
+        next_cursor = codificar_cursor(linhas[-1].data, linhas[-1].id)
+
+    return {
+        "itens": [dict(linha._mapping) for linha in linhas],
+        "next_cursor": next_cursor
+    }
+
+
+def montar_dashboard(session: Session, n: Negocio, dias: int, hoje: date) -> Dict[str, Any]:
+    """
+    Calcula o dashboard de uma carteira (tudo menos o role do usuário).
+
+    O resultado depende só da carteira, de `dias` e da data de hoje,
+    então pode ser compartilhado entre os membros (ver app/cache.py).
+
+    Args:
+        session: Sessão do banco de dados
+        n: Carteira (já com permissão verificada)
+        dias: Quantidade de dias do gráfico de linha
+        hoje: Último dia do gráfico
+
+    Returns:
+        dict: negocio, kpis, grafico, pizza, extrato e extrato_next_cursor
+    """
+    # ==================== KPIs ====================
+    # Uma única agregação condicional sobre o resumo diário: somas
+    # exatas em centavos, sem ler (nem montar objetos de) transações
+    rec, desp, saldo, km, lit = session.exec(
+        select(
+            soma_tipo_sql(ResumoDiario, 'receita'),
+            soma_tipo_sql(ResumoDiario, 'despesa'),
+            saldo_sql(ResumoDiario),
+            func.coalesce(func.sum(ResumoDiario.km), 0.0),
+            func.coalesce(func.sum(ResumoDiario.litros), 0.0)
+        )
+        .where(ResumoDiario.negocio_id == n.id)
+    ).one()
+    
+    # Autonomia (KM por litro)
+    kml = km / lit if lit > 0 else 0.0
+    
+    # Rendimento por KM rodado
+    rendimento_km = saldo / km if km > 0 else 0.0
+
+    # ==================== Gráfico de Linha ====================
+    inicio_grafico = hoje - timedelta(days=dias - 1)
+
+    # Lê do resumo diário: o custo depende de dias × categorias,
+    # não do número de transações da carteira
+    por_dia = session.exec(
+        select(ResumoDiario.dia, ResumoDiario.tipo, func.sum(ResumoDiario.valor))
+        .where(ResumoDiario.negocio_id == n.id, ResumoDiario.dia >= inicio_grafico)
+        .group_by(ResumoDiario.dia, ResumoDiario.tipo)
+    ).all()
+    totais_dia = {(d, tipo): total for d, tipo, total in por_dia}
+
+    grafico_linha = {"labels": [], "receitas": [], "despesas": []}
+
+    for i in range(dias - 1, -1, -1):
+        dia = hoje - timedelta(days=i)
+        grafico_linha["labels"].append(dia.strftime("%d/%m"))
+        grafico_linha["receitas"].append(totais_dia.get((dia, 'receita'), 0))
+        grafico_linha["despesas"].append(totais_dia.get((dia, 'despesa'), 0))
+
+    # ==================== Gráfico de Pizza ====================
+    mes_inicio = hoje - timedelta(days=30)
+
+    por_tag = session.exec(
+        select(ResumoDiario.tag, func.sum(ResumoDiario.valor))
+        .where(
+            ResumoDiario.negocio_id == n.id,
+            ResumoDiario.tipo == 'despesa',
+            ResumoDiario.dia >= mes_inicio
+        )
+        .group_by(ResumoDiario.tag)
+    ).all()
+
+    gastos_pizza = {}
+    for tag, total in por_tag:
+        cat = tag if tag else "Outros"
+        gastos_pizza[cat] = gastos_pizza.get(cat, 0) + total
+
+    # ==================== Extrato (primeira página) ====================
+    extrato = pagina_extrato(session, n.id)
+
+    return {
+        "negocio": n.dict(),
+        "kpis": {
+            "receita": rec, 
+            "despesa": desp, 
+            "saldo": saldo, 
+            "total_km": km, 
+            "total_litros": lit, 
+            "autonomia": kml, 
+            "rendimento": rendimento_km
+        },
+        "grafico": grafico_linha,
+        "pizza": gastos_pizza,
+        "extrato": extrato["itens"],
+        "extrato_next_cursor": extrato["next_cursor"]
+    }
+
+
+def calcular_dashboard(session: Session, n: Negocio, dias: int, chave: tuple) -> Dict[str, Any]:
+    """
+    Calcula o dashboard e guarda no cache antes de liberar quem espera.
+
+    Executada dentro do dashboard_flight: o cache é preenchido antes
+    da chave sair de "em andamento", então nenhum request chega num
+    intervalo em que ela não está nem no cache nem em cálculo.
+    """
+    payload = montar_dashboard(session, n, dias, chave[3])
+    dashboard_cache.put(chave, payload)
+    return payload
+
+
 # ============================================================
 # CRUD DE CARTEIRAS
 # ============================================================
@@ -69,7 +325,7 @@ class RoleUpdate(BaseModel):
 def criar_negocio(
     n_in: NegocioBase, 
     background_tasks: BackgroundTasks, 
-    session: Session = Depends(get_session), 
+    session: Session = Depends(get_write_session), 
     user: User = Depends(get_current_user)
 ):
     """
@@ -111,8 +367,9 @@ def criar_negocio(
     return n
 
 
-@router.get("", response_model=List[Dict[str, Any]])
+@router.get("", response_model=List[Dict[str, Any]], response_class=FastJSONResponse)
 def listar_negocios(
+    request: Request,
     session: Session = Depends(get_session), 
     user: User = Depends(get_current_user)
 ):
@@ -135,51 +392,75 @@ def listar_negocios(
             - saldo: Receitas - Despesas
             - role: 'owner', 'editor' ou 'viewer'
             - owner_name: Nome do dono (ou "Você")
+            
+    Notas:
+        - A ETag vem dos pares (id, versao) das carteiras visíveis:
+          muda quando uma carteira entra, sai ou é alterada
     """
-    # Carteiras próprias
-    owned = session.query(Negocio).filter(Negocio.owner_id == user.id).all()
-    
-    # Carteiras compartilhadas
-    shared_links = session.query(NegocioShare).filter(
-        NegocioShare.user_id == user.id
+    acesso = (
+        (NegocioShare.negocio_id == Negocio.id) & (NegocioShare.user_id == user.id)
+    )
+    visivel = (Negocio.owner_id == user.id) | (NegocioShare.user_id != None)  # noqa: E711
+
+    versoes = session.exec(
+        select(Negocio.id, Negocio.versao)
+        .outerjoin(NegocioShare, acesso)
+        .where(visivel)
+        .order_by(Negocio.id)
     ).all()
-    shared = [link.negocio for link in shared_links]
-    
-    all_negocios = owned + shared
+    tag = etag("negocios", user.id, *(f"{nid}.{v}" for nid, v in versoes))
+    if nao_modificado(request, tag):
+        return resposta_304(tag)
+
+    # Uma única consulta: carteiras próprias + compartilhadas, com
+    # dono, role e saldo materializado (não lê as transações)
+    saldo = type_coerce(
+        func.coalesce(NegocioSaldo.receita, 0) - func.coalesce(NegocioSaldo.despesa, 0),
+        Centavos
+    )
+    query = (
+        select(
+            Negocio.id,
+            Negocio.nome,
+            Negocio.categoria,
+            Negocio.cor,
+            Negocio.owner_id,
+            User.username,
+            NegocioShare.role,
+            saldo
+        )
+        .join(User, User.id == Negocio.owner_id)
+        .outerjoin(NegocioShare, acesso)
+        .outerjoin(NegocioSaldo, NegocioSaldo.negocio_id == Negocio.id)
+        .where(visivel)
+        # Próprias primeiro, como antes
+        .order_by(Negocio.owner_id != user.id, Negocio.id)
+    )
     
     lista = []
-    for n in all_negocios:
-        # Determina a role do usuário
-        is_owner = n.owner_id == user.id
-        role = "owner"
-        if not is_owner:
-            share_link = next(
-                (s for s in shared_links if s.negocio_id == n.id), 
-                None
-            )
-            role = share_link.role if share_link else "viewer"
-
-        # Calcula saldo
-        rec = sum(t.valor for t in n.transacoes if t.tipo == 'receita')
-        desp = sum(t.valor for t in n.transacoes if t.tipo == 'despesa')
+    for nid, nome, categoria, cor, owner_id, owner_name, share_role, saldo_n in session.exec(query):
+        is_owner = owner_id == user.id
         
         lista.append({
-            "id": n.id, 
-            "nome": n.nome, 
-            "categoria": n.categoria, 
-            "cor": n.cor, 
-            "saldo": rec - desp,
-            "role": role,
-            "owner_name": n.owner.username if not is_owner else "Você"
+            "id": nid, 
+            "nome": nome, 
+            "categoria": categoria, 
+            "cor": cor, 
+            "saldo": saldo_n,
+            "role": "owner" if is_owner else (share_role or "viewer"),
+            "owner_name": owner_name if not is_owner else "Você"
         })
         
-    return lista
+    resposta = FastJSONResponse(lista)
+    marcar_etag(resposta, tag)
+    return resposta
 
 
 @router.delete("/{id}")
 def deletar_negocio(
     id: int, 
-    session: Session = Depends(get_session), 
+    background_tasks: BackgroundTasks, 
+    session: Session = Depends(get_write_session), 
     user: User = Depends(get_current_user)
 ):
     """
@@ -190,6 +471,7 @@ def deletar_negocio(
     
     Args:
         id: ID da carteira a deletar
+        background_tasks: Para notificações
         session: Sessão do banco de dados
         user: Usuário autenticado
         
@@ -207,15 +489,20 @@ def deletar_negocio(
     if n.owner_id != user.id:
         raise HTTPException(status_code=403, detail="Apenas o dono pode deletar")
     
+    remover_negocio(session, id)
     session.delete(n)
     session.commit()
     
+    # Quem estava vendo a carteira recarrega a lista; o tópico é removido
+    background_tasks.add_task(manager.close_wallet, id)
+    
     return {"ok": True}
 
 
-@router.get("/{id}/dashboard")
+@router.get("/{id}/dashboard", response_class=FastJSONResponse)
 def get_dashboard(
     id: int, 
+    request: Request,
     dias: int = 7, 
     session: Session = Depends(get_session), 
     user: User = Depends(get_current_user)
@@ -224,7 +511,9 @@ def get_dashboard(
     Retorna dados completos do dashboard de uma carteira.
     
     Inclui KPIs (totais, média), dados para gráficos (linha e pizza)
-    e extrato completo de transações ordenado por data.
+    e a primeira página do extrato (mais recentes primeiro). As demais
+    páginas são buscadas em /negocios/{id}/extrato com o cursor
+    retornado em extrato_next_cursor.
     
     Args:
         id: ID da carteira
@@ -239,7 +528,8 @@ def get_dashboard(
             - kpis: Receita, despesa, saldo, KM, litros, autonomia
             - grafico: Dados para gráfico de linha (últimos N dias)
             - pizza: Dados para gráfico de pizza (gastos por categoria)
-            - extrato: Lista de transações com nome do criador
+            - extrato: Primeira página de transações com nome do criador
+            - extrato_next_cursor: Cursor da próxima página (ou null)
             
     Raises:
         HTTPException 404: Se carteira não existe
@@ -269,7 +559,8 @@ def get_dashboard(
                 "Transporte": 300,
                 "Lazer": 200
             },
-            "extrato": [...]
+            "extrato": [...],
+            "extrato_next_cursor": "MjAyNC0xMi0yMHw0Mg"
         }
         ```
     """
@@ -278,87 +569,134 @@ def get_dashboard(
     if not n: 
         raise HTTPException(404)
     
-    is_owner = n.owner_id == user.id
-    share_link = session.query(NegocioShare).filter(
-        NegocioShare.negocio_id == id, 
-        NegocioShare.user_id == user.id
-    ).first()
-    
-    if not is_owner and not share_link:
-        raise HTTPException(403, "Sem permissão")
-    
-    # Busca transações ordenadas por data
-    transacoes = session.exec(
-        select(Transacao)
-        .where(Transacao.negocio_id == id)
-        .order_by(Transacao.data.desc())
-    ).all()
+    role = exigir_leitura(session, user.id, id)
+
+    # O payload só muda quando a carteira muda (versao) ou o dia vira
+    chave = (id, n.versao, dias, date.today())
+
+    tag = etag("dashboard", id, n.versao, dias, chave[3].isoformat(), role)
+    if nao_modificado(request, tag):
+        return resposta_304(tag)
+
+    payload = dashboard_cache.get(chave)
+    if payload is None:
+        # Requests simultâneos (ex: logo após um broadcast) calculam uma vez só
+        payload = dashboard_flight.do(chave, lambda: calcular_dashboard(session, n, dias, chave))
+
+    resposta = FastJSONResponse({**payload, "role": role})
+    marcar_etag(resposta, tag)
+    return resposta
+
+
+@router.get("/{id}/extrato", response_class=FastJSONResponse)
+def listar_extrato(
+    id: int,
+    request: Request,
+    limit: int = Query(EXTRATO_PAGE_SIZE, ge=1, le=EXTRATO_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    session: Session = Depends(get_session),
+    user: User = Depends(get_current_user)
+):
+    """
+    Retorna uma página do extrato da carteira.
     
-    # ==================== KPIs ====================
-    rec = sum(t.valor for t in transacoes if t.tipo == 'receita')
-    desp = sum(t.valor for t in transacoes if t.tipo == 'despesa')
-    km = sum(t.km for t in transacoes if t.km)
-    lit = sum(t.litros for t in transacoes if t.litros)
+    Ordenado da transação mais recente para a mais antiga. Para
+    buscar a próxima página, repita a chamada com cursor=next_cursor;
+    next_cursor null indica o fim do extrato.
     
-    # Autonomia (KM por litro)
-    kml = km / lit if lit > 0 else 0.0
-    
-    # Rendimento por KM rodado
-    rendimento_km = (rec - desp) / km if km > 0 else 0.0
+    Args:
+        id: ID da carteira
+        limit: Itens por página (1 a EXTRATO_MAX_PAGE_SIZE)
+        cursor: Cursor opaco da página anterior
+        session: Sessão do banco de dados
+        user: Usuário autenticado
+        
+    Returns:
+        dict: {"itens": [...], "next_cursor": str ou null}
+        
+    Raises:
+        HTTPException 404: Se carteira não existe
+        HTTPException 403: Se não tem permissão
+        HTTPException 400: Se o cursor for inválido
+    """
+    n = session.get(Negocio, id)
+    if not n:
+        raise HTTPException(404)
 
-    # ==================== Gráfico de Linha ====================
-    hoje = date.today()
-    grafico_linha = {"labels": [], "receitas": [], "despesas": []}
+    exigir_leitura(session, user.id, id)
+
+    tag = etag("extrato", id, n.versao, limit, cursor or "")
+    if nao_modificado(request, tag):
+        return resposta_304(tag)
+
+    resposta = FastJSONResponse(pagina_extrato(session, id, limit, cursor))
+    marcar_etag(resposta, tag)
+    return resposta
+
+
+@router.get("/{id}/export")
+def exportar_extrato(
+    id: int,
+    request: Request,
+    formato: str = Query("csv", alias="format"),
+    inicio: Optional[date] = Query(None, alias="from"),
+    fim: Optional[date] = Query(None, alias="to"),
+    session: Session = Depends(get_session),
+    user: User = Depends(get_current_user)
+):
+    """
+    Exporta o extrato da carteira em streaming.
     
-    for i in range(dias - 1, -1, -1):
-        dia = hoje - timedelta(days=i)
-        dia_str = dia.isoformat() 
-        grafico_linha["labels"].append(dia.strftime("%d/%m"))
+    As linhas são enviadas em blocos conforme saem do banco
+    (ver app/exportacao.py), então carteiras de qualquer tamanho
+    começam a baixar imediatamente e sem consumir memória.
+    
+    Args:
+        id: ID da carteira
+        formato: 'csv' ou 'ndjson' (query param `format`)
+        inicio: Primeiro dia incluído, 'YYYY-MM-DD' (query param `from`)
+        fim: Último dia incluído, 'YYYY-MM-DD' (query param `to`)
+        session: Sessão do banco de dados
+        user: Usuário autenticado
         
-        do_dia = [t for t in transacoes if t.data == dia_str]
-        grafico_linha["receitas"].append(
-            sum(t.valor for t in do_dia if t.tipo == 'receita')
-        )
-        grafico_linha["despesas"].append(
-            sum(t.valor for t in do_dia if t.tipo == 'despesa')
-        )
+    Returns:
+        StreamingResponse: Arquivo para download, ordenado por data
+        
+    Raises:
+        HTTPException 404: Se carteira não existe
+        HTTPException 403: Se não tem permissão
+        HTTPException 400: Se o formato for inválido
+        
+    Exemplo:
+        ```
+        GET /negocios/1/export?format=ndjson&from=2024-01-01&to=2024-12-31
+        ```
+    """
+    n = session.get(Negocio, id)
+    if not n:
+        raise HTTPException(404)
 
-    # ==================== Gráfico de Pizza ====================
-    mes_inicio = (hoje - timedelta(days=30)).isoformat()
-    gastos_pizza = {}
-    
-    for t in transacoes:
-        if t.tipo == 'despesa' and t.data >= mes_inicio:
-            cat = t.tag if t.tag else "Outros"
-            gastos_pizza[cat] = gastos_pizza.get(cat, 0) + t.valor
-
-    # ==================== Extrato Enriquecido ====================
-    extrato_rich = []
-    for t in transacoes:
-        t_dict = t.dict()
-        # Adiciona nome do criador
-        if t.created_by:
-            t_dict["created_by_name"] = t.created_by.username
-        else:
-            t_dict["created_by_name"] = "N/A"
-        extrato_rich.append(t_dict)
+    exigir_leitura(session, user.id, id)
 
-    return {
-        "negocio": n,
-        "role": "owner" if is_owner else share_link.role,
-        "kpis": {
-            "receita": rec, 
-            "despesa": desp, 
-            "saldo": rec - desp, 
-            "total_km": km, 
-            "total_litros": lit, 
-            "autonomia": kml, 
-            "rendimento": rendimento_km
-        },
-        "grafico": grafico_linha,
-        "pizza": gastos_pizza,
-        "extrato": extrato_rich
-    }
+    if formato not in ("csv", "ndjson"):
+        raise HTTPException(400, "Formato deve ser 'csv' ou 'ndjson'")
+
+    tag = etag("export", id, n.versao, formato, inicio or "", fim or "")
+    if nao_modificado(request, tag):
+        return resposta_304(tag)
+
+    if formato == "csv":
+        corpo, media_type = gerar_csv(id, inicio, fim), "text/csv; charset=utf-8"
+    else:
+        corpo, media_type = gerar_ndjson(id, inicio, fim), "application/x-ndjson"
+
+    resposta = StreamingResponse(
+        corpo,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="extrato_{id}.{formato}"'}
+    )
+    marcar_etag(resposta, tag)
+    return resposta
 
 
 # ============================================================
@@ -368,7 +706,7 @@ def get_dashboard(
 @router.post("/{id}/invite")
 def create_invite(
     id: int, 
-    session: Session = Depends(get_session), 
+    session: Session = Depends(get_write_session), 
     user: User = Depends(get_current_user)
 ):
     """
@@ -398,8 +736,7 @@ def create_invite(
         }
         ```
     """
-    n = session.get(Negocio, id)
-    if not n or n.owner_id != user.id:
+    if papel(session, user.id, id) != "owner":
         raise HTTPException(403, "Apenas dono pode convidar")
     
     # Gera código aleatório de 6 caracteres
@@ -407,7 +744,7 @@ def create_invite(
     
     invite = InviteCode(
         code=code, 
-        negocio_id=n.id, 
+        negocio_id=id, 
         expires_at=datetime.utcnow() + timedelta(days=1)
     )
     
@@ -421,7 +758,7 @@ def create_invite(
 def join_negocio(
     code: str, 
     background_tasks: BackgroundTasks, 
-    session: Session = Depends(get_session), 
+    session: Session = Depends(get_write_session), 
     user: User = Depends(get_current_user)
 ):
     """
@@ -462,17 +799,14 @@ def join_negocio(
     
     n = session.get(Negocio, invite.negocio_id)
     
+    role = papel(session, user.id, invite.negocio_id)
+    
     # Verifica se é o próprio dono
-    if n.owner_id == user.id:
+    if role == "owner":
         raise HTTPException(400, "Você é o dono")
     
-    # Verifica se já é membro
-    exists = session.query(NegocioShare).filter(
-        NegocioShare.user_id == user.id, 
-        NegocioShare.negocio_id == invite.negocio_id
-    ).first()
-    
-    if not exists:
+    # Se já é membro, mantém a role atual
+    if role is None:
         # Cria novo compartilhamento
         share = NegocioShare(
             user_id=user.id, 
@@ -480,14 +814,14 @@ def join_negocio(
             role="editor"
         )
         session.add(share)
+        marcar_alteracao(session, invite.negocio_id)
         session.commit()
     
-    # Notifica todos os membros
-    shares = session.query(NegocioShare).filter(
-        NegocioShare.negocio_id == n.id
-    ).all()
-    all_ids = [n.owner_id] + [s.user_id for s in shares]
-    background_tasks.add_task(manager.broadcast_to_wallet, "UPDATE_DASHBOARD", all_ids)
+    # Notifica quem está vendo a carteira e as outras telas do novo membro;
+    # os outros workers descartam o papel antigo ("sem acesso") do cache
+    background_tasks.add_task(manager.invalidate_access, n.id)
+    background_tasks.add_task(manager.broadcast_to_wallet, "UPDATE_DASHBOARD", n.id)
+    background_tasks.add_task(manager.send_personal_message, "UPDATE_LIST", user.id)
     
     return {"msg": "Entrou no bolso com sucesso!", "negocio": n.nome}
 
@@ -495,6 +829,8 @@ def join_negocio(
 @router.get("/{id}/members")
 def list_members(
     id: int, 
+    request: Request,
+    response: Response,
     session: Session = Depends(get_session), 
     user: User = Depends(get_current_user)
 ):
@@ -524,14 +860,13 @@ def list_members(
         raise HTTPException(404, "Negocio não encontrado")
         
     # Verifica se é membro
-    is_owner = n.owner_id == user.id
-    share = session.query(NegocioShare).filter(
-        NegocioShare.negocio_id == id, 
-        NegocioShare.user_id == user.id
-    ).first()
-    
-    if not is_owner and not share: 
-        raise HTTPException(403, "Sem permissão")
+    exigir_leitura(session, user.id, id)
+
+    # Entradas, saídas e mudanças de role incrementam a versão
+    tag = etag("members", id, n.versao)
+    if nao_modificado(request, tag):
+        return resposta_304(tag)
+    marcar_etag(response, tag)
     
     # Monta lista de membros
     shares = session.query(NegocioShare).filter(
@@ -564,7 +899,7 @@ def update_member_role(
     user_id: int, 
     role_data: RoleUpdate, 
     background_tasks: BackgroundTasks, 
-    session: Session = Depends(get_session), 
+    session: Session = Depends(get_write_session), 
     user: User = Depends(get_current_user)
 ):
     """
@@ -590,8 +925,7 @@ def update_member_role(
         HTTPException 404: Se membro não existe
         HTTPException 400: Se role é inválida
     """
-    n = session.get(Negocio, id)
-    if n.owner_id != user.id:
+    if papel(session, user.id, id) != "owner":
         raise HTTPException(403, "Apenas dono pode gerenciar membros")
         
     share = session.query(NegocioShare).filter(
@@ -607,14 +941,12 @@ def update_member_role(
 
     share.role = role_data.role
     session.add(share)
+    marcar_alteracao(session, id)
     session.commit()
 
-    # Notifica membros
-    shares = session.query(NegocioShare).filter(
-        NegocioShare.negocio_id == id
-    ).all()
-    all_ids = [n.owner_id] + [s.user_id for s in shares]
-    background_tasks.add_task(manager.broadcast_to_wallet, "UPDATE_DASHBOARD", all_ids)
+    # Notifica membros (e a nova role chega ao cache dos outros workers)
+    background_tasks.add_task(manager.invalidate_access, id)
+    background_tasks.add_task(manager.broadcast_to_wallet, "UPDATE_DASHBOARD", id)
 
     return {"ok": True}
 
@@ -624,7 +956,7 @@ def remove_member(
     id: int, 
     user_id: int, 
     background_tasks: BackgroundTasks, 
-    session: Session = Depends(get_session), 
+    session: Session = Depends(get_write_session), 
     user: User = Depends(get_current_user)
 ):
     """
@@ -646,8 +978,7 @@ def remove_member(
     Raises:
         HTTPException 403: Se não é o dono
     """
-    n = session.get(Negocio, id)
-    if n.owner_id != user.id:
+    if papel(session, user.id, id) != "owner":
         raise HTTPException(403, "Apenas dono pode remover membros")
     
     share = session.query(NegocioShare).filter(
@@ -657,14 +988,12 @@ def remove_member(
     
     if share:
         session.delete(share)
+        marcar_alteracao(session, id)
         session.commit()
     
-    # Notifica todos os membros (incluindo o removido)
-    shares = session.query(NegocioShare).filter(
-        NegocioShare.negocio_id == id
-    ).all()
-    all_ids = [n.owner_id] + [s.user_id for s in shares]
-    all_ids.append(user_id)  # Notifica usuário removido também
-    background_tasks.add_task(manager.broadcast_to_wallet, "UPDATE_DASHBOARD", all_ids)
+    # O removido deixa de receber a carteira e recarrega a lista;
+    # os demais membros são notificados
+    background_tasks.add_task(manager.revoke_access, id, user_id)
+    background_tasks.add_task(manager.broadcast_to_wallet, "UPDATE_DASHBOARD", id)
 
     return {"ok": True}
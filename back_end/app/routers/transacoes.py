@@ -6,6 +6,7 @@ Router responsável por operações de transações financeiras.
 
 Endpoints:
     POST /transacoes: Criar nova transação
+    POST /transacoes/bulk: Criar várias transações de uma vez
     DELETE /transacoes/{id}: Deletar transação
 
 Permissões:
@@ -22,90 +23,25 @@ Versão: 3.0.0
 """
 
 from datetime import date
+from typing import Dict, List
 
 from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from sqlalchemy import insert
 from sqlmodel import Session
 
-from app.database import get_session
-from app.models import Transacao, Negocio, TransacaoCreate, NegocioShare, User
+from app.database import get_write_session
+from app.models import Transacao, TransacaoCreate, User
+from app.acesso import pode_editar
 from app.auth import get_current_user
+from app.ledger import registrar_transacoes, estornar_transacoes
 from app.realtime.manager import manager
 
 
 router = APIRouter(prefix="/transacoes", tags=["Transacoes"])
 """Router de transações com prefixo /transacoes"""
 
-
-# ============================================================
-# FUNÇÕES AUXILIARES
-# ============================================================
-
-def check_edit_permission(session: Session, user_id: int, negocio_id: int) -> bool:
-    """
-    Verifica se o usuário tem permissão para editar a carteira.
-    
-    Retorna True se o usuário é:
-    - Dono da carteira
-    - Membro com role 'admin' ou 'editor'
-    
-    Args:
-        session: Sessão do banco de dados
-        user_id: ID do usuário a verificar
-        negocio_id: ID da carteira
-        
-    Returns:
-        bool: True se tem permissão, False caso contrário
-    """
-    n = session.get(Negocio, negocio_id)
-    if not n: 
-        return False
-    
-    # Dono sempre pode editar
-    if n.owner_id == user_id: 
-        return True
-    
-    # Verifica role do membro
-    share = session.query(NegocioShare).filter(
-        NegocioShare.negocio_id == negocio_id, 
-        NegocioShare.user_id == user_id
-    ).first()
-    
-    if share and share.role in ['admin', 'editor']: 
-        return True
-        
-    return False
-
-
-def get_wallet_members(session: Session, negocio_id: int) -> list:
-    """
-    Retorna lista de IDs de todos os membros de uma carteira.
-    
-    Inclui o dono e todos os membros compartilhados.
-    Usado para broadcast de notificações WebSocket.
-    
-    Args:
-        session: Sessão do banco de dados
-        negocio_id: ID da carteira
-        
-    Returns:
-        list: Lista de user_ids dos membros
-    """
-    n = session.get(Negocio, negocio_id)
-    if not n: 
-        return []
-    
-    # Começa com o dono
-    ids = [n.owner_id]
-    
-    # Adiciona membros compartilhados
-    shares = session.query(NegocioShare).filter(
-        NegocioShare.negocio_id == negocio_id
-    ).all()
-    
-    for s in shares:
-        ids.append(s.user_id)
-        
-    return ids
+MAX_BULK = 1000
+"""Número máximo de transações aceitas em um POST /transacoes/bulk."""
 
 
 # ============================================================
@@ -116,7 +52,7 @@ def get_wallet_members(session: Session, negocio_id: int) -> list:
 def nova_transacao(
     t_in: TransacaoCreate, 
     background_tasks: BackgroundTasks, 
-    session: Session = Depends(get_session), 
+    session: Session = Depends(get_write_session), 
     user: User = Depends(get_current_user)
 ):
     """
@@ -154,7 +90,7 @@ def nova_transacao(
         ```
     """
     # Verifica permissão
-    if not check_edit_permission(session, user.id, t_in.negocio_id):
+    if not pode_editar(session, user.id, t_in.negocio_id):
         raise HTTPException(403, "Sem permissão para adicionar transações")
 
     # Cria a transação
@@ -163,21 +99,82 @@ def nova_transacao(
     t.created_by_id = user.id  # Registra quem criou
     
     session.add(t)
+    registrar_transacoes(session, [t])  # Atualiza saldo da carteira
     session.commit()
     session.refresh(t)
 
     # Notifica todos os membros da carteira via WebSocket
-    member_ids = get_wallet_members(session, t.negocio_id)
-    background_tasks.add_task(manager.broadcast_to_wallet, "UPDATE_DASHBOARD", member_ids)
+    background_tasks.add_task(manager.broadcast_to_wallet, "UPDATE_DASHBOARD", t.negocio_id)
 
     return t
 
 
+@router.post("/bulk")
+def novas_transacoes(
+    itens: List[TransacaoCreate], 
+    background_tasks: BackgroundTasks, 
+    session: Session = Depends(get_write_session), 
+    user: User = Depends(get_current_user)
+):
+    """
+    Cria várias transações em uma única requisição.
+    
+    Pensado para motoristas que lançam as corridas do dia de uma vez.
+    Todo o lote é validado antes de gravar; a permissão é verificada
+    uma vez por carteira e as linhas são inseridas com um único
+    executemany, na mesma transação do banco. Se qualquer item for
+    recusado, nada é gravado.
+    
+    Args:
+        itens: Lista de transações (mesmo formato do POST /transacoes)
+        background_tasks: Para enviar notificações assíncronas
+        session: Sessão do banco de dados
+        user: Usuário autenticado atual
+        
+    Returns:
+        dict: Quantidade inserida e por carteira
+        
+    Raises:
+        HTTPException 400: Se o lote estiver vazio ou passar de MAX_BULK
+        HTTPException 403: Se não tiver permissão em alguma das carteiras
+        
+    Exemplo de resposta:
+        ```json
+        {"ok": true, "inseridas": 120, "por_carteira": {"1": 118, "3": 2}}
+        ```
+    """
+    if not itens:
+        raise HTTPException(400, "Nenhuma transação enviada")
+    if len(itens) > MAX_BULK:
+        raise HTTPException(400, f"Máximo de {MAX_BULK} transações por lote")
+
+    # Agrupa por carteira: uma verificação de permissão para cada
+    por_carteira: Dict[int, int] = {}
+    for t_in in itens:
+        por_carteira[t_in.negocio_id] = por_carteira.get(t_in.negocio_id, 0) + 1
+
+    for negocio_id in por_carteira:
+        if not pode_editar(session, user.id, negocio_id):
+            raise HTTPException(403, f"Sem permissão para adicionar transações na carteira {negocio_id}")
+
+    # Um único INSERT executado para todas as linhas (executemany)
+    linhas = [{**t_in.dict(), "created_by_id": user.id} for t_in in itens]
+    session.exec(insert(Transacao), params=linhas)
+    registrar_transacoes(session, itens)  # Atualiza saldos e resumos
+    session.commit()
+
+    # Uma notificação por carteira afetada
+    for negocio_id in por_carteira:
+        background_tasks.add_task(manager.broadcast_to_wallet, "UPDATE_DASHBOARD", negocio_id)
+
+    return {"ok": True, "inseridas": len(linhas), "por_carteira": por_carteira}
+
+
 @router.delete("/{id}")
 def deletar_transacao(
     id: int, 
     background_tasks: BackgroundTasks, 
-    session: Session = Depends(get_session), 
+    session: Session = Depends(get_write_session), 
     user: User = Depends(get_current_user)
 ):
     """
@@ -210,18 +207,18 @@ def deletar_transacao(
         raise HTTPException(status_code=404, detail="Transação não encontrada")
     
     # Verifica permissão
-    if not check_edit_permission(session, user.id, t.negocio_id):
+    if not pode_editar(session, user.id, t.negocio_id):
         raise HTTPException(403, "Sem permissão")
     
     # Guarda o negocio_id antes de deletar
     nid = t.negocio_id
     
-    # Deleta
+    # Deleta e desconta do saldo da carteira
+    estornar_transacoes(session, [t])
     session.delete(t)
     session.commit()
 
     # Notifica membros
-    member_ids = get_wallet_members(session, nid)
-    background_tasks.add_task(manager.broadcast_to_wallet, "UPDATE_DASHBOARD", member_ids)
+    background_tasks.add_task(manager.broadcast_to_wallet, "UPDATE_DASHBOARD", nid)
 
     return {"ok": True}
@@ -0,0 +1,112 @@
+"""
+TwoBolsos Backend - Benchmark de Login
+======================================
+
+Mede a vazão de POST /auth/token sob concorrência e, ao mesmo tempo,
+a latência de uma rota de leitura (GET /negocios), para mostrar se
+uma rajada de logins degrada o resto da API.
+
+Roda a aplicação no próprio processo (httpx + ASGITransport), com um
+banco temporário, então não precisa de servidor rodando.
+
+Execução (a partir de back_end/):
+    $ python benchmarks/login_throughput.py
+    $ python benchmarks/login_throughput.py --logins 400 --concorrencia 1 8 32 128
+
+Saída (uma linha por nível de concorrência):
+    conc  logins/s  p50 ms  p95 ms   503  leitura p95 ms
+
+Variáveis úteis:
+    - PASSWORD_POOL_SIZE / PASSWORD_QUEUE_LIMIT (ver app/hashing.py)
+
+Autor: K4nishi
+Versão: 3.0.0
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+os.environ.setdefault("DATABASE_PATH", os.path.join(tempfile.mkdtemp(), "bench.db"))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import httpx  # noqa: E402
+
+from app.main import app  # noqa: E402
+
+
+def percentil(valores, p: float) -> float:
+    """Percentil simples (valores em segundos, resultado em ms)."""
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))] * 1000
+
+
+async def rodada(client: httpx.AsyncClient, headers: dict, logins: int, concorrencia: int) -> str:
+    """Executa `logins` logins com `concorrencia` em paralelo."""
+    latencias, rejeitados, leituras = [], 0, []
+    fila = asyncio.Queue()
+    for _ in range(logins):
+        fila.put_nowait(None)
+
+    async def trabalhador():
+        nonlocal rejeitados
+        while not fila.empty():
+            fila.get_nowait()
+            inicio = time.perf_counter()
+            r = await client.post("/auth/token", data={"username": "bench", "password": "senha-bench"})
+            if r.status_code == 503:
+                rejeitados += 1
+            else:
+                r.raise_for_status()
+                latencias.append(time.perf_counter() - inicio)
+
+    async def leitor(parar: asyncio.Event):
+        while not parar.is_set():
+            inicio = time.perf_counter()
+            (await client.get("/negocios", headers=headers)).raise_for_status()
+            leituras.append(time.perf_counter() - inicio)
+            await asyncio.sleep(0.01)
+
+    parar = asyncio.Event()
+    tarefa_leitura = asyncio.create_task(leitor(parar))
+    inicio = time.perf_counter()
+    await asyncio.gather(*(trabalhador() for _ in range(concorrencia)))
+    duracao = time.perf_counter() - inicio
+    parar.set()
+    await tarefa_leitura
+
+    return (
+        f"{concorrencia:>4}  {len(latencias) / duracao:>8.1f}  "
+        f"{statistics.median(latencias) * 1000 if latencias else 0:>6.0f}  "
+        f"{percentil(latencias, 0.95):>6.0f}  {rejeitados:>4}  "
+        f"{percentil(leituras, 0.95):>14.1f}"
+    )
+
+
+async def main(logins: int, niveis) -> None:
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            await client.post("/auth/register", json={"username": "bench", "password": "senha-bench"})
+            r = await client.post("/auth/token", data={"username": "bench", "password": "senha-bench"})
+            headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+            print(f"logins por rodada: {logins}  (cpus: {os.cpu_count()})")
+            print("conc  logins/s  p50 ms  p95 ms   503  leitura p95 ms")
+            for concorrencia in niveis:
+                print(await rodada(client, headers, logins, concorrencia))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Vazão de login sob concorrência")
+    parser.add_argument("--logins", type=int, default=100, help="Logins por rodada")
+    parser.add_argument("--concorrencia", type=int, nargs="+", default=[1, 4, 16, 64])
+    args = parser.parse_args()
+    asyncio.run(main(args.logins, args.concorrencia))
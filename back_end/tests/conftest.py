@@ -0,0 +1,119 @@
+"""
+TwoBolsos Backend - Configuração dos Testes
+===========================================
+
+Fixtures compartilhadas pelos testes (pytest).
+
+Cada execução usa um banco SQLite temporário, definido antes de
+importar a aplicação (o engine é criado no import de app.database).
+
+Execução (a partir de back_end/):
+    $ pip install -r requirements-dev.txt
+    $ python -m pytest
+
+Autor: K4nishi
+Versão: 3.0.0
+"""
+
+import itertools
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+os.environ.setdefault("DATABASE_PATH", os.path.join(tempfile.mkdtemp(), "teste.db"))
+os.environ.setdefault("PASSWORD_POOL_SIZE", "1")
+os.environ.setdefault("METRICS_TOKEN", "token-de-teste")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.database import engine  # noqa: E402
+from app.main import app  # noqa: E402
+
+
+_nomes = itertools.count(1)
+
+
+@pytest.fixture(scope="session")
+def client():
+    """Cliente de teste com startup/shutdown da aplicação."""
+    with TestClient(app) as c:
+        yield c
+
+
+@pytest.fixture
+def novo_usuario(client):
+    """
+    Fábrica de usuários: registra, faz login e retorna os headers.
+
+    Exemplo:
+        >>> headers = novo_usuario()
+        >>> client.get("/negocios", headers=headers)
+    """
+    def criar() -> dict:
+        username = f"usuario{next(_nomes)}"
+        client.post("/auth/register", json={"username": username, "password": "senha"})
+        r = client.post("/auth/token", data={"username": username, "password": "senha"})
+        r.raise_for_status()
+        return {"Authorization": f"Bearer {r.json()['access_token']}"}
+    return criar
+
+
+@pytest.fixture
+def carteira(client, novo_usuario):
+    """Um usuário com uma carteira nova: (headers, negocio_id)."""
+    headers = novo_usuario()
+    r = client.post("/negocios", json={"nome": "Carteira de teste"}, headers=headers)
+    r.raise_for_status()
+    return headers, r.json()["id"]
+
+
+@pytest.fixture
+def conferir_agregados():
+    """
+    Confere os agregados materializados contra as tabelas base.
+
+    NegocioSaldo e ResumoDiario têm de bater com SUM/COUNT sobre
+    transacao, e PagamentoFixa com os meses das transações de
+    pagamento. Aceita outro engine (ex: banco migrado no teste).
+
+    Exemplo:
+        >>> conferir_agregados(negocio_id)
+    """
+    def conferir(negocio_id: int, db=engine) -> None:
+        with db.connect() as conn:
+            def consulta(sql):
+                return conn.exec_driver_sql(sql, (negocio_id,)).all()
+
+            saldo = consulta(
+                "SELECT receita, despesa FROM negociosaldo WHERE negocio_id = ?"
+            ) or [(0, 0)]
+            assert saldo == consulta(
+                "SELECT COALESCE(SUM(CASE WHEN tipo = 'receita' THEN valor END), 0), "
+                "COALESCE(SUM(CASE WHEN tipo = 'despesa' THEN valor END), 0) "
+                "FROM transacao WHERE negocio_id = ?"
+            )
+
+            assert consulta(
+                "SELECT dia, tipo, tag, valor, quantidade, km, litros "
+                "FROM resumodiario WHERE negocio_id = ? ORDER BY dia, tipo, tag"
+            ) == consulta(
+                "SELECT data, tipo, tag, SUM(valor), COUNT(*), "
+                "SUM(COALESCE(km, 0)), SUM(COALESCE(litros, 0)) "
+                "FROM transacao WHERE negocio_id = ? "
+                "GROUP BY data, tipo, tag ORDER BY data, tipo, tag"
+            )
+
+            assert consulta(
+                "SELECT p.fixa_id, p.competencia FROM pagamentofixa p "
+                "JOIN despesafixa f ON f.id = p.fixa_id "
+                "JOIN transacao t ON t.id = p.transacao_id AND t.fixa_id = p.fixa_id "
+                "WHERE f.negocio_id = ? ORDER BY 1, 2"
+            ) == consulta(
+                "SELECT t.fixa_id, CAST(strftime('%Y%m', t.data * 86400, 'unixepoch') AS INTEGER) "
+                "FROM transacao t JOIN despesafixa f ON f.id = t.fixa_id "
+                "WHERE t.negocio_id = ? GROUP BY 1, 2 ORDER BY 1, 2"
+            )
+    return conferir
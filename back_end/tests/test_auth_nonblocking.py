@@ -0,0 +1,64 @@
+"""
+Autenticação fora do event loop (get_current_user síncrono).
+
+Com a busca do usuário artificialmente lenta, requests autenticados
+concorrentes não podem parar uma corrotina que roda no loop.
+"""
+
+import asyncio
+import time
+
+import httpx
+
+from app import auth
+from app.cache import principal_cache, token_cache
+from app.main import app
+
+
+ATRASO = 0.3
+"""Quanto cada busca de usuário demora (segundos)."""
+
+
+def test_auth_nao_bloqueia_event_loop(client, novo_usuario, monkeypatch):
+    headers = novo_usuario()
+    original = auth._usuario_do_token
+
+    def lento(token, session):
+        time.sleep(ATRASO)  # I/O bloqueante simulado
+        return original(token, session)
+
+    monkeypatch.setattr(auth, "_usuario_do_token", lento)
+    token_cache.clear()
+    principal_cache.clear()
+
+    async def cenario():
+        maior_intervalo = 0.0
+        terminou = asyncio.Event()
+
+        async def ticker():
+            nonlocal maior_intervalo
+            anterior = time.perf_counter()
+            while not terminou.is_set():
+                await asyncio.sleep(0.01)
+                agora = time.perf_counter()
+                maior_intervalo = max(maior_intervalo, agora - anterior)
+                anterior = agora
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://teste") as c:
+            tarefa = asyncio.create_task(ticker())
+            inicio = time.perf_counter()
+            respostas = await asyncio.gather(*(c.get("/negocios", headers=headers) for _ in range(8)))
+            duracao = time.perf_counter() - inicio
+            terminou.set()
+            await tarefa
+
+        return respostas, duracao, maior_intervalo
+
+    respostas, duracao, maior_intervalo = asyncio.run(cenario())
+
+    assert all(r.status_code == 200 for r in respostas)
+    # O ticker nunca ficou parado durante uma busca lenta
+    assert maior_intervalo < ATRASO / 2
+    # E as buscas rodaram em paralelo no threadpool, não em fila
+    assert duracao < ATRASO * 4
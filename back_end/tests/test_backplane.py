@@ -0,0 +1,176 @@
+"""
+Backplane de tempo real (app/realtime/backplane.py).
+
+Vários backplanes no mesmo processo fazem o papel dos workers: cada
+um deve entregar cada evento publicado, por qualquer um deles,
+exatamente uma vez. O Redis é substituído pelo fakeredis.
+"""
+
+import asyncio
+
+import pytest
+
+from app.realtime import backplane
+from app.realtime.backplane import RedisBackplane, SQLiteBackplane
+
+
+@pytest.fixture(autouse=True)
+def reinicio_rapido(monkeypatch):
+    monkeypatch.setattr(backplane, "REALTIME_RETRY_DELAY", 0.05)
+
+
+async def esperar(condicao, limite: float = 3.0) -> None:
+    """Aguarda até a condição valer (ou o limite estourar)."""
+    fim = asyncio.get_running_loop().time() + limite
+    while not condicao() and asyncio.get_running_loop().time() < fim:
+        await asyncio.sleep(0.02)
+
+
+async def cenario_exatamente_uma_vez(a, b) -> None:
+    recebidos_a, recebidos_b = [], []
+    await a.iniciar(recebidos_a.append)
+    await b.iniciar(recebidos_b.append)
+
+    esperados = []
+    for i in range(10):
+        evento = {"op": "wallet", "id": i, "msg": "UPDATE_DASHBOARD"}
+        await (a if i % 2 else b).publicar(evento)
+        esperados.append(evento)
+
+    await esperar(lambda: len(recebidos_a) >= 10 and len(recebidos_b) >= 10)
+    await asyncio.sleep(0.2)  # nada de entregas repetidas depois
+    await a.encerrar()
+    await b.encerrar()
+
+    assert recebidos_a == esperados
+    assert recebidos_b == esperados
+
+
+# ============================================================
+# REDIS (FAKEREDIS)
+# ============================================================
+
+def test_redis_entrega_exatamente_uma_vez():
+    fakeredis = pytest.importorskip("fakeredis")
+    servidor = fakeredis.FakeServer()
+
+    def novo():
+        return RedisBackplane(cliente=fakeredis.aioredis.FakeRedis(server=servidor))
+
+    asyncio.run(cenario_exatamente_uma_vez(novo(), novo()))
+
+
+def test_redis_reassina_apos_queda():
+    fakeredis = pytest.importorskip("fakeredis")
+    servidor = fakeredis.FakeServer()
+
+    async def cenario():
+        recebidos = []
+        assinante = RedisBackplane(cliente=fakeredis.aioredis.FakeRedis(server=servidor))
+        publicador = RedisBackplane(cliente=fakeredis.aioredis.FakeRedis(server=servidor))
+        await assinante.iniciar(recebidos.append)
+        await publicador.iniciar(lambda evento: None)
+
+        servidor.connected = False
+        await esperar(lambda: assinante.stats()["restarts"] > 0)
+        servidor.connected = True
+        await asyncio.sleep(0.3)
+
+        await publicador.publicar({"op": "acesso", "id": 1})
+        await esperar(lambda: recebidos)
+        await assinante.encerrar()
+        await publicador.encerrar()
+        return recebidos, assinante.stats()
+
+    recebidos, stats = asyncio.run(cenario())
+    assert recebidos == [{"op": "acesso", "id": 1}]
+    assert stats["restarts"] > 0
+
+
+# ============================================================
+# SQLITE (POLLING)
+# ============================================================
+
+def test_sqlite_entrega_exatamente_uma_vez(tmp_path):
+    caminho = str(tmp_path / "eventos.realtime")
+    asyncio.run(cenario_exatamente_uma_vez(
+        SQLiteBackplane(caminho, intervalo=0.02),
+        SQLiteBackplane(caminho, intervalo=0.02),
+    ))
+
+
+def test_sqlite_ignora_eventos_anteriores_ao_inicio(tmp_path):
+    caminho = str(tmp_path / "eventos.realtime")
+
+    async def cenario():
+        antigo = SQLiteBackplane(caminho, intervalo=0.02)
+        await antigo.iniciar(lambda evento: None)
+        await antigo.publicar({"op": "acesso", "id": 1})
+
+        recebidos = []
+        novo = SQLiteBackplane(caminho, intervalo=0.02)
+        await novo.iniciar(recebidos.append)
+        await antigo.publicar({"op": "acesso", "id": 2})
+        await esperar(lambda: recebidos)
+        await antigo.encerrar()
+        await novo.encerrar()
+        return recebidos
+
+    assert asyncio.run(cenario()) == [{"op": "acesso", "id": 2}]
+
+
+def test_sqlite_retoma_do_mesmo_id_apos_falha(tmp_path, monkeypatch):
+    caminho = str(tmp_path / "eventos.realtime")
+
+    async def cenario():
+        recebidos = []
+        assinante = SQLiteBackplane(caminho, intervalo=0.02)
+        publicador = SQLiteBackplane(caminho, intervalo=0.02)
+        await assinante.iniciar(recebidos.append)
+        await publicador.iniciar(lambda evento: None)
+
+        ler = assinante._ler
+        falhas = iter([True])
+
+        def ler_com_falha(depois_de):
+            if next(falhas, False):
+                raise OSError("disco indisponível")
+            return ler(depois_de)
+
+        monkeypatch.setattr(assinante, "_ler", ler_com_falha)
+        for i in range(3):
+            await publicador.publicar({"op": "acesso", "id": i})
+
+        await esperar(lambda: len(recebidos) >= 3)
+        await asyncio.sleep(0.1)
+        await assinante.encerrar()
+        await publicador.encerrar()
+        return recebidos, assinante.stats()
+
+    recebidos, stats = asyncio.run(cenario())
+    assert recebidos == [{"op": "acesso", "id": i} for i in range(3)]
+    assert stats["restarts"] == 1
+
+
+def test_erro_ao_aplicar_nao_para_o_recebimento(tmp_path):
+    caminho = str(tmp_path / "eventos.realtime")
+
+    async def cenario():
+        recebidos = []
+
+        def entregar(evento):
+            if evento["id"] == 0:
+                raise KeyError("msg")
+            recebidos.append(evento)
+
+        bp = SQLiteBackplane(caminho, intervalo=0.02)
+        await bp.iniciar(entregar)
+        for i in range(3):
+            await bp.publicar({"op": "wallet", "id": i})
+        await esperar(lambda: len(recebidos) >= 2)
+        await bp.encerrar()
+        return recebidos, bp.stats()
+
+    recebidos, stats = asyncio.run(cenario())
+    assert [e["id"] for e in recebidos] == [1, 2]
+    assert stats["errors"] == 1 and stats["restarts"] == 0
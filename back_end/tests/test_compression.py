@@ -0,0 +1,42 @@
+"""
+ETags das respostas comprimidas (app/compression.py + app/etag.py).
+"""
+
+import pytest
+
+
+@pytest.fixture
+def dashboard(client, carteira):
+    headers, negocio_id = carteira
+    itens = [
+        {"negocio_id": negocio_id, "tipo": "despesa", "valor": i + 1,
+         "descricao": f"Compra {i}", "tag": f"Tag {i % 40}", "data": "2026-03-01"}
+        for i in range(200)
+    ]
+    client.post("/transacoes/bulk", json=itens, headers=headers).raise_for_status()
+    return headers, f"/negocios/{negocio_id}/dashboard"
+
+
+def test_cada_encoding_tem_sua_etag(client, dashboard):
+    headers, url = dashboard
+    identidade = client.get(url, headers={**headers, "Accept-Encoding": "identity"})
+    gzip = client.get(url, headers={**headers, "Accept-Encoding": "gzip"})
+
+    assert "content-encoding" not in identidade.headers
+    assert gzip.headers["content-encoding"] == "gzip"
+    tag = identidade.headers["etag"]
+    assert gzip.headers["etag"] == tag[:-1] + '-gzip"'
+
+
+def test_revalidacao_da_versao_comprimida(client, dashboard):
+    headers, url = dashboard
+    tag_gzip = client.get(url, headers={**headers, "Accept-Encoding": "gzip"}).headers["etag"]
+
+    r = client.get(url, headers={**headers, "Accept-Encoding": "gzip", "If-None-Match": tag_gzip})
+    assert r.status_code == 304
+    assert r.headers["etag"] == tag_gzip
+
+    # Sem aceitar gzip, a tag base é a que volta
+    r = client.get(url, headers={**headers, "Accept-Encoding": "identity", "If-None-Match": tag_gzip})
+    assert r.status_code == 304
+    assert r.headers["etag"] == tag_gzip[:-len('-gzip"')] + '"'
@@ -0,0 +1,91 @@
+"""
+Extrato paginado por cursor (keyset sobre (data, id)) e ETags/304
+das rotas de leitura das carteiras.
+"""
+
+import base64
+
+import pytest
+
+
+def _transacoes(negocio_id, datas):
+    return [
+        {"negocio_id": negocio_id, "tipo": "despesa", "valor": i + 1,
+         "descricao": f"Item {i}", "data": data}
+        for i, data in enumerate(datas)
+    ]
+
+
+def _cursor(texto):
+    return base64.urlsafe_b64encode(texto.encode()).decode().rstrip("=")
+
+
+def test_paginas_com_varias_linhas_na_mesma_data(client, carteira):
+    headers, negocio_id = carteira
+    # Lotes separados intercalam os ids entre as datas
+    datas = ["2026-03-01"] * 3 + ["2026-03-02"] * 2 + ["2026-03-01"] * 2 + ["2026-02-28"]
+    for lote in (datas[:4], datas[4:]):
+        client.post("/transacoes/bulk", json=_transacoes(negocio_id, lote), headers=headers).raise_for_status()
+
+    vistos, cursor, paginas = [], None, 0
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        r = client.get(f"/negocios/{negocio_id}/extrato", params=params, headers=headers)
+        assert r.status_code == 200
+        pagina = r.json()
+        assert len(pagina["itens"]) <= 2
+        vistos += [(t["data"], t["id"]) for t in pagina["itens"]]
+        paginas += 1
+        cursor = pagina["next_cursor"]
+        if cursor is None:
+            break
+
+    assert paginas == 4
+    assert len(vistos) == len(set(vistos)) == len(datas)
+    assert vistos == sorted(vistos, reverse=True)
+
+
+@pytest.mark.parametrize("cursor", [
+    "!!!",
+    _cursor("2026-03-01"),
+    _cursor("2026-13-01|5"),
+    _cursor("2026-03-01|abc"),
+    base64.urlsafe_b64encode(b"\xff\xfe|1").decode(),
+])
+def test_cursor_invalido_retorna_400(client, carteira, cursor):
+    headers, negocio_id = carteira
+    r = client.get(f"/negocios/{negocio_id}/extrato", params={"cursor": cursor}, headers=headers)
+    assert r.status_code == 400
+
+
+@pytest.mark.parametrize("rota", [
+    "/negocios",
+    "/negocios/{id}/dashboard",
+    "/negocios/{id}/extrato",
+    "/negocios/{id}/extrato?limit=1&cursor=" + _cursor("2030-01-01|999999"),
+    "/negocios/{id}/fixas",
+    "/negocios/{id}/members",
+    "/negocios/{id}/export?format=ndjson",
+])
+def test_if_none_match_e_versao(client, carteira, rota):
+    headers, negocio_id = carteira
+    url = rota.format(id=negocio_id)
+    client.post("/transacoes/bulk", json=_transacoes(negocio_id, ["2026-03-01"] * 2),
+                headers=headers).raise_for_status()
+
+    r = client.get(url, headers=headers)
+    assert r.status_code == 200
+    tag = r.headers["etag"]
+
+    # Sem alterações: 304 sem corpo, com a mesma tag
+    r = client.get(url, headers={**headers, "If-None-Match": tag})
+    assert r.status_code == 304
+    assert r.content == b""
+    assert r.headers["etag"] == tag
+
+    # Uma escrita incrementa a versão da carteira e invalida a tag
+    client.post("/transacoes/bulk", json=_transacoes(negocio_id, ["2026-03-02"]),
+                headers=headers).raise_for_status()
+    r = client.get(url, headers={**headers, "If-None-Match": tag})
+    assert r.status_code == 200
+    assert r.headers["etag"] != tag
@@ -0,0 +1,57 @@
+"""
+Pool de hash de senhas (app/hashing.py): recuperação de um processo morto.
+"""
+
+import os
+import signal
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from app import hashing
+
+
+@pytest.fixture
+def usuario(client):
+    client.post("/auth/register", json={"username": "pool_quebrado", "password": "senha"})
+    return {"username": "pool_quebrado", "password": "senha"}
+
+
+def _derrubar_processo(client):
+    """Simula o OOM killer derrubando um processo do bcrypt."""
+    if hashing._pool is None:
+        client.post("/auth/token", data={"username": "-", "password": "-"})
+    pool = hashing._pool
+    processo = next(iter(pool._processes.values()))
+    os.kill(processo.pid, signal.SIGKILL)
+    processo.join(5)
+    return pool
+
+
+def test_login_recria_pool_quebrado(client, usuario):
+    pool = _derrubar_processo(client)
+    reinicios = hashing.stats()["restarts"]
+
+    r = client.post("/auth/token", data=usuario)
+    assert r.status_code == 200
+    assert hashing._pool is not pool
+    assert hashing.stats()["restarts"] == reinicios + 1
+    # Com o servidor rodando, o pool novo não nasce de fork
+    assert hashing._pool._mp_context.get_start_method() != "fork"
+
+
+def test_pool_que_nao_sobe_responde_503(client, usuario, monkeypatch):
+    _derrubar_processo(client)
+
+    def quebra(pool):
+        raise BrokenProcessPool("processo morreu ao subir")
+
+    monkeypatch.setattr(hashing, "_aquecer_pool", quebra)
+    r = client.post("/auth/token", data=usuario)
+    assert r.status_code == 503
+    assert r.headers["retry-after"] == "1"
+    assert hashing._pool is None
+
+    # Quando o ambiente se recupera, o próximo login recria o pool
+    monkeypatch.undo()
+    assert client.post("/auth/token", data=usuario).status_code == 200
@@ -0,0 +1,91 @@
+"""
+Deduplicação de extratos importados (app/importacao.py).
+"""
+
+from datetime import date
+from decimal import Decimal
+
+import pytest
+from sqlmodel import Session, func, select
+
+from app.database import engine, write_engine
+from app.importacao import LinhaExtrato, _nova_transacao, importar_extrato
+from app.models import Transacao
+
+
+CABECALHO = "data;descricao;valor\n"
+
+
+def importar(client, headers, negocio_id, linhas):
+    arquivo = (CABECALHO + "".join(f"{l}\n" for l in linhas)).encode("utf-8")
+    r = client.post(
+        f"/negocios/{negocio_id}/importar",
+        files={"arquivo": ("extrato.csv", arquivo, "text/csv")},
+        data={"formato": "csv"},
+        headers=headers,
+    )
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def total_transacoes(negocio_id):
+    with Session(engine) as session:
+        return session.exec(
+            select(func.count()).select_from(Transacao).where(Transacao.negocio_id == negocio_id)
+        ).one()
+
+
+def test_linhas_iguais_fora_de_ordem_sao_todas_gravadas(client, carteira):
+    headers, negocio_id = carteira
+    extrato = [
+        "01/03/2026;Café;-5,00",
+        "02/03/2026;Almoço;-30,00",
+        "01/03/2026;Café;-5,00",
+    ]
+
+    r = importar(client, headers, negocio_id, extrato)
+    assert (r["inseridas"], r["ignoradas"]) == (3, 0)
+
+    # Reimportar não duplica nada, mesmo fora de ordem
+    r = importar(client, headers, negocio_id, extrato)
+    assert (r["inseridas"], r["ignoradas"]) == (0, 3)
+    assert total_transacoes(negocio_id) == 3
+
+
+def test_lancamentos_manuais_contam_como_ja_importados(client, carteira):
+    headers, negocio_id = carteira
+    for _ in range(2):
+        r = client.post("/transacoes", json={
+            "negocio_id": negocio_id, "tipo": "despesa", "valor": 5,
+            "descricao": "Café", "data": "2026-03-01",
+        }, headers=headers)
+        assert r.status_code == 200, r.text
+
+    # As duas linhas do extrato são as duas já lançadas; a terceira é nova
+    r = importar(client, headers, negocio_id, ["01/03/2026;Café;-5,00"] * 3)
+    assert (r["inseridas"], r["ignoradas"]) == (1, 2)
+    assert total_transacoes(negocio_id) == 3
+
+
+def test_contagem_atravessa_lotes(client, carteira):
+    _, negocio_id = carteira
+    linhas = [
+        LinhaExtrato(i, _nova_transacao(negocio_id, date(2026, 3, 1 + i % 2), Decimal("-5"), "Café"))
+        for i in range(7)
+    ]
+
+    with Session(write_engine) as session:
+        r = importar_extrato(session, negocio_id, 1, iter(linhas), tamanho_lote=2)
+        assert (r["inseridas"], r["ignoradas"]) == (7, 0)
+        r = importar_extrato(session, negocio_id, 1, iter(linhas), tamanho_lote=3)
+        assert (r["inseridas"], r["ignoradas"]) == (0, 7)
+    assert total_transacoes(negocio_id) == 7
+
+
+@pytest.mark.parametrize("valor", ["NaN", "Infinity", "-inf", "1e30"])
+def test_valor_invalido_rejeita_so_a_linha(client, carteira, valor):
+    headers, negocio_id = carteira
+    r = importar(client, headers, negocio_id, ["01/03/2026;Café;-5,00", f"02/03/2026;Erro;{valor}"])
+    assert (r["inseridas"], r["rejeitadas"]) == (1, 1)
+    assert r["erros"][0]["linha"] == 3  # contando o cabeçalho
+    assert total_transacoes(negocio_id) == 1
@@ -0,0 +1,85 @@
+"""
+Agregados materializados (app/ledger.py): NegocioSaldo, ResumoDiario
+e PagamentoFixa continuam batendo com as tabelas base a cada escrita.
+"""
+
+from app.database import engine
+from test_importacao import importar
+
+
+def _transacao(negocio_id, tipo, valor, tag="Geral", data="2026-03-01", km=0, litros=0):
+    return {"negocio_id": negocio_id, "tipo": tipo, "valor": valor, "descricao": f"{tag} {valor}",
+            "tag": tag, "data": data, "km": km, "litros": litros}
+
+
+def _linhas(sql, *params):
+    with engine.connect() as conn:
+        return conn.exec_driver_sql(sql, params).all()
+
+
+def test_insercao_bulk_importacao_e_exclusao(client, carteira, conferir_agregados):
+    headers, negocio_id = carteira
+
+    ids = []
+    for item in [
+        _transacao(negocio_id, "receita", 1500.10, "Salário"),
+        _transacao(negocio_id, "despesa", 0.29, "Café", km=12, litros=3),
+        _transacao(negocio_id, "despesa", 0.29, "Café", km=8, litros=1),
+        _transacao(negocio_id, "despesa", 99.99, "Mercado", data="2026-03-02"),
+    ]:
+        r = client.post("/transacoes", json=item, headers=headers)
+        assert r.status_code == 200, r.text
+        ids.append(r.json()["id"])
+    conferir_agregados(negocio_id)
+
+    client.post("/transacoes/bulk", json=[
+        _transacao(negocio_id, "despesa", 10.01 * i, "Café", data=f"2026-03-0{i}") for i in range(1, 6)
+    ], headers=headers).raise_for_status()
+    conferir_agregados(negocio_id)
+
+    importar(client, headers, negocio_id, ["01/03/2026;Café;-0,29", "03/03/2026;Pix;250,00"])
+    conferir_agregados(negocio_id)
+
+    # Remover uma das duas do grupo mantém a linha do resumo; a última a apaga
+    client.delete(f"/transacoes/{ids[1]}", headers=headers).raise_for_status()
+    conferir_agregados(negocio_id)
+    client.delete(f"/transacoes/{ids[3]}", headers=headers).raise_for_status()
+    conferir_agregados(negocio_id)
+    assert _linhas(
+        "SELECT COUNT(*) FROM resumodiario WHERE negocio_id = ? AND tag = 'Mercado'", negocio_id
+    ) == [(0,)]
+
+
+def test_pagamento_de_fixa(client, carteira, conferir_agregados):
+    headers, negocio_id = carteira
+    fixa = client.post(f"/negocios/{negocio_id}/fixas", headers=headers, json={
+        "negocio_id": negocio_id, "nome": "Internet", "valor": 99.90,
+    }).json()
+    pagar = f"/negocios/{negocio_id}/fixas/{fixa['id']}/pagar"
+
+    pagamento = client.post(pagar, headers=headers)
+    assert pagamento.status_code == 200
+    assert client.post(pagar, headers=headers).status_code == 400
+    conferir_agregados(negocio_id)
+
+    # Apagar a transação de pagamento libera o mês
+    client.delete(f"/transacoes/{pagamento.json()['id']}", headers=headers).raise_for_status()
+    conferir_agregados(negocio_id)
+    assert client.post(pagar, headers=headers).status_code == 200
+    conferir_agregados(negocio_id)
+
+
+def test_remover_carteira_apaga_os_agregados(client, carteira, conferir_agregados):
+    headers, negocio_id = carteira
+    client.post("/transacoes", json=_transacao(negocio_id, "receita", 10), headers=headers).raise_for_status()
+    fixa = client.post(f"/negocios/{negocio_id}/fixas", headers=headers, json={
+        "negocio_id": negocio_id, "nome": "Aluguel", "valor": 1200,
+    }).json()
+    client.post(f"/negocios/{negocio_id}/fixas/{fixa['id']}/pagar", headers=headers).raise_for_status()
+    conferir_agregados(negocio_id)
+
+    client.delete(f"/negocios/{negocio_id}", headers=headers).raise_for_status()
+    for tabela, coluna in [("negociosaldo", "negocio_id"), ("resumodiario", "negocio_id"),
+                           ("transacao", "negocio_id"), ("pagamentofixa", "fixa_id")]:
+        alvo = fixa["id"] if coluna == "fixa_id" else negocio_id
+        assert _linhas(f"SELECT COUNT(*) FROM {tabela} WHERE {coluna} = ?", alvo) == [(0,)]
@@ -0,0 +1,19 @@
+"""
+Endpoint /metrics: acesso só com METRICS_TOKEN.
+"""
+
+import os
+
+
+def test_metrics_exige_token(client, novo_usuario):
+    assert client.get("/metrics").status_code == 403
+    assert client.get("/metrics", headers={"Authorization": "Bearer errado"}).status_code == 403
+    # O JWT de um usuário comum também não serve
+    assert client.get("/metrics", headers=novo_usuario()).status_code == 403
+
+
+def test_metrics_com_token(client):
+    token = os.environ["METRICS_TOKEN"]
+    r = client.get("/metrics", headers={"Authorization": f"Bearer {token}"})
+    assert r.status_code == 200
+    assert "password_pool" in r.json()
@@ -0,0 +1,123 @@
+"""
+Migrações (app/migrations.py) aplicadas a um banco da versão base
+(user_version = 0), com os dados no formato antigo.
+"""
+
+import sqlite3
+
+from sqlalchemy import create_engine
+from sqlmodel import SQLModel
+
+from app.migrations import latest_version, run_migrations
+from app.models import hash_conteudo
+
+
+# Esquema criado pela versão base (antes das migrações)
+ESQUEMA_BASE = """
+CREATE TABLE user (
+    username VARCHAR NOT NULL, email VARCHAR, id INTEGER NOT NULL,
+    hashed_password VARCHAR NOT NULL, PRIMARY KEY (id)
+);
+CREATE UNIQUE INDEX ix_user_username ON user (username);
+CREATE TABLE negocio (
+    nome VARCHAR NOT NULL, categoria VARCHAR NOT NULL, cor VARCHAR NOT NULL,
+    id INTEGER NOT NULL, owner_id INTEGER NOT NULL,
+    PRIMARY KEY (id), FOREIGN KEY(owner_id) REFERENCES user (id)
+);
+CREATE TABLE negocioshare (
+    user_id INTEGER NOT NULL, negocio_id INTEGER NOT NULL, role VARCHAR NOT NULL,
+    PRIMARY KEY (user_id, negocio_id),
+    FOREIGN KEY(user_id) REFERENCES user (id), FOREIGN KEY(negocio_id) REFERENCES negocio (id)
+);
+CREATE TABLE invitecode (
+    id INTEGER NOT NULL, code VARCHAR NOT NULL, negocio_id INTEGER NOT NULL,
+    expires_at DATETIME NOT NULL, active BOOLEAN NOT NULL,
+    PRIMARY KEY (id), FOREIGN KEY(negocio_id) REFERENCES negocio (id)
+);
+CREATE UNIQUE INDEX ix_invitecode_code ON invitecode (code);
+CREATE TABLE despesafixa (
+    nome VARCHAR NOT NULL, valor FLOAT NOT NULL, tag VARCHAR NOT NULL,
+    dia_vencimento INTEGER NOT NULL, id INTEGER NOT NULL, negocio_id INTEGER NOT NULL,
+    PRIMARY KEY (id), FOREIGN KEY(negocio_id) REFERENCES negocio (id)
+);
+CREATE TABLE transacao (
+    tag VARCHAR NOT NULL, descricao VARCHAR NOT NULL, valor FLOAT NOT NULL,
+    tipo VARCHAR NOT NULL, data VARCHAR NOT NULL, km FLOAT, litros FLOAT,
+    fixa_id INTEGER, id INTEGER NOT NULL, negocio_id INTEGER NOT NULL, created_by_id INTEGER,
+    PRIMARY KEY (id), FOREIGN KEY(negocio_id) REFERENCES negocio (id),
+    FOREIGN KEY(created_by_id) REFERENCES user (id)
+);
+"""
+
+TRANSACOES = [
+    # (tag, descricao, valor, tipo, data, km, litros, fixa_id, negocio_id)
+    ("Salário", "Salário", 1500.10, "receita", "2026-02-05", 0, 0, None, 1),
+    ("Café", "Café", 0.29, "despesa", "2026-02-05", 10, 2, None, 1),
+    ("Café", "Café", 0.29, "despesa", "2026-02-05", None, None, None, 1),
+    ("Posto", "Gasolina", 10.145, "despesa", "2026-02-06 18:30:00", 120, 40, None, 1),
+    ("Fixas", "Internet (Ref: 02/2026)", 99.9, "despesa", "2026-02-10", 0, 0, 1, 1),
+    # Pagamento duplicado no mesmo mês (a versão base permitia)
+    ("Fixas", "Internet (Ref: 02/2026)", 99.9, "despesa", "2026-02-11", 0, 0, 1, 1),
+    ("Fixas", "Internet (Ref: 03/2026)", 99.9, "despesa", "2026-03-10", 0, 0, 1, 1),
+    ("Geral", "Outra carteira", 42.0, "receita", "2026-03-01", 0, 0, None, 2),
+]
+
+
+def _banco_base(caminho):
+    conn = sqlite3.connect(caminho)
+    conn.executescript(ESQUEMA_BASE)
+    conn.execute("INSERT INTO user (id, username, hashed_password) VALUES (1, 'ana', 'x')")
+    conn.executemany(
+        "INSERT INTO negocio (id, nome, categoria, cor, owner_id) VALUES (?, ?, 'PESSOAL', '#000', 1)",
+        [(1, "Casa"), (2, "Loja")],
+    )
+    conn.execute(
+        "INSERT INTO despesafixa (id, nome, valor, tag, dia_vencimento, negocio_id) "
+        "VALUES (1, 'Internet', 99.9, 'Fixas', 10, 1)"
+    )
+    conn.executemany(
+        "INSERT INTO transacao (tag, descricao, valor, tipo, data, km, litros, fixa_id, negocio_id) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        TRANSACOES,
+    )
+    conn.commit()
+    conn.close()
+
+
+def test_banco_da_versao_base_e_migrado(tmp_path, conferir_agregados):
+    caminho = tmp_path / "base.db"
+    _banco_base(caminho)
+    db = create_engine(f"sqlite:///{caminho}")
+
+    # Mesmo caminho do init_db(): create_all() e depois as migrações
+    with db.begin() as conn:
+        assert conn.exec_driver_sql("PRAGMA user_version").scalar() == 0
+        SQLModel.metadata.create_all(conn)
+        aplicadas = run_migrations(conn)
+
+    assert [m.version for m in aplicadas] == list(range(1, latest_version() + 1))
+    with db.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA user_version").scalar() == latest_version()
+        linhas = conn.exec_driver_sql(
+            "SELECT valor, typeof(data), hash_conteudo FROM transacao ORDER BY id"
+        ).all()
+        saldo = conn.exec_driver_sql(
+            "SELECT receita, despesa FROM negociosaldo WHERE negocio_id = 1"
+        ).one()
+        pagamentos = conn.exec_driver_sql(
+            "SELECT competencia, transacao_id FROM pagamentofixa ORDER BY competencia"
+        ).all()
+        versoes = conn.exec_driver_sql("SELECT versao FROM negocio").scalars().all()
+
+    # Centavos inteiros (10.145 arredonda como models.Centavos) e datas em dias
+    assert [v for v, _, _ in linhas] == [150010, 29, 29, 1015, 9990, 9990, 9990, 4200]
+    assert {t for _, t, _ in linhas} == {"integer"}
+    assert linhas[1][2] == linhas[2][2] == hash_conteudo("2026-02-05", "despesa", 0.29, "Café")
+
+    assert saldo == (150010, 29 + 29 + 1015 + 3 * 9990)
+    # Do pagamento duplicado de fevereiro vale o primeiro
+    assert pagamentos == [(202602, 5), (202603, 7)]
+    assert versoes == [0, 0]
+
+    conferir_agregados(1, db)
+    conferir_agregados(2, db)
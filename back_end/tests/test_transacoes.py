@@ -0,0 +1,36 @@
+"""
+Validação dos valores enviados em transações e despesas fixas.
+"""
+
+import pytest
+
+from app.models import VALOR_MAXIMO
+
+
+def _transacao(negocio_id, valor):
+    return {"negocio_id": negocio_id, "tipo": "despesa", "valor": valor,
+            "descricao": "Teste", "tag": "Geral", "data": "2026-03-01"}
+
+
+@pytest.mark.parametrize("valor", [1e30, VALOR_MAXIMO + 1, -5])
+def test_valor_fora_do_intervalo_retorna_422(client, carteira, valor):
+    headers, negocio_id = carteira
+    r = client.post("/transacoes/", json=_transacao(negocio_id, valor), headers=headers)
+    assert r.status_code == 422
+
+    r = client.post("/transacoes/bulk", json=[_transacao(negocio_id, valor)], headers=headers)
+    assert r.status_code == 422
+
+    fixa = {"negocio_id": negocio_id, "nome": "Aluguel", "valor": valor}
+    r = client.post(f"/negocios/{negocio_id}/fixas", json=fixa, headers=headers)
+    assert r.status_code == 422
+
+
+@pytest.mark.parametrize("valor", [VALOR_MAXIMO, 0])
+def test_limites_aceitos(client, carteira, valor):
+    # valor 0: fechamento de KM do modo motorista
+    headers, negocio_id = carteira
+    r = client.post("/transacoes/", json=_transacao(negocio_id, valor), headers=headers)
+    assert r.status_code == 200
+    assert r.json()["valor"] == valor
+
@@ -0,0 +1,31 @@
+"""
+WebSocket (/ws): pedidos inválidos não derrubam a conexão.
+"""
+
+import time
+
+from app.realtime.manager import manager
+
+
+def test_pedido_invalido_ignorado(client, carteira):
+    headers, negocio_id = carteira
+    token = headers["Authorization"].removeprefix("Bearer ")
+    assinaturas = manager.stats()["subscriptions"]
+
+    with client.websocket_connect(f"/ws?token={token}") as ws:
+        # json.loads aceita 1e400 como float('inf'): int() levanta OverflowError
+        ws.send_text('{"action": "subscribe", "wallet": 1e400}')
+        ws.send_text('{"action": "subscribe", "wallet": NaN}')
+        ws.send_text(f'{{"action": "subscribe", "wallet": {negocio_id}}}')
+        for _ in range(100):
+            if manager.stats()["subscriptions"] > assinaturas:
+                break
+            time.sleep(0.02)
+
+        client.post(
+            "/transacoes/",
+            json={"negocio_id": negocio_id, "tipo": "despesa", "valor": 10,
+                  "descricao": "Café", "tag": "Geral", "data": "2026-03-01"},
+            headers=headers,
+        ).raise_for_status()
+        assert ws.receive_text() == "UPDATE_DASHBOARD"
@@ -49,15 +49,38 @@ export const getApiUrl = (endpoint: string): string => {
 };
 
 /**
- * Retorna a URL do WebSocket para um usuário específico.
+ * Retorna a URL do WebSocket autenticada com o token JWT.
  * 
- * @param userId - ID do usuário
+ * Depois de conectar, o cliente assina as carteiras que exibe com
+ * `ws.send(JSON.stringify({ action: 'subscribe', wallet: id }))`.
+ * 
+ * @param token - Token JWT obtido em /auth/token
  * @returns URL do WebSocket
  * 
  * @example
- * getWsUrl(123) // => 'ws://localhost:8000/ws/123' (dev)
- * getWsUrl(123) // => 'wss://meusite.com/ws/123' (prod)
+ * getWsUrl(token) // => 'ws://localhost:8000/ws?token=eyJ...' (dev)
+ * getWsUrl(token) // => 'wss://meusite.com/ws?token=eyJ...' (prod)
+ */
+export const getWsUrl = (token: string): string => {
+    return `${WS_URL}/ws?token=${encodeURIComponent(token)}`;
+};
+
+/**
+ * Mensagem de assinatura do tópico de uma carteira.
+ */
+export const subscribeMessage = (walletId: string | number): string =>
+    JSON.stringify({ action: 'subscribe', wallet: Number(walletId) });
+
+/**
+ * Responde ao heartbeat do servidor.
+ * 
+ * O servidor envia 'PING' periodicamente e fecha a conexão que fica
+ * calada por mais que WS_IDLE_TIMEOUT; a resposta 'PONG' a mantém viva.
+ * 
+ * @returns true se a mensagem era um PING (já respondido)
  */
-export const getWsUrl = (userId: string | number): string => {
-    return `${WS_URL}/ws/${userId}`;
+export const answerPing = (ws: WebSocket, event: MessageEvent): boolean => {
+    if (event.data !== 'PING') return false;
+    ws.send('PONG');
+    return true;
 };
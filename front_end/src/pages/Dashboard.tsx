@@ -1,6 +1,6 @@
-import { useEffect, useState } from 'react';
+import { useEffect, useRef, useState } from 'react';
 import { api } from '../services/api';
-import { getWsUrl } from '../config';
+import { answerPing, getWsUrl, subscribeMessage } from '../config';
 import { Negocio } from '../types';
 import { Plus, FolderInput, LogOut, Wallet } from 'lucide-react';
 import { CreateWalletModal } from '../components/modals/CreateWalletModal';
@@ -12,6 +12,8 @@ export default function Dashboard() {
     const [wallets, setWallets] = useState<Negocio[]>([]);
     const [isCreateModalOpen, setIsCreateModalOpen] = useState(false);
     const [isJoinModalOpen, setIsJoinModalOpen] = useState(false);
+    const wsRef = useRef<WebSocket | null>(null);
+    const walletsRef = useRef<Negocio[]>([]);
 
     useEffect(() => {
         loadWallets();
@@ -28,20 +30,36 @@ export default function Dashboard() {
 
     // Real-time Updates for Dashboard List
     useEffect(() => {
-        const userId = localStorage.getItem('user_id');
-        if (!userId) return;
+        const token = localStorage.getItem('access_token');
+        if (!token) return;
 
-        const ws = new WebSocket(getWsUrl(userId));
+        const ws = new WebSocket(getWsUrl(token));
+        wsRef.current = ws;
 
+        // Assina todas as carteiras da lista (saldos aparecem nos cards)
+        ws.onopen = () => walletsRef.current.forEach(w => ws.send(subscribeMessage(w.id)));
         ws.onmessage = (event) => {
+            if (answerPing(ws, event)) return;
             if (event.data === 'UPDATE_LIST' || event.data.includes('UPDATE')) {
                 loadWallets();
             }
         };
 
-        return () => ws.close();
+        return () => {
+            wsRef.current = null;
+            ws.close();
+        };
     }, []);
 
+    // Assina carteiras que entraram na lista (assinar de novo é inofensivo)
+    useEffect(() => {
+        walletsRef.current = wallets;
+        const ws = wsRef.current;
+        if (ws && ws.readyState === WebSocket.OPEN) {
+            wallets.forEach(w => ws.send(subscribeMessage(w.id)));
+        }
+    }, [wallets]);
+
     function handleLogout() {
         localStorage.removeItem('access_token');
         localStorage.removeItem('username');
@@ -1,7 +1,7 @@
 import { useEffect, useState, useCallback } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
 import { api } from '../services/api';
-import { getWsUrl } from '../config';
+import { answerPing, getWsUrl, subscribeMessage } from '../config';
 import { KPI, Transacao, Negocio, ChartData } from '../types';
 import { ArrowLeft, ArrowUpCircle, ArrowDownCircle, Trash2, Users, MoreVertical, CalendarCheck, Filter, ChevronDown, Plus, Minus } from 'lucide-react';
 import { TransactionModal } from '../components/modals/TransactionModal';
@@ -20,6 +20,8 @@ export default function WalletDetails() {
     const [loading, setLoading] = useState(true);
     const [wallet, setWallet] = useState<Negocio | null>(null);
     const [transactions, setTransactions] = useState<Transacao[]>([]);
+    const [nextCursor, setNextCursor] = useState<string | null>(null);
+    const [loadingMore, setLoadingMore] = useState(false);
     const [kpis, setKpis] = useState<KPI | null>(null);
 
     // Charts
@@ -43,6 +45,7 @@ export default function WalletDetails() {
             const res = await api.get(`/negocios/${id}/dashboard?dias=${chartDays}`);
             setWallet({ ...res.data.negocio, role: res.data.role });
             setTransactions(res.data.extrato);
+            setNextCursor(res.data.extrato_next_cursor);
             setKpis(res.data.kpis);
             setChartData(res.data.grafico);
             setPieData(res.data.pizza);
@@ -53,15 +56,34 @@ export default function WalletDetails() {
         }
     }, [id, chartDays]);
 
+    // Próxima página do histórico (paginação por cursor)
+    async function loadMore() {
+        if (!nextCursor) return;
+        setLoadingMore(true);
+        try {
+            const res = await api.get(`/negocios/${id}/extrato`, { params: { cursor: nextCursor } });
+            setTransactions(prev => [...prev, ...res.data.itens]);
+            setNextCursor(res.data.next_cursor);
+        } catch (error) {
+            addToast('error', 'Erro ao carregar mais transações');
+        } finally {
+            setLoadingMore(false);
+        }
+    }
+
     // Real-time WebSocket Connection
     useEffect(() => {
-        const userId = localStorage.getItem('user_id');
-        if (!userId) return;
+        const token = localStorage.getItem('access_token');
+        if (!token || !id) return;
 
-        const ws = new WebSocket(getWsUrl(userId));
+        const ws = new WebSocket(getWsUrl(token));
 
-        ws.onopen = () => setWsConnected(true);
+        ws.onopen = () => {
+            ws.send(subscribeMessage(id));
+            setWsConnected(true);
+        };
         ws.onmessage = (event) => {
+            if (answerPing(ws, event)) return;
             if (event.data === 'UPDATE_DASHBOARD' || event.data.includes('UPDATE')) {
                 loadData();
             }
@@ -291,6 +313,16 @@ export default function WalletDetails() {
                             </div>
                         ))}
                     </div>
+
+                    {nextCursor && (
+                        <button
+                            onClick={loadMore}
+                            disabled={loadingMore}
+                            className="w-full mt-4 py-2 text-sm font-bold text-zinc-500 hover:text-zinc-900 dark:hover:text-white bg-zinc-100 dark:bg-zinc-800 rounded-xl transition-colors disabled:opacity-50"
+                        >
+                            {loadingMore ? 'Carregando...' : 'Carregar mais'}
+                        </button>
+                    )}
                 </div>
             </div>
 
@@ -83,8 +83,9 @@ except Exception as e:
     raise
 
 # Importação para servir arquivos estáticos
+from fastapi import Request
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from app.compression import PrecompressedStaticFiles, arquivo_estatico, precomprimir_diretorio
 
 # ============================================================
 # CONFIGURAÇÃO DO FRONTEND (React)
@@ -100,39 +101,43 @@ log_info("Verificando frontend React...")
 if FRONTEND_DIR.exists():
     log_success(f"Frontend encontrado em: {FRONTEND_DIR}")
     
+    # Gera as versões gzip/brotli uma única vez (ficam em memória)
+    total = precomprimir_diretorio(FRONTEND_DIR)
+    log_success(f"{total} arquivo(s) do frontend pré-comprimido(s)")
+    
     # Monta os assets estáticos (JS, CSS, imagens)
     assets_dir = FRONTEND_DIR / "assets"
     if assets_dir.exists():
-        app.mount("/assets", StaticFiles(directory=str(assets_dir)), name="assets")
+        app.mount("/assets", PrecompressedStaticFiles(directory=str(assets_dir)), name="assets")
         log_success("Assets (JS/CSS) montados em /assets")
     
     # Serve arquivos estáticos da raiz do dist
     @app.get("/vite.svg")
-    async def serve_vite_svg():
+    async def serve_vite_svg(request: Request):
         file_path = FRONTEND_DIR / "vite.svg"
         if file_path.exists():
-            return FileResponse(file_path)
+            return arquivo_estatico(request, file_path)
         return {"error": "Not found"}
 
     # Rota catch-all para o React Router (SPA)
     @app.get("/{full_path:path}")
-    async def serve_frontend(full_path: str):
+    async def serve_frontend(full_path: str, request: Request):
         """
         Serve o frontend React para todas as rotas não-API.
         """
         # Se é uma rota de API, deixa o FastAPI tratar
-        if full_path.startswith(("auth", "negocios", "transacoes", "docs", "redoc", "openapi.json", "ws")):
+        if full_path.startswith(("auth", "negocios", "transacoes", "docs", "redoc", "openapi.json", "ws", "metrics")):
             return {"error": "Not found"}
         
         # Tenta servir arquivo específico primeiro
         file_path = FRONTEND_DIR / full_path
         if file_path.exists() and file_path.is_file():
-            return FileResponse(file_path)
+            return arquivo_estatico(request, file_path)
         
         # Qualquer outra rota retorna o index.html (SPA)
         index_path = FRONTEND_DIR / "index.html"
         if index_path.exists():
-            return FileResponse(index_path)
+            return arquivo_estatico(request, index_path)
         
         return {"error": "Frontend not built"}
 
@@ -175,7 +180,7 @@ print(f"""
   🔐 Autenticação:      /auth/*
   💼 Carteiras:         /negocios/*
   💰 Transações:        /transacoes/*
-  🔌 WebSocket:         /ws/{{user_id}}
+  🔌 WebSocket:         /ws?token=<jwt>
   
 {Colors.CYAN}{'='*60}{Colors.END}
 {Colors.GREEN}{Colors.BOLD}🚀 Aplicação pronta para receber requisições!{Colors.END}